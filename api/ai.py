@@ -3,10 +3,8 @@ import json
 import random
 import re
 import string
-import time
 import asyncio
 import requests
-import datetime
 from datetime import datetime as dt
 from typing import Dict
 
@@ -14,8 +12,14 @@ from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, EmailStr, Field
 
-from utils.cache import get_redis_data, set_redis_data, del_redis_data, increment_redis_data
-from utils.database import get_db, get_db_slave
+from utils.cache import redis_batch, cached, invalidate_tags
+from utils.user_state import UserState, user_state, load_user_state
+from utils.day_clock import clock
+from utils.participation import queue_mark, KIND_AITRAIN
+from utils.chat_history import ChatHistory
+from utils.training_history import HISTORY_QUERY, HISTORY_HEAD_ID, HISTORY_MAX_LIMIT, COUNT_INSERTED_QUERY, encode_cursor, decode_cursor
+from utils.training_summary import SUMMARY_QUERY, TRAINED_QUERY, load_summary, current_streak, cycle
+from utils.database import get_db, get_db_read, read_router
 from utils.security import get_current_address
 from utils.log import log as logger
 from config import set_envsion, get_envsion, APP_CONFIG, AI_AGENT_PROMPT, AI_CONFIG
@@ -30,24 +34,6 @@ def contains_letter(text):
     pattern = re.compile(r'[a-zA-Z]')
     return bool(pattern.search(text))
 
-def update_conversation_history(conversation_history, role, message):
-    if len(conversation_history) == 0 and role=="user":
-        logger.warning("The first input cannot be user, skip")
-        return
-    if not message.strip():
-        logger.warning("Input is empty, skip")
-        return
-    if len(message) > 2000:
-        logger.warning("Input too long, truncated")
-        message = message[:2000]
-    if conversation_history[-1]['role'] in ["200","400","405"]:
-        logger.warning("Session ended, skipped")
-        return
-    if conversation_history[-1]['role'] == role:
-        logger.warning("Input exists, delete and re-enter")
-        conversation_history.pop()
-    conversation_history.append({"role": role, "content": message})
-
 def contains_keywords_regex(text, keywords):
     include_pattern = re.compile(r'(' + '|'.join(re.escape(keyword) for keyword in keywords) + r')', re.IGNORECASE)
     
@@ -70,10 +56,27 @@ def extract_keywords(text, keywords):
     logger.debug(f"matches: {matches}")
     return matches
 
-def aichat_response_sync(address, conversation_history):
+async def save_chat(state, history):
+    async with redis_batch(True) as batch:
+        state.queue_save(batch)
+        history.queue_save(batch)
+
+def adopt_pending_chat(state, history):
+    """Transcript cached by older versions as one JSON value: moved to the chat list once"""
+    conversation_list = state.get("aichat:pending")
+    if conversation_list is None:
+        return
+    if not history.turns and conversation_list:
+        # Drop the repeats the old rewrite-per-turn could leave
+        history.replace([turn for index, turn in enumerate(conversation_list) if index == 0 or turn != conversation_list[index - 1]])
+    state.delete("aichat:pending")
+
+def aichat_response_sync(address, history, system_prompt):
     """AI Chat"""
-    today = time.strftime("%Y-%m-%d", time.localtime())
+    today = clock.today()
     logger.debug(f"today: {today}")
+    # Written without loading: this runs in a worker thread, each save is its own asyncio.run
+    state = UserState(address, today)
     status=0
     emotion_keyword=''
     include_keywords = ["analysis:", "conjectures:", "emotions*", "career*", "relationships*", "life*"]
@@ -88,7 +91,7 @@ def aichat_response_sync(address, conversation_history):
             }
             data = {
                 "model": CONFIG['model'],
-                "messages": conversation_history,
+                "messages": [{"role": "system", "content": system_prompt}] + history.turns,
                 "stream": True,
             }
 
@@ -115,29 +118,28 @@ def aichat_response_sync(address, conversation_history):
 
                 if ('DONE' in json_obj) or ('choices' in json_obj and json_obj['choices'][0]['finish_reason'] == 'stop'): # AI streaming output ends
                     logger.info(f"ai_response: {ai_response}")
-                    update_conversation_history(conversation_history, "assistant", ai_response)
-                    conversation_history.pop(0)
+                    history.append("assistant", ai_response)
 
                     # Emotion Recognition: check emotion key / conversation_history>6
-                    if contains_keywords_regex(ai_response.lower(), include_keywords) or len(conversation_history) > 6:
+                    if contains_keywords_regex(ai_response.lower(), include_keywords) or len(history.turns) > 6:
                         status=200
                         emotion_list = extract_keywords(ai_response.lower(), keywords)
                         if len(emotion_list)>0:
                             emotion_keyword = emotion_list[0]
                             logger.info(f"Find emotion keywords in response: {emotion_keyword}")
-                            update_conversation_history(conversation_history, "200", emotion_keyword)
-                        if len(conversation_history) > 12: # If more than 12 times, the system will automatically roll back.
+                            history.append("200", emotion_keyword)
+                        if len(history.turns) > 12: # If more than 12 times, the system will automatically roll back.
                             status=405
-                            update_conversation_history(conversation_history, "405", "No chat times")
-                            asyncio.run(set_redis_data(False, f"hackathon:aichat:{address}:{today}:check", value=405, ex=86400))
+                            history.append("405", "No chat times")
+                            state.set("aichat:{today}:check", 405)
                     elif 'training failed' in ai_response.lower() or 'test failed' in ai_response.lower():
-                        conversation_history.pop()
+                        history.pop()
 
                         status=400
-                        update_conversation_history(conversation_history, "400", 'Training failed')
-                        asyncio.run(set_redis_data(False, f"hackathon:aichat:{address}:{today}:check", value=400, ex=86400))
+                        history.append("400", 'Training failed')
+                        state.set("aichat:{today}:check", 400)
 
-                    asyncio.run(set_redis_data(False, f"hackathon:aichat:{address}:pending", value=json.dumps(conversation_history), ex=1800))
+                    asyncio.run(save_chat(state, history))
                     break
                 elif 'choices' in json_obj and json_obj['choices'][0]['delta'].get('content', '') != '': # AI streaming output
                     response_chunk = json_obj['choices'][0]['delta'].get('content', '')
@@ -168,7 +170,8 @@ def aichat_response_sync(address, conversation_history):
     elif status == 400:
         yield '{"code": 400, "success": false, "msg": "Training failed"}'
     elif status == 200 and emotion_keyword:
-        asyncio.run(set_redis_data(False, f"hackathon:aichat:{address}:{today}:check", value=emotion_keyword, ex=86400))
+        state.set("aichat:{today}:check", emotion_keyword)
+        asyncio.run(state.save())
         yield '{"code": 200, "success": true, "msg": "'+emotion_keyword+'"}'
 
 
@@ -176,7 +179,7 @@ class AIChatRequest(BaseModel):
     message: str
     mark: bool | None = False
 @router.post("/chat")
-async def ai_chat(post_request: AIChatRequest, address: Dict = Depends(get_current_address), cursorSlave=Depends(get_db_slave)):
+async def ai_chat(post_request: AIChatRequest, address: Dict = Depends(get_current_address), cursorSlave=Depends(get_db_read)):
     """AI Agent Conversation"""
     logger.info(f"POST /api/ai/chat - {address}")
     if cursorSlave is None:
@@ -188,75 +191,67 @@ async def ai_chat(post_request: AIChatRequest, address: Dict = Depends(get_curre
         message = post_request.message
         logger.info(f"Received message: {message}")
 
-        today = time.strftime("%Y-%m-%d", time.localtime())
+        today = clock.today()
         logger.debug(f"today: {today}")
-        aichat_check = await get_redis_data(False, f"hackathon:aichat:{address}:{today}:check")
-        logger.debug(f"redis aichat_check: {aichat_check}")
-        if not aichat_check:
-            check_query = """
-                        SELECT 
-                            detail 
-                        FROM hack_emotion_training 
-                        WHERE 
-                            address = %s AND date = %s
-                        ORDER BY id DESC limit 1
-                        """
-            values = (address,today)
-            await cursorSlave.execute(check_query, values)
-            checkin_info = await cursorSlave.fetchone()
-            logger.debug(f"mysql checkin_info: {checkin_info}")
-            if checkin_info:
-                aichat_check=checkin_info['detail']
-            else:
-                aichat_check=''
-            await set_redis_data(False, f"hackathon:aichat:{address}:{today}:check", value=aichat_check, ex=86400)
-        aichat_check_str = str(aichat_check)
-        if len(aichat_check_str) > 0:
-            if aichat_check_str == '400':
-                return {"code": 400, "success": False, "msg": "Training failed"}
-            elif aichat_check_str == '405':
-                return {"code": 405, "success": False, "msg": "No chat times"}
-            else:
-                if len(aichat_check_str.split('_')) == 1:
-                    emotional = aichat_check_str
+        # Check and chat transcript in one read, changes saved when the block ends
+        history = ChatHistory(address)
+        async with user_state(address, today, history) as state:
+            adopt_pending_chat(state, history)
+            aichat_check = state.get("aichat:{today}:check")
+            logger.debug(f"redis aichat_check: {aichat_check}")
+            if not aichat_check:
+                check_query = """
+                            SELECT 
+                                detail 
+                            FROM hack_emotion_training 
+                            WHERE 
+                                address = %s AND date = %s
+                            ORDER BY id DESC limit 1
+                            """
+                values = (address,today)
+                await cursorSlave.execute(check_query, values)
+                checkin_info = await cursorSlave.fetchone()
+                logger.debug(f"mysql checkin_info: {checkin_info}")
+                if checkin_info:
+                    aichat_check=checkin_info['detail']
                 else:
-                    keywords = ["none", "positive", "neutral", "negative"]
-                    emotional_id = int(aichat_check_str.split('_')[0])
-                    logger.debug(f"emotional_id: {emotional_id}")
-                    emotional = keywords[emotional_id]
-                if emotional != 'none':
-                    return {"code": 200, "success": True, "msg": emotional}
-
-        conversation_history = []
-        if mark: # Clean up records
-            await set_redis_data(False, f"hackathon:aichat:{address}:pending", value=json.dumps(conversation_history), ex=1800)
-        else:
-            # Chat history cache
-            conversation_list = await get_redis_data(False, f"hackathon:aichat:{address}:pending")
-            if conversation_list:
-                last_conversation_one = ''
-                for conversation_one in conversation_list:
-                    if conversation_one != last_conversation_one:
-                        conversation_history.append(conversation_one)
-                    last_conversation_one = conversation_one
-                if len(conversation_list) >= 1:
-                    update_conversation_history(conversation_history, "user", message)
-                    await set_redis_data(False, f"hackathon:aichat:{address}:pending", value=json.dumps(conversation_history), ex=1800)
-        logger.debug(f"conversation_history: {conversation_history}")
-        if len(conversation_history) >= 6 and conversation_history[-1]['role'] == "200":
-            aichat_check = conversation_history[-1]['content']
-            await set_redis_data(False, f"hackathon:aichat:{address}:{today}:check", value=aichat_check, ex=86400)
-            return {"code": 200, "success": True, "msg": aichat_check}
-        if len(conversation_history) > 12:
-            update_conversation_history(conversation_history, "405", "No chat times")
-            await set_redis_data(False, f"hackathon:aichat:{address}:{today}:check", value=405, ex=86400)
-            return {"code": 405, "success": False, "msg": "No chat times"}
-        
+                    aichat_check=''
+                state.set("aichat:{today}:check", aichat_check)
+            aichat_check_str = str(aichat_check)
+            if len(aichat_check_str) > 0:
+                if aichat_check_str == '400':
+                    return {"code": 400, "success": False, "msg": "Training failed"}
+                elif aichat_check_str == '405':
+                    return {"code": 405, "success": False, "msg": "No chat times"}
+                else:
+                    if len(aichat_check_str.split('_')) == 1:
+                        emotional = aichat_check_str
+                    else:
+                        keywords = ["none", "positive", "neutral", "negative"]
+                        emotional_id = int(aichat_check_str.split('_')[0])
+                        logger.debug(f"emotional_id: {emotional_id}")
+                        emotional = keywords[emotional_id]
+                    if emotional != 'none':
+                        return {"code": 200, "success": True, "msg": emotional}
+
+            if mark: # Clean up records
+                history.replace([])
+            elif history.turns:
+                history.append("user", message)
+            logger.debug(f"conversation_history: {history.turns}")
+            if len(history.turns) >= 6 and history.last['role'] == "200":
+                aichat_check = history.last['content']
+                state.set("aichat:{today}:check", aichat_check)
+                return {"code": 200, "success": True, "msg": aichat_check}
+            if len(history.turns) > 12:
+                history.append("405", "No chat times")
+                state.set("aichat:{today}:check", 405)
+                return {"code": 405, "success": False, "msg": "No chat times"}
+
         username = address[:4] + '...' + address[-4:]
-        user_gaeaagent_prompt = AI_AGENT_PROMPT
-        conversation_history.insert(0, {"role": "system", "content": user_gaeaagent_prompt.replace('XXX',username).replace('YYMMDD',today)})
+        user_gaeaagent_prompt = AI_AGENT_PROMPT.replace('XXX',username).replace('YYMMDD',today)
 
-        return StreamingResponse(aichat_response_sync(address, conversation_history), media_type="text/plain")
+        return StreamingResponse(aichat_response_sync(address, history, user_gaeaagent_prompt), media_type="text/plain")
     except Exception as e:
         logger.error(f"/api/ai/chat except ERROR: {str(e)}")
         return {"code": 500, "success": False, "msg": "Server error"}
@@ -270,21 +265,19 @@ async def ai_chat_history(address: Dict = Depends(get_current_address), cursor=D
         return {"code": 500, "success": False, "msg": "cursor error"}
 
     try:
-        today = time.strftime("%Y-%m-%d", time.localtime())
+        today = clock.today()
         logger.debug(f"today: {today}")
 
-        conversation_history = []
-        conversation_list = await get_redis_data(False, f"hackathon:aichat:{address}:pending")
-        if conversation_list:
-            last_conversation_one = ''
-            for conversation_one in conversation_list:
-                if conversation_one != last_conversation_one:
-                    conversation_one.update({"content": conversation_one['content'].replace('\n', '<br/>')})
-                    conversation_history.append(conversation_one)
-                last_conversation_one = conversation_one
-            if len(conversation_history) > 12:
-                update_conversation_history(conversation_history, "405", "No chat times")
-                await set_redis_data(False, f"hackathon:aichat:{address}:{today}:check", value=405, ex=86400)
+        history = ChatHistory(address)
+        async with user_state(address, today, history) as state:
+            adopt_pending_chat(state, history)
+            if len(history.turns) > 12:
+                history.append("405", "No chat times")
+                state.set("aichat:{today}:check", 405)
+        conversation_history = [
+            {"role": turn['role'], "content": turn['content'].replace('\n', '<br/>')}
+            for turn in history.turns
+        ]
         logger.debug(f"conversation_history: {conversation_history}")
         return {
             "code": 200, 
@@ -297,9 +290,85 @@ async def ai_chat_history(address: Dict = Depends(get_current_address), cursor=D
         return {"code": 500, "success": False, "msg": "Server error"}
 
 # --------------------------------------------------------------------------------------------------
+# Loaders: small per-user results live in the user state hash (TRAINING_FIELDS),
+# history pages are @cached and dropped at once with TRAINING_TAG
+
+TRAINING_TAG = "user:{address}:training"
+# User state fields that change with a completed training
+TRAINING_FIELDS = ("aichat:{today}:check", "aitrain:{today}:detail", "aitrain:{today}:status", "training:summary", "trainall:count")
+
+
+async def load_training_summary(cursorSlave, address):
+    await cursorSlave.execute(SUMMARY_QUERY, (address,))
+    summary_info = await cursorSlave.fetchone()
+    logger.debug(f"mysql summary_info: {summary_info}")
+    return load_summary(address, summary_info)
+
+
+async def load_history_count(cursorSlave, address):
+    check_query = """
+                    SELECT 
+                        total 
+                    FROM hack_emotion_training_count 
+                    WHERE 
+                        address = %s
+                    """
+    values = (address,)
+    await cursorSlave.execute(check_query, values)
+    count_info = await cursorSlave.fetchone()
+    logger.debug(f"mysql count_info: {count_info}")
+    if count_info is not None:
+        return count_info['total']
+    # No counter row: nothing listed yet, or history older than migrations/0002
+    check_query = """
+                    SELECT 
+                        count(*) as len 
+                    FROM hack_emotion_training 
+                    WHERE 
+                        address = %s AND visible = 1
+                    """
+    await cursorSlave.execute(check_query, values)
+    all_info = await cursorSlave.fetchone()
+    logger.debug(f"mysql all_info: {all_info}")
+    if all_info is None:
+        return 0
+    return all_info['len']
+
+
+async def prewarm_training_state(state):
+    """
+    Training fields of the coming day (state.today) for utils.day_rollover, written before midnight.
+    Nothing is recorded yet for a day that has not started: the first reads need no MySQL
+    """
+    if state.get("aichat:{today}:check") is None:
+        state.set("aichat:{today}:check", '')
+    if state.get("aitrain:{today}:detail") is None:
+        state.set("aitrain:{today}:detail", {})
+
+
+@cached("hackathon:trainall:{address}:{page}:{limit}:list", ex=600, tags=(TRAINING_TAG,))
+async def load_history_list(cursorSlave, address, page, limit):
+    """Page by number: the first page, and old clients. limit + 1 rows, the last one tells a next page"""
+    values = (address, HISTORY_HEAD_ID, limit * (page - 1), limit + 1)
+    await cursorSlave.execute(HISTORY_QUERY, values)
+    history_list = await cursorSlave.fetchall()
+    logger.debug(f"mysql history_list: {history_list}")
+    return history_list
+
+
+# Rows below an id never change: no tag, nothing to drop on insert
+@cached("hackathon:trainall:{address}:{before}:{limit}:after", ex=600)
+async def load_history_after(cursorSlave, address, before, limit):
+    """Page of the rows below id before. limit + 1 rows, the last one tells a next page"""
+    values = (address, before, 0, limit + 1)
+    await cursorSlave.execute(HISTORY_QUERY, values)
+    history_list = await cursorSlave.fetchall()
+    logger.debug(f"mysql history_list: {history_list}")
+    return history_list
+
 
 @router.get("/list")
-async def ai_list(address: Dict = Depends(get_current_address), cursorSlave=Depends(get_db_slave)):
+async def ai_list(address: Dict = Depends(get_current_address), cursorSlave=Depends(get_db_read)):
     """7 days of deep training data"""
     logger.info(f"POST /api/ai/list - {address}")
     if cursorSlave is None:
@@ -307,98 +376,34 @@ async def ai_list(address: Dict = Depends(get_current_address), cursorSlave=Depe
         return {"code": 500, "success": False, "msg": "cursor error"}
 
     try:
-        today = time.strftime("%Y-%m-%d", time.localtime())
+        today = clock.today()
         logger.debug(f"today: {today}")
-        seven_days_ago = datetime.datetime.now() - datetime.timedelta(days=4)
-        logger.debug(f"seven_days_ago: {seven_days_ago}")
-        seven_days_ago_timestamp = int(seven_days_ago.replace(hour=0, minute=0, second=0, microsecond=0).timestamp())
-        logger.debug(f"seven_days_ago_timestamp: ({type(seven_days_ago_timestamp).__name__}){seven_days_ago_timestamp}")
-
-        # AI Training
-        aitrain_complete=0
-        aitrain_detail=''
-        aitrain_info=await get_redis_data(False, f"hackathon:aitrain:{address}:{today}:detail")
-        logger.debug(f"redis aitrain_info: {aitrain_info}")
-        if not aitrain_info:
-            check_query = """
-                        SELECT 
-                            detail,
-                            status 
-                        FROM hack_emotion_training 
-                        WHERE 
-                            address = %s AND status = 1 AND date = %s 
-                        limit 1
-                        """
-            values = (address, today)
-            # print(f"check_query: {check_query}, values: {values}")
-            await cursorSlave.execute(check_query, values)
-            aitrain_info = await cursorSlave.fetchone()
-            logger.debug(f"mysql aitrain_info: {aitrain_info}")
-            if aitrain_info:
-                await set_redis_data(False, f"hackathon:aitrain:{address}:{today}:detail", value=json.dumps(aitrain_info), ex=86400)
-        if aitrain_info:
-            aitrain_complete=aitrain_info['status']
-            aitrain_detail=aitrain_info['detail']
 
+        # One primary-key read: the summary is kept up to date on every training insert
+        state = await load_user_state(address)
+        summary = state.get("training:summary")
+        if summary is None:
+            summary = await load_training_summary(cursorSlave, address)
+            state.set("training:summary", summary)
+            await state.save()
+        logger.debug(f"summary: {summary}")
 
-        ## Get the most recent 6 deep training data
-        checkin_list = await get_redis_data(False, f"hackathon:deeptrain:{address}:{today}:list")
-        logger.debug(f"redis checkin_list: {checkin_list}")
-        if not checkin_list:
-            check_query = """
-                    WITH ranked_data AS (
-                        SELECT date,detail,status,ROW_NUMBER() OVER (PARTITION BY date ORDER BY status ASC) as rn
-                        FROM hack_emotion_training 
-                        WHERE address = %s AND status = 2 AND created_time > FROM_UNIXTIME(%s) 
-                    )
-                    SELECT date, detail, status
-                    FROM ranked_data
-                    WHERE rn = 1
-                    ORDER BY date DESC LIMIT 6
-                    """
-            values = (address,seven_days_ago_timestamp)
-            await cursorSlave.execute(check_query, values)
-            checkin_list = await cursorSlave.fetchall()
-            logger.debug(f"mysql checkin_list: {checkin_list}")
-            await set_redis_data(False, f"hackathon:deeptrain:{address}:{today}:list", value=json.dumps(checkin_list), ex=60)
         # Continuous sign-in reward
-        continuous = 0  # Consecutive sign-ins
-        completed_today = 0  # Completed today's mark
-        completed_detail = ''  # AI Emotions Today
-        seven_data = []
-        for checkin_one in checkin_list:
-            logger.debug(f"checkin_one: {checkin_one}")
-            checkin_one_date = checkin_one['date'][:10]
-            logger.debug(f"checkin_one_date: {checkin_one_date}")
-            if checkin_one_date == today:
-                completed_today = checkin_one['status'] if ('status' in checkin_one and int(checkin_one['status'])>0) else 1
-                completed_detail = checkin_one['detail']
-            else:
-                continuous += 1
-                day = (datetime.datetime.now() + datetime.timedelta(days=-continuous)).strftime("%Y-%m-%d")
-                if checkin_one_date != day:
-                    continuous -= 1
-                    break
-            seven_data.append({"date":checkin_one_date,"detail":checkin_one['detail'],"status":checkin_one['status']})
-        logger.debug(f"continuous: {continuous} completed_today: {completed_today}")
-        if completed_today: continuous += 1
-        if continuous == 8:  continuous = 7
+        continuous = current_streak(summary, today)
         logger.debug(f"continuous: {continuous}")
-
-        seven_data.sort(key=lambda x: x['date'])
-        for one_data in seven_data:
-            one_date = one_data['date'][:10]
+        seven_data = []
+        for checkin_one in reversed(cycle(summary, today)):
+            one_date = checkin_one['date']
             if len(one_date.split('-'))==3:
-                one_data['date'] = one_date.split('-')[2] + '/' + one_date.split('-')[1] + '/' + one_date.split('-')[0]
-            else:
-                one_data['date'] = one_date
+                one_date = one_date.split('-')[2] + '/' + one_date.split('-')[1] + '/' + one_date.split('-')[0]
+            seven_data.append({"date":one_date,"detail":checkin_one['detail'],"status":checkin_one['status']})
 
         return {
             "code": 200,
             "success": True,
             "msg": "Success",
             "data": {
-                "today": aitrain_detail if aitrain_complete else '',
+                "today": summary['train_detail'] if summary['train_date'] == today else '',
                 "cycle": seven_data,
             }
         }
@@ -418,14 +423,25 @@ async def ai_complete(post_request: CheckInRequest, address: Dict = Depends(get_
         return {"code": 500, "success": False, "msg": "cursor error"}
 
     try:
-        today = time.strftime("%Y-%m-%d", time.localtime())
+        today = clock.today()
         logger.debug(f"today: {today}")
 
         # AI Training
         aitrain_complete=0
-        aitrain_info=await get_redis_data(False, f"hackathon:aitrain:{address}:{today}:detail")
+        aitrain_pending_key = f"hackathon:aitrain:{address}:{today}:pending"
+        state = UserState(address, today)
+        async with redis_batch(True) as batch:
+            state.load(batch)
+        await state.ready()
+        await state.touch()
+        aitrain_info = state.get("aitrain:{today}:detail")
         logger.debug(f"redis aitrain_info: {aitrain_info}")
-        if not aitrain_info:
+        if aitrain_info:
+            aitrain_complete=state.counter("aitrain:{today}:status") or int(aitrain_info['status'])
+            if aitrain_complete > 0:
+                state.incr("aitrain:{today}:status")
+                await state.save()
+        elif aitrain_info is None:
             check_query = """
                             SELECT detail,status 
                             FROM hack_emotion_training 
@@ -439,20 +455,20 @@ async def ai_complete(post_request: CheckInRequest, address: Dict = Depends(get_
             aitrain_info = await cursor.fetchone()
             logger.debug(f"mysql aitrain_info: {aitrain_info}")
             if aitrain_info:
-                await set_redis_data(False, f"hackathon:aitrain:{address}:{today}:detail", value=json.dumps(aitrain_info), ex=86400)
-        if aitrain_info:
-            aitrain_complete=aitrain_info['status']
+                aitrain_complete=int(aitrain_info['status'])
+                state.set("aitrain:{today}:detail", aitrain_info)
+                state.set_counter("aitrain:{today}:status", aitrain_complete + 1)
+                await state.save()
 
         if aitrain_complete > 0:
-            await increment_redis_data(False, f"hackathon:aitrain:{address}:{today}:detail", value_key="status", ex=86400)
             logger.error(f"STATUS: 400 ERROR: Training already completed - {address}")
             return {"code": 400, "success": False, "msg": f"Training already completed"}
 
-        ## Block multiple user requests 60
-        redis_pending_complete = await get_redis_data(False, f"hackathon:aitrain:{address}:{today}:pending")
-        if redis_pending_complete:
+        # Block multiple user requests 60, only once the training is known not to be completed
+        async with redis_batch(True) as batch:
+            claimed = batch.set(aitrain_pending_key, 1, ex=60, nx=True)
+        if not claimed.result():
             return {"code": 400, "success": False, "msg": "Please wait for the last completion"}
-        await set_redis_data(False, f"hackathon:aitrain:{address}:{today}:pending", value=1, ex=60)
 
         if aitrain_complete: 
             logger.error(f"STATUS: 400 ERROR: Training already completed - {address}")
@@ -471,7 +487,8 @@ async def ai_complete(post_request: CheckInRequest, address: Dict = Depends(get_
             exist_train_check = await cursor.fetchone()
             logger.debug(f"mysql exist_train_check: {exist_train_check}")
             if exist_train_check:
-                await del_redis_data(False, f"hackathon:aitrain:{address}:{today}:detail")
+                state.delete("aitrain:{today}:detail")
+                await state.save()
                 logger.error(f"STATUS: 400 ERROR: Training already completed - {address}")
                 return {"code": 400, "success": False, "msg": f"Training already completed"}
 
@@ -483,14 +500,28 @@ async def ai_complete(post_request: CheckInRequest, address: Dict = Depends(get_
                             WHERE NOT EXISTS (SELECT id FROM hack_emotion_training WHERE address = %s AND status = 1 AND date = %s)
                             """
             values = (address, post_request.detail, 1, today, address, today)
-            await cursor.execute(insert_query, values)
-            await cursor.connection.commit()
+            # The pool autocommits: row, counter and summary in one explicit transaction
+            await cursor.connection.begin()
+            try:
+                await cursor.execute(insert_query, values)
+                if cursor.rowcount > 0:
+                    await cursor.execute(COUNT_INSERTED_QUERY, (cursor.lastrowid,))
+                    await cursor.execute(TRAINED_QUERY, (address, today, post_request.detail))
+                await cursor.connection.commit()
+            except Exception:
+                # Never hand the connection back to the autocommit pool with the locks held
+                await cursor.connection.rollback()
+                raise
 
-            # Delete cache
-            await del_redis_data(False, f"hackathon:deeptrain:{address}:{today}:list")
-            await del_redis_data(False, f"hackathon:trainall:{address}:count")
-            await del_redis_data(False, f"hackathon:trainall:{address}:1:10:list")
-            await del_redis_data(False, f"hackathon:aitrain:{address}:{today}:detail")
+            # Delete cache: every history page and list of this user, whatever page/limit
+            async with redis_batch(True) as batch:
+                await invalidate_tags(TRAINING_TAG.format(address=address), batch=batch)
+                for field in TRAINING_FIELDS:
+                    state.delete(field)
+                state.queue_save(batch)
+                queue_mark(batch, address, today, KIND_AITRAIN)
+                # Reads of this address go to the master until the replica has the row
+                read_router.pin(batch, address)
 
             return {
                 "code": 200,
@@ -505,8 +536,8 @@ async def ai_complete(post_request: CheckInRequest, address: Dict = Depends(get_
         return {"code": 500, "success": False, "msg": "Server error"}
 
 
-@router.get("/history")  # ?page=0&limit=10
-async def ai_history(page: int | None = 1, limit: int | None = 10, address: Dict = Depends(get_current_address), cursorSlave=Depends(get_db_slave)):
+@router.get("/history")  # ?limit=10&cursor={next} (or ?page=1&limit=10)
+async def ai_history(page: int | None = 1, limit: int | None = 10, cursor: str | None = None, address: Dict = Depends(get_current_address), cursorSlave=Depends(get_db_read)):
     """Training history data"""
     logger.info(f"GET /api/ai/history - {address}")
     if cursorSlave is None:
@@ -514,25 +545,12 @@ async def ai_history(page: int | None = 1, limit: int | None = 10, address: Dict
         return {"code": 500, "success": False, "msg": "cursor error"}
 
     try:
-        history_count = await get_redis_data(False, f"hackathon:trainall:{address}:count")
-        logger.debug(f"redis history_count: {history_count}")
+        state = await load_user_state(address)
+        history_count = state.get("trainall:count")
         if history_count is None:
-            check_query = """
-                            SELECT 
-                                count(*) as len 
-                            FROM hack_emotion_training 
-                            WHERE 
-                                address = %s
-                            """
-            values = (address)
-            await cursorSlave.execute(check_query, values)
-            all_info = await cursorSlave.fetchone()
-            logger.debug(f"mysql all_info: {all_info}")
-            if all_info is None:
-                history_count = 0
-            else:
-                history_count = all_info['len']
-            await set_redis_data(False, f"hackathon:trainall:{address}:count", value=history_count, ex=600)
+            history_count = await load_history_count(cursorSlave, address)
+            state.set("trainall:count", history_count)
+            await state.save()
 
         if history_count == 0:
             return {
@@ -541,33 +559,22 @@ async def ai_history(page: int | None = 1, limit: int | None = 10, address: Dict
                 "msg": "Success",
                 "data": [],
                 "total": 0,
+                "next": None,
             }
 
-        if page == 0: page = 1
-        history_list = await get_redis_data(False, f"hackathon:trainall:{address}:{page}:{limit}:list")
-        logger.debug(f"redis history_list: {history_list}")
-        if history_list is None:
-            check_query = """
-                            SELECT 
-                                date,
-                                detail,
-                                status 
-                            FROM hack_emotion_training 
-                            WHERE 
-                                address = %s 
-                            ORDER BY id DESC 
-                            LIMIT %s, %s 
-                            """
-            values = (address, limit * (page - 1), limit)
-            await cursorSlave.execute(check_query, values)
-            history_list = await cursorSlave.fetchall()
-            logger.debug(f"mysql history_list: {history_list}")
-            await set_redis_data(False, f"hackathon:trainall:{address}:{page}:{limit}:list", value=json.dumps(history_list), ex=600)
+        limit = min(max(limit or 10, 1), HISTORY_MAX_LIMIT)
+        if cursor:
+            try:
+                before = decode_cursor(cursor)
+            except ValueError:
+                return {"code": 400, "success": False, "msg": "Invalid cursor"}
+            history_list = await load_history_after(cursorSlave, address, before, limit)
+        else:
+            history_list = await load_history_list(cursorSlave, address, max(page or 1, 1), limit)
+        next_cursor = encode_cursor(history_list[limit - 1]['id']) if len(history_list) > limit else None
 
         history_data = []
-        for history_one in history_list:
-            if contains_letter(history_one['detail']):
-                continue
+        for history_one in history_list[:limit]:
             one_date = history_one['date'][:10]
             if len(one_date.split('-'))==3:
                 new_one_date = one_date.split('-')[2] + '/' + one_date.split('-')[1] + '/' + one_date.split('-')[0]
@@ -582,6 +589,7 @@ async def ai_history(page: int | None = 1, limit: int | None = 10, address: Dict
             "msg": "Success",
             "data": history_data if history_data else [],
             "total": history_count if history_count else 0,
+            "next": next_cursor,
         }
     except Exception as e:
         logger.error(f"/api/ai/history - {address} except ERROR: {str(e)}")
@@ -0,0 +1,67 @@
+from fastapi import APIRouter, Depends, Query
+
+from utils.cache import get_or_load_stats
+from utils.cache_metrics import cache_metrics
+from utils.database import get_db_pool_stats
+from utils.day_rollover import get_rollover_stats
+from utils.participation import participation_stats, streak
+from utils.immutable_cache import immutable_cache
+from utils.local_cache import local_cache
+from utils.redis.init import ping_redis
+from utils.security import get_internal_access
+from utils.web3_registry import get_rpc_stats
+from utils.log import log as logger
+
+router = APIRouter(dependencies=[Depends(get_internal_access)])
+
+
+## internal
+
+@router.get("/stats")
+async def internal_stats():
+    """Per-worker pool statistics"""
+    logger.info(f"GET /api/internal/stats")
+    return {
+        "code": 200,
+        "success": True,
+        "msg": "Success",
+        "data": {
+            "mysql": get_db_pool_stats(),
+            "redis": {
+                "master": await ping_redis(True),
+                "slave": await ping_redis(False),
+            },
+            "immutable_cache": immutable_cache.stats(),
+            "l1_cache": local_cache.stats(),
+            "get_or_load": get_or_load_stats,
+            "day_rollover": await get_rollover_stats(),
+        },
+    }
+
+
+@router.get("/rpc")
+async def internal_rpc():
+    """Per-worker RPC endpoint scores and latency histograms"""
+    logger.info(f"GET /api/internal/rpc")
+    return {"code": 200, "success": True, "msg": "Success", "data": get_rpc_stats()}
+
+
+@router.get("/cache")
+async def internal_cache():
+    """Per-worker cache metrics by key family, and the hottest keys"""
+    logger.info(f"GET /api/internal/cache")
+    return {"code": 200, "success": True, "msg": "Success", "data": cache_metrics.stats()}
+
+
+@router.get("/participation")
+async def internal_participation(day: str | None = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$"), days: int = Query(7, ge=1, le=60), address: str | None = None):
+    """Daily users, streaks and retention from the participation bitmaps; address: its current streak"""
+    logger.info(f"GET /api/internal/participation - day: {day} days: {days} address: {address}")
+    try:
+        data = await participation_stats(day, days)
+        if address:
+            data['address_streak'] = await streak(address, today=day, days=days)
+    except Exception as e:
+        logger.error(f"/api/internal/participation except ERROR: {str(e)}")
+        return {"code": 500, "success": False, "msg": "Server error"}
+    return {"code": 200, "success": True, "msg": "Success", "data": data}
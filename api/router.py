@@ -4,9 +4,11 @@ from fastapi import APIRouter
 
 from api.ai import router as ai_router
 from api.emotion import router as emotion_router
+from api.internal import router as internal_router
 
 # v1 = APIRouter()
 router = APIRouter(prefix="/api")
 
 router.include_router(ai_router, prefix="/ai", tags=["AI"])
 router.include_router(emotion_router, prefix="/emotion", tags=["Emotion"])
+router.include_router(internal_router, prefix="/internal", tags=["Internal"], include_in_schema=False)
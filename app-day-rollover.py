@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import argparse
+import asyncio
+import sys
+from loguru import logger
+
+from api.ai import prewarm_training_state
+from utils.day_rollover import DayRollover
+from utils.redis.init import init_redis, close_redis
+
+"""
+- Pre-warm the next day's user state of active users shortly before local midnight
+- --once: run now for the coming day (or --day) and exit
+"""
+
+# ------------------------------------------------------------------------------------
+
+async def day_rollover(once, day):
+    logger.info(f"day_rollover start")
+    await init_redis()
+    rollover = DayRollover(prewarm_training_state)
+    try:
+        if once:
+            await rollover.run(day)
+        else:
+            await rollover.run_forever()
+    finally:
+        await close_redis()
+    logger.info(f"day_rollover end")
+
+
+if __name__ == "__main__":
+    # argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-d', '--debug', type=bool, default=False, action=argparse.BooleanOptionalAction)
+    parser.add_argument('-l', '--log', type=str, default="info")
+    parser.add_argument('--once', action='store_true', help="run now and exit")
+    parser.add_argument('--day', type=str, default=None, help="YYYY-MM-DD to pre-warm with --once, default tomorrow")
+    args = parser.parse_args()
+    run_debug = bool(args.debug)
+    run_log = str(args.log.lower())
+
+    # log level
+    if run_debug:
+        log_level = "DEBUG"
+    else:
+        if run_log == "debug":
+            log_level = "DEBUG"
+        elif run_log == "info":
+            log_level = "INFO"
+        elif run_log == "warn":
+            log_level = "WARNING"
+        elif run_log == "error":
+            log_level = "ERROR"
+        else:
+            log_level = "WARNING"
+    logger.remove()
+    logger.add(sys.stdout, level=log_level)
+
+    asyncio.run(day_rollover(args.once, args.day))
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import argparse
+import sys
+from loguru import logger
+
+import pymysql
+
+from utils.migrations import load_migrations, applied_migrations, migrate
+from config import DB_CONFIG
+
+"""
+- Apply the schema migrations (migrations/*.sql) to the master, in version order
+- --status: applied and pending versions; --dry-run: print the statements only
+- New install: create_tables.sql, then this script
+"""
+
+# ------------------------------------------------------------------------------------
+
+def schema_migrate(status, dry_run, target):
+    conn = pymysql.connect(
+        host=DB_CONFIG['master'],
+        port=DB_CONFIG['port'],
+        user=DB_CONFIG['username'],
+        passwd=DB_CONFIG['password'],
+        db=DB_CONFIG['database'],
+        charset='utf8mb4',
+    )
+    try:
+        if status:
+            applied = applied_migrations(conn.cursor(pymysql.cursors.DictCursor))
+            for migration in load_migrations():
+                state = "applied" if migration.version in applied else "pending"
+                logger.info(f"{migration.version}_{migration.name}: {state}")
+            return
+        done = migrate(conn, target, dry_run)
+        logger.info(f"schema_migrate - {'would apply' if dry_run else 'applied'}: {[one.version for one in done]}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    # argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-d', '--debug', type=bool, default=False, action=argparse.BooleanOptionalAction)
+    parser.add_argument('-l', '--log', type=str, default="info")
+    parser.add_argument('--status', action='store_true', help="list applied and pending migrations")
+    parser.add_argument('--dry-run', action='store_true', help="print the pending statements, change nothing")
+    parser.add_argument('--target', type=str, default=None, help="stop after this version, e.g. 0001")
+    args = parser.parse_args()
+    run_debug = bool(args.debug)
+    run_log = str(args.log.lower())
+
+    # log level
+    if run_debug:
+        log_level = "DEBUG"
+    else:
+        if run_log == "debug":
+            log_level = "DEBUG"
+        elif run_log == "info":
+            log_level = "INFO"
+        elif run_log == "warn":
+            log_level = "WARNING"
+        elif run_log == "error":
+            log_level = "ERROR"
+        else:
+            log_level = "WARNING"
+    logger.remove()
+    logger.add(sys.stdout, level=log_level)
+
+    schema_migrate(args.status, args.dry_run, args.target)
@@ -7,14 +7,16 @@ import json
 import random
 import sys
 import time
-from web3 import Web3
 from loguru import logger
 from datetime import datetime as dt
 
 import pymysql
 
-from utils.cache import get_redis_data, set_redis_data, del_redis_data
-from utils.web3_tools import get_web3_config_by_chainid
+from utils.cache import get_redis_data, set_redis_data, delete_many
+from utils.web3_registry import get_chain_client
+from utils.emotion_contract import PeriodSnapshot, read_settled_periods, cache_settled_period
+from utils.period_projection import project_period, publish_projection
+from utils.period_settlement import SETTLE_QUERY, settle_values
 from config import DB_CONFIG, WEB3_WHITE_PRIKEY
 
 """
@@ -23,139 +25,8 @@ from config import DB_CONFIG, WEB3_WHITE_PRIKEY
 
 issue_index = 0
 
-# ABI
-contract_abi_emotion = [
-        {
-            "inputs": [],
-            "name": "userProportion",
-            "outputs": [
-                { "internalType": "uint8", "name": "", "type": "uint256" }
-            ],
-            "stateMutability": "view",
-            "type": "function"
-        },
-        {
-            "inputs": [
-                { "internalType": "uint256", "name": "newUserProportion", "type": "uint256" }
-            ],
-            "name": "setProportion",
-            "outputs": [],
-            "stateMutability": "nonpayable",
-            "type": "function"
-        },
-        {
-            "inputs": [
-                { "internalType": "uint256", "name": "", "type": "uint256" }
-            ],
-            "name": "IssueReward",
-            "outputs": [
-                { "internalType": "uint256", "name": "", "type": "uint256" }
-            ],
-            "stateMutability": "view",
-            "type": "function"
-        },
-        {
-            "inputs": [],
-            "name": "Issue",
-            "outputs": [
-                { "internalType": "uint256", "name": "", "type": "uint256" }
-            ],
-            "stateMutability": "view",
-            "type": "function"
-        },
-        {
-            "inputs": [
-                { "internalType": "uint256", "name": "", "type": "uint256" }
-            ],
-            "name": "IssueAddressNum",
-            "outputs": [
-                { "internalType": "uint256", "name": "", "type": "uint256" }
-            ],
-            "stateMutability": "view",
-            "type": "function"
-        },
-        {
-            "inputs": [
-                { "internalType": "uint256", "name": "", "type": "uint256" }
-            ],
-            "name": "IssueInformation",
-            "outputs": [
-                { "internalType": "uint256", "name": "duration", "type": "uint256" },
-                { "internalType": "uint256", "name": "price", "type": "uint256" },
-                { "internalType": "uint256", "name": "putmoney", "type": "uint256" }
-            ],
-            "stateMutability": "view",
-            "type": "function"
-        },
-        {
-            "inputs": [
-                { "internalType": "uint256", "name": "", "type": "uint256" }
-            ],
-            "name": "IssueEmotion",
-            "outputs": [
-                { "internalType": "uint256", "name": "", "type": "uint256" }
-            ],
-            "stateMutability": "view",
-            "type": "function"
-        },
-        {
-            "inputs": [
-                { "internalType": "uint256", "name": "_Issue", "type": "uint256" },
-                { "internalType": "uint256", "name": "_num", "type": "uint256" }
-            ],
-            "name": "getIssueEmotionAddrslength",
-            "outputs": [
-                { "internalType": "uint256", "name": "", "type": "uint256" }
-            ],
-            "stateMutability": "view",
-            "type": "function"
-        },
-        {
-			"inputs": [],
-			"name": "openVRFRandomEmotions",
-			"outputs": [],
-			"stateMutability": "nonpayable",
-			"type": "function"
-		},
-        {
-            "inputs": [],
-            "name": "openEmotions",
-            "outputs": [],
-            "stateMutability": "nonpayable",
-            "type": "function"
-        },
-        {
-            "inputs": [
-                { "internalType": "uint256", "name": "_duration", "type": "uint256" },
-                { "internalType": "uint256", "name": "_price", "type": "uint256" },
-                { "internalType": "uint256", "name": "_putmoney", "type": "uint256" }
-            ],
-            "name": "openNewIssue",
-            "outputs": [],
-            "stateMutability": "nonpayable",
-            "type": "function"
-        },
-    ]
-
-
 # ------------------------------------------------------------------------------------
 
-def web3_is_connected_with_retry(web3_obj, max_retries=5, retry_interval=2):
-    attempt = 0
-    while attempt < max_retries:
-        try:
-            connected = web3_obj.is_connected()
-            return connected
-        except Exception as e:
-            logger.error(f"Attempt {attempt + 1} failed: {e}")
-            attempt += 1
-            if attempt < max_retries:
-                logger.debug(f"Retrying in {retry_interval} seconds...")
-                time.sleep(retry_interval)
-            else:
-                logger.error("Max retries reached. Failed to is_connected.")
-                return 0
-
 def send_transaction(web3_obj, transaction):
         try:
             logger.info(f"transaction: {transaction}")
@@ -209,6 +80,96 @@ def send_transaction(web3_obj, transaction):
             logger.error(f"Failed to eth.send_raw_transaction: {str(e)}")
             return False, {"tx_hash": "send_raw_transaction", "msg": str(e)}
 
+def insert_settled_period(cursor, chainid, snapshot: PeriodSnapshot):
+    # Insert emotions state 2
+    insert_query = """
+                    INSERT INTO hack_emotions 
+                        (chain_id,period_id,period_putmoney,period_proportion,period_price,period_end,period_emotion,period_average,period_reward,period_total,emotion_positive,emotion_neutral,emotion_negative,status) 
+                    SELECT %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s 
+                    WHERE 
+                        NOT EXISTS (SELECT id FROM hack_emotions WHERE chain_id=%s AND period_id=%s)
+                    """
+    period_id = snapshot.period_id
+    values = (chainid, period_id, snapshot.putmoney, snapshot.proportion, snapshot.price, snapshot.end_timestamp, snapshot.emotion, int(snapshot.average), snapshot.reward, snapshot.total, snapshot.positive, snapshot.neutral, snapshot.negative, 2, chainid, period_id)
+    # logger.debug(f"insert_query: {insert_query} values: {values}")
+    cursor.execute(insert_query, values)
+    cursor.connection.commit()
+    logger.debug(f"insert hack_emotions - status=2")
+
+def update_current_period(cursor, chainid, period_id, end_timestamp, putmoney, price, total, positive, neutral, negative):
+    # A period the database never had (the missing ones were synced past it) gets its row first
+    insert_query = """
+                    INSERT INTO hack_emotions 
+                        (chain_id,period_id,period_duration,period_proportion) 
+                    SELECT chain_id, %s, period_duration, period_proportion 
+                    FROM hack_emotions 
+                    WHERE 
+                        chain_id=%s AND period_id=%s 
+                        AND NOT EXISTS (SELECT id FROM hack_emotions WHERE chain_id=%s AND period_id=%s)
+                    """
+    values = (period_id, chainid, period_id-1, chainid, period_id)
+    cursor.execute(insert_query, values)
+    # Update emotions state 1
+    update_query = """
+                    UPDATE hack_emotions 
+                    SET 
+                        period_end=%s,
+                        period_putmoney=%s,
+                        period_price=%s,
+                        period_total=%s,
+                        emotion_positive=%s,
+                        emotion_neutral=%s,
+                        emotion_negative=%s,
+                        status=%s,
+                        updated_time=NOW()
+                    WHERE 
+                        chain_id=%s AND period_id=%s
+                    """
+    values = (end_timestamp, putmoney, price, total, positive, neutral, negative, 1, chainid, period_id)
+    # logger.debug(f"update_query: {update_query} values: {values}")
+    cursor.execute(update_query, values)
+    cursor.connection.commit()
+
+def open_next_period(cursor, chainid, period_id, start_timestamp, end_timestamp, price, putmoney):
+    # Update emotions state 1
+    update_query = """
+                    UPDATE hack_emotions 
+                    SET 
+                        period_start=%s,
+                        period_end=%s,
+                        period_price=%s,
+                        period_putmoney=%s,
+                        status=%s,
+                        updated_time=NOW() 
+                    WHERE 
+                        chain_id=%s AND period_id=%s
+                    """
+    values = (start_timestamp, end_timestamp, price, putmoney, 1, chainid, period_id)
+    # logger.debug(f"update_query: {update_query} values: {values}")
+    cursor.execute(update_query, values)
+    cursor.connection.commit()
+
+async def sync_missed_periods(cursor, chainid, chain_client, period_ids):
+    # Settled periods missing from the database: cached ones cost no RPC, the rest are one batched read
+    emotion_contract = await chain_client.get_async_emotion_contract()
+    snapshots = await read_settled_periods(emotion_contract, chainid, period_ids, chain_client.multicall_address)
+    current_timestamp = int(time.time())
+    for snapshot in snapshots:
+        logger.debug(f"snapshot: {snapshot}")
+        if snapshot.emotion == 0:
+            continue
+        if current_timestamp < snapshot.end_timestamp:
+            logger.info(f"period_id: {snapshot.period_id} - Please wait {snapshot.end_timestamp - current_timestamp} Seconds")
+            continue
+        insert_settled_period(cursor, chainid, snapshot)
+
+async def refresh_projection(cursor, chainid):
+    # hack_emotion_current and its Redis key, after each change of hack_emotions
+    projection = project_period(cursor, chainid)
+    cursor.connection.commit()
+    await publish_projection(chainid, projection)
+    logger.debug(f"refresh_projection: {projection}")
+
 # ------------------------------------------------------------------------------------
 
 async def open_emotion(chainid):
@@ -252,19 +213,16 @@ async def open_emotion(chainid):
             if max_period_id == 0:
                 raise Exception("The hack_emotions table has no data")
 
-            web3_config = get_web3_config_by_chainid(chainid)
-            logger.debug(f"web3_config: {web3_config}")
-            config_chainid = web3_config['chain_id'] # chain_id
+            chain_client = get_chain_client(chainid)
+            logger.debug(f"web3_config: {chain_client.config}")
+            config_chainid = chain_client.chain_id # chain_id
             if not config_chainid:
                 raise Exception("Web3 chain_id not found")
-            web3_rpc_url = web3_config['server'] # rpc
+            web3_rpc_url = chain_client.rpc_url # rpc
             if not web3_rpc_url:
                 raise Exception("Web3 rpc not found")
-            web3_obj = Web3(Web3.HTTPProvider(web3_rpc_url))
-            # Connecting to the RPC Node
-            while not web3_is_connected_with_retry(web3_obj):
-                logger.error(f"Ooops! Failed to eth.is_connected. {web3_rpc_url}")
-                time.sleep(10)
+            # Connecting to the RPC Node, the keep-alive session is reused across loops
+            web3_obj = chain_client.connect()
 
             # Whitelist address
             sender_address = web3_obj.eth.account.from_key(WEB3_WHITE_PRIKEY).address
@@ -272,12 +230,11 @@ async def open_emotion(chainid):
             logger.debug(f"white_address: {sender_address} balance: {web3_obj.from_wei(sender_balance, 'ether')} ETH")
 
             # emotion
-            emotion_address = web3_config['emotion']
-            emotion_contract_address = Web3.to_checksum_address(emotion_address)
-            emotion_contract = web3_obj.eth.contract(address=emotion_contract_address, abi=contract_abi_emotion)
-            if not (len(emotion_address) == 42 and emotion_address[:2] == '0x'): 
+            emotion_address = chain_client.emotion_address
+            if not chain_client.emotion_address_valid:
                 logger.error(f"Invalid emotion_contract address - {emotion_address}")
                 return {"code": 401, "success": False, "msg": "Invalid emotion_contract address"}
+            emotion_contract = chain_client.emotion_contract
             logger.info(f"emotion_address: {emotion_address}")
 
             ## Get current period_id from smart contract
@@ -294,60 +251,8 @@ async def open_emotion(chainid):
             # Sync missing period data from contract to database
             if current_period_id > max_period_id+1:
                 logger.info(f"current_period_id: {current_period_id} > max_period_id: {max_period_id}")
-                for period_id in range(max_period_id+1, current_period_id):
-                    # Update the parameters of this period
-                    period_emotion = emotion_contract.functions.IssueEmotion(period_id).call()
-                    logger.debug(f"period_emotion: {period_emotion}")
-                    time.sleep(1)
-                    if period_emotion == 0:
-                        continue
-                    period_average = emotion_contract.functions.IssueReward(period_id).call()
-                    logger.debug(f"period_average: {period_average}")
-                    time.sleep(1)
-                    # Number of participants
-                    period_total = emotion_contract.functions.IssueAddressNum(period_id).call()
-                    logger.debug(f"period_total: {period_total}")
-                    time.sleep(1)
-                    period_info = emotion_contract.functions.IssueInformation(period_id).call()
-                    logger.debug(f"period_info: {period_info}")
-                    time.sleep(1)
-                    end_timestamp = period_info[0]  # Current period end timestamp
-                    period_price = period_info[1]    # Current price
-                    period_putmoney = period_info[2]  # Current base position
-                    period_proportion = emotion_contract.functions.userProportion().call()
-                    logger.debug(f"period_proportion: {period_proportion}")
-                    time.sleep(1)
-                    period_reward = period_total * period_price * period_proportion / 100 + period_putmoney
-                    logger.debug(f"period_reward: {period_reward}")
-
-                    if current_timestamp < end_timestamp:
-                        logger.info(f"period_id: {period_id} - Please wait {end_timestamp - current_timestamp} Seconds")
-                        continue
-
-                    # Number of emotional participants
-                    emotion_positive = emotion_contract.functions.getIssueEmotionAddrslength(period_id, 1).call()
-                    logger.debug(f"emotion_positive: {emotion_positive}")
-                    time.sleep(1)
-                    emotion_neutral = emotion_contract.functions.getIssueEmotionAddrslength(period_id, 2).call()
-                    logger.debug(f"emotion_neutral: {emotion_neutral}")
-                    time.sleep(1)
-                    emotion_negative = emotion_contract.functions.getIssueEmotionAddrslength(period_id, 3).call()
-                    logger.debug(f"emotion_negative: {emotion_negative}")
-                    
-                    # Insert emotions state 2
-                    insert_query = """
-                                    INSERT INTO hack_emotions 
-                                        (chain_id,period_id,period_putmoney,period_proportion,period_price,period_end,period_emotion,period_average,period_reward,period_total,emotion_positive,emotion_neutral,emotion_negative,status) 
-                                    SELECT %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s 
-                                    WHERE 
-                                        NOT EXISTS (SELECT id FROM hack_emotions WHERE chain_id=%s AND period_id=%s)
-                                    """
-                                    
-                    values = (chainid, period_id, period_putmoney, period_proportion, period_price,end_timestamp, period_emotion, int(period_average), int(period_reward), period_total, emotion_positive, emotion_neutral, emotion_negative, 2, chainid, period_id)
-                    # logger.debug(f"insert_query: {insert_query} values: {values}")
-                    cursor.execute(insert_query, values)
-                    cursor.connection.commit()
-                    logger.debug(f"insert hack_emotions - status=2")
+                await sync_missed_periods(cursor, chainid, chain_client, list(range(max_period_id+1, current_period_id)))
+                await refresh_projection(cursor, chainid)
                 continue
 
             # Current Information
@@ -375,27 +280,9 @@ async def open_emotion(chainid):
                 time.sleep(1)
                 current_emotion_negative = emotion_contract.functions.getIssueEmotionAddrslength(current_period_id, 3).call()
                 logger.debug(f"emotion_negative: {current_emotion_negative}")
-                # Update emotions state 1
-                update_query = """
-                                UPDATE hack_emotions 
-                                SET 
-                                    period_end=%s,
-                                    period_putmoney=%s,
-                                    period_price=%s,
-                                    period_total=%s,
-                                    emotion_positive=%s,
-                                    emotion_neutral=%s,
-                                    emotion_negative=%s,
-                                    status=%s,
-                                    updated_time=NOW()
-                                WHERE 
-                                    chain_id=%s AND period_id=%s
-                                """
-                values = (end_timestamp, current_period_putmoney, current_period_price, current_period_total,current_emotion_positive,current_emotion_neutral,current_emotion_negative,1, chainid, current_period_id)
-                # logger.debug(f"update_query: {update_query} values: {values}")
-                cursor.execute(update_query, values)
-                cursor.connection.commit()
+                update_current_period(cursor, chainid, current_period_id, end_timestamp, current_period_putmoney, current_period_price, current_period_total, current_emotion_positive, current_emotion_neutral, current_emotion_negative)
                 logger.success(f"update hack_emotions - status=1 current_period_id: {current_period_id} period_end: {end_timestamp} period_price: {current_period_price}")
+                await refresh_projection(cursor, chainid)
 
                 calc_timestamp = end_timestamp - current_timestamp
                 logger.info(f"The {current_period_id} period is in progress - Please wait {calc_timestamp} Seconds")
@@ -518,21 +405,12 @@ async def open_emotion(chainid):
                 logger.success(f"The transaction was send successfully! - transaction: {transaction}")
 
                 if current_period_id < max_period_id:
-                    # Update emotions state 1
-                    update_query = """
-                                    UPDATE hack_emotions 
-                                    SET 
-                                        period_start=%s,
-                                        status=%s,
-                                        updated_time=NOW() 
-                                    WHERE 
-                                        chain_id=%s AND period_id=%s
-                                    """
-                    values = (current_timestamp, 1, chainid, current_period_id+1)
-                    # logger.debug(f"update_query: {update_query} values: {values}")
-                    cursor.execute(update_query, values)
-                    cursor.connection.commit()
+                    # The projection shows the new period as the contract has it
+                    next_period_info = emotion_contract.functions.IssueInformation(current_period_id+1).call()
+                    logger.debug(f"next_period_info: {next_period_info}")
+                    open_next_period(cursor, chainid, current_period_id+1, current_timestamp, next_period_info[0], next_period_info[1], next_period_info[2])
                     logger.success(f"update hack_emotions - status=1 next_period_id: {current_period_id+1}")
+                    await refresh_projection(cursor, chainid)
                 time.sleep(10)
 
                 # Has the share ratio changed?
@@ -582,33 +460,28 @@ async def open_emotion(chainid):
                 current_emotion_negative = emotion_contract.functions.getIssueEmotionAddrslength(current_period_id, 3).call()
                 logger.debug(f"emotion_negative: {current_emotion_negative}")
 
+                snapshot = PeriodSnapshot(
+                    period_id=current_period_id,
+                    end_timestamp=end_timestamp,
+                    price=current_period_price,
+                    putmoney=current_period_putmoney,
+                    proportion=period_proportion,
+                    total=current_period_total,
+                    emotion=current_emotion,
+                    average=current_period_average,
+                    positive=current_emotion_positive,
+                    neutral=current_emotion_neutral,
+                    negative=current_emotion_negative,
+                )
                 # Update emotions state 2
-                update_query = """
-                                UPDATE hack_emotions 
-                                SET 
-                                    period_end=%s,
-                                    period_putmoney=%s,
-                                    period_price=%s,
-                                    period_emotion=%s,
-                                    period_average=%s,
-                                    period_reward=%s,
-                                    period_total=%s,
-                                    emotion_positive=%s,
-                                    emotion_neutral=%s,
-                                    emotion_negative=%s,
-                                    status=%s,
-                                    updated_time=NOW() 
-                                WHERE 
-                                    chain_id=%s AND period_id=%s
-                                """
-                values = (end_timestamp, current_period_putmoney, current_period_price, current_emotion, int(current_period_average), int(current_period_reward), current_period_total, current_emotion_positive, current_emotion_neutral, current_emotion_negative, 2, chainid, current_period_id)
-                # logger.debug(f"update_query: {update_query} values: {values}")
-                cursor.execute(update_query, values)
+                cursor.execute(SETTLE_QUERY, settle_values(chainid, snapshot))
                 cursor.connection.commit()
                 logger.success(f"update hack_emotions - status=2 current_period_id: {current_period_id} reward: {current_period_reward} average: {current_period_average}")
+                # The period is closed now: its views are final
+                await cache_settled_period(chainid, emotion_address, snapshot)
 
-                await del_redis_data(True, f"hackathon:period:{config_chainid}:current")
-                await del_redis_data(True, f"hackathon:period:{config_chainid}:{current_period_id}:list")
+                await refresh_projection(cursor, chainid)
+                await delete_many(True, f"hackathon:period:{config_chainid}:current", f"hackathon:period:{config_chainid}:{current_period_id}:list")
                 
                 issue_index = current_period_id
 
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import argparse
+import asyncio
+import sys
+import time
+from loguru import logger
+
+from utils.cache import redis_batch
+from utils.database import db_pool_slave
+from utils.participation import KINDS, queue_mark
+from utils.redis.init import init_redis, close_redis
+
+"""
+- Build the participation bitmaps (utils.participation) from hack_emotion_training
+- Rows are read in id order, so user ids follow the first training of each address;
+  marking is idempotent, the job can be run again or resumed with --from-id
+"""
+
+# ------------------------------------------------------------------------------------
+
+async def participation_backfill(from_id, chunk, since):
+    logger.info(f"participation_backfill start - from_id: {from_id} since: {since}")
+    await init_redis()
+    start = time.perf_counter()
+    last_id = from_id
+    total = 0
+    try:
+        while True:
+            check_query = """
+                            SELECT id, address, status, date
+                            FROM hack_emotion_training
+                            WHERE id > %s AND status IN (1, 2) AND date >= %s
+                            ORDER BY id ASC
+                            LIMIT %s
+                            """
+            values = (last_id, since, chunk)
+            async with db_pool_slave.cursor() as cursorSlave:
+                await cursorSlave.execute(check_query, values)
+                rows = await cursorSlave.fetchall()
+            if not rows:
+                break
+            async with redis_batch(True) as batch:
+                for row in rows:
+                    if row['address'] and row['date']:
+                        queue_mark(batch, row['address'], row['date'][:10], KINDS[int(row['status'])])
+            last_id = rows[-1]['id']
+            total += len(rows)
+            logger.info(f"participation_backfill - rows: {total} last_id: {last_id}")
+    finally:
+        await db_pool_slave.close()
+        await close_redis()
+    logger.info(f"participation_backfill end - rows: {total} last_id: {last_id} seconds: {time.perf_counter() - start:.1f}")
+
+
+if __name__ == "__main__":
+    # argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-d', '--debug', type=bool, default=False, action=argparse.BooleanOptionalAction)
+    parser.add_argument('-l', '--log', type=str, default="info")
+    parser.add_argument('--from-id', type=int, default=0, help="resume after this hack_emotion_training id")
+    parser.add_argument('--chunk', type=int, default=5000)
+    parser.add_argument('--since', type=str, default="", help="YYYY-MM-DD, only rows of this day and later")
+    args = parser.parse_args()
+    run_debug = bool(args.debug)
+    run_log = str(args.log.lower())
+
+    # log level
+    if run_debug:
+        log_level = "DEBUG"
+    else:
+        if run_log == "debug":
+            log_level = "DEBUG"
+        elif run_log == "info":
+            log_level = "INFO"
+        elif run_log == "warn":
+            log_level = "WARNING"
+        elif run_log == "error":
+            log_level = "ERROR"
+        else:
+            log_level = "WARNING"
+    logger.remove()
+    logger.add(sys.stdout, level=log_level)
+
+    asyncio.run(participation_backfill(args.from_id, args.chunk, args.since))
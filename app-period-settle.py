@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import argparse
+import asyncio
+import sys
+import time
+from loguru import logger
+
+import pymysql
+
+from utils.cache import delete_many
+from utils.web3_registry import get_chain_client, close_chain_clients
+from utils.emotion_contract import read_settled_periods
+from utils.period_projection import project_period, publish_projection
+from utils.period_settlement import SETTLE_QUERY, settle_values, claim_settlements, retry_settlement
+from utils.redis.init import init_redis, close_redis
+from config import DB_CONFIG
+
+"""
+- Worker of the settlement backfill queue (utils.period_settlement): reads the queued
+  periods from the contract in one batched call per chain and settles them in hack_emotions
+- A period the contract has not closed yet goes back to the queue for later
+- Afterwards the projection and the settled list of the chain are refreshed
+"""
+
+# ------------------------------------------------------------------------------------
+
+async def settle_chain(cursor, chain_id, period_ids):
+    chain_client = get_chain_client(chain_id)
+    if not chain_client.emotion_address_valid:
+        logger.error(f"Invalid emotion_contract address - {chain_client.emotion_address}")
+        return 0
+    emotion_contract = await chain_client.get_async_emotion_contract()
+    snapshots = await read_settled_periods(emotion_contract, chain_id, period_ids, chain_client.multicall_address)
+    current_timestamp = int(time.time())
+    settled = 0
+    for snapshot in snapshots:
+        period_id = snapshot.period_id
+        if snapshot.emotion == 0 or current_timestamp < snapshot.end_timestamp:
+            logger.info(f"chain_id: {chain_id} period_id: {period_id} - not closed yet, retry later")
+            await retry_settlement(chain_id, period_id)
+            continue
+        cursor.execute(SETTLE_QUERY, settle_values(chain_id, snapshot))
+        settled += 1
+    cursor.connection.commit()
+    logger.success(f"update hack_emotions - status=2 chain_id: {chain_id} settled: {settled}/{len(period_ids)}")
+    if settled:
+        projection = project_period(cursor, chain_id)
+        cursor.connection.commit()
+        await publish_projection(chain_id, projection)
+        # The /period fallback snapshot and the settled list, as app-open-emotion.py does after settling
+        keys = [f"hackathon:period:{chain_id}:current"]
+        if projection is not None:
+            keys.append(f"hackathon:period:{chain_id}:{projection['id']}:list")
+        await delete_many(True, *keys)
+    return settled
+
+
+async def period_settle(interval):
+    logger.info(f"period_settle start")
+    await init_redis()
+    try:
+        while True:
+            try:
+                # MySQL database connection
+                conn = pymysql.connect(
+                    host=DB_CONFIG['master'],
+                    port=DB_CONFIG['port'],
+                    user=DB_CONFIG['username'],
+                    passwd=DB_CONFIG['password'],
+                    db=DB_CONFIG['database'],
+                    charset='utf8mb4',
+                    autocommit=True,
+                )
+                cursor = conn.cursor(pymysql.cursors.DictCursor)
+                try:
+                    while True:
+                        jobs = await claim_settlements()
+                        for chain_id, period_ids in jobs.items():
+                            logger.debug(f"chain_id: {chain_id} period_ids: {period_ids}")
+                            try:
+                                await settle_chain(cursor, chain_id, period_ids)
+                            except Exception as e:
+                                logger.error(f"settle_chain {chain_id} {period_ids} error: {e}")
+                                for period_id in period_ids:
+                                    await retry_settlement(chain_id, period_id)
+                        if not jobs:
+                            await asyncio.sleep(interval)
+                finally:
+                    conn.close()
+            except Exception as e:
+                logger.error(f"period_settle error: {e} , Please wait {interval} Seconds")
+                await asyncio.sleep(interval)
+    finally:
+        await close_chain_clients()
+        await close_redis()
+    logger.info(f"period_settle end")
+
+
+if __name__ == "__main__":
+    # argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-d', '--debug', type=bool, default=False, action=argparse.BooleanOptionalAction)
+    parser.add_argument('-l', '--log', type=str, default="info")
+    parser.add_argument('-i', '--interval', type=int, default=5, help="seconds between looks at an empty queue")
+    args = parser.parse_args()
+    run_debug = bool(args.debug)
+    run_log = str(args.log.lower())
+
+    # log level
+    if run_debug:
+        log_level = "DEBUG"
+    else:
+        if run_log == "debug":
+            log_level = "DEBUG"
+        elif run_log == "info":
+            log_level = "INFO"
+        elif run_log == "warn":
+            log_level = "WARNING"
+        elif run_log == "error":
+            log_level = "ERROR"
+        else:
+            log_level = "WARNING"
+    logger.remove()
+    logger.add(sys.stdout, level=log_level)
+
+    asyncio.run(period_settle(args.interval))
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import argparse
+import asyncio
+import sys
+import time
+from loguru import logger
+
+from utils.database import db_pool
+from utils.training_summary import SUMMARY_SAVE_QUERY, empty_summary, add_training, add_deep_training, summary_values
+
+"""
+- Rebuild hack_emotion_training_summary (utils.training_summary) from hack_emotion_training
+- Addresses in order, chunk by chunk; the rows of each address are replayed day by day
+  through the same updates as the live inserts
+- Reads the master: a lagging replica would overwrite fresh summaries with old ones
+"""
+
+# ------------------------------------------------------------------------------------
+
+async def rebuild_chunk(cursor, addresses):
+    placeholders = ", ".join(["%s"] * len(addresses))
+    check_query = f"""
+                    SELECT address, date, detail, status
+                    FROM hack_emotion_training
+                    WHERE address IN ({placeholders}) AND status IN (1, 2)
+                    ORDER BY date ASC, id ASC
+                    """
+    await cursor.execute(check_query, tuple(addresses))
+    rows = await cursor.fetchall()
+    # The column compares case-insensitively
+    summaries = {address.lower(): empty_summary(address) for address in addresses}
+    for row in rows:
+        if not row['date']:
+            continue
+        summary = summaries[row['address'].lower()]
+        if int(row['status']) == 1:
+            add_training(summary, row['date'], row['detail'] or '')
+        else:
+            add_deep_training(summary, row['date'], row['detail'] or '')
+    await cursor.executemany(SUMMARY_SAVE_QUERY, [summary_values(summary) for summary in summaries.values()])
+    return len(rows)
+
+
+async def training_summary_rebuild(address, from_address, chunk):
+    logger.info(f"training_summary_rebuild start - address: {address} from_address: {from_address}")
+    start = time.perf_counter()
+    last_address = from_address
+    total = rows = 0
+    try:
+        async with db_pool.cursor() as cursor:
+            if address:
+                rows += await rebuild_chunk(cursor, [address])
+                total = 1
+            while not address:
+                check_query = """
+                                SELECT DISTINCT address
+                                FROM hack_emotion_training
+                                WHERE address > %s
+                                ORDER BY address ASC
+                                LIMIT %s
+                                """
+                values = (last_address, chunk)
+                await cursor.execute(check_query, values)
+                addresses = [row['address'] for row in await cursor.fetchall()]
+                if not addresses:
+                    break
+                rows += await rebuild_chunk(cursor, addresses)
+                last_address = addresses[-1]
+                total += len(addresses)
+                logger.info(f"training_summary_rebuild - addresses: {total} rows: {rows} last_address: {last_address}")
+    finally:
+        await db_pool.close()
+    logger.info(f"training_summary_rebuild end - addresses: {total} rows: {rows} seconds: {time.perf_counter() - start:.1f}")
+
+
+if __name__ == "__main__":
+    # argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-d', '--debug', type=bool, default=False, action=argparse.BooleanOptionalAction)
+    parser.add_argument('-l', '--log', type=str, default="info")
+    parser.add_argument('--address', type=str, default="", help="rebuild this address only")
+    parser.add_argument('--from-address', type=str, default="", help="resume after this address")
+    parser.add_argument('--chunk', type=int, default=500, help="addresses per round")
+    args = parser.parse_args()
+    run_debug = bool(args.debug)
+    run_log = str(args.log.lower())
+
+    # log level
+    if run_debug:
+        log_level = "DEBUG"
+    else:
+        if run_log == "debug":
+            log_level = "DEBUG"
+        elif run_log == "info":
+            log_level = "INFO"
+        elif run_log == "warn":
+            log_level = "WARNING"
+        elif run_log == "error":
+            log_level = "ERROR"
+        else:
+            log_level = "WARNING"
+    logger.remove()
+    logger.add(sys.stdout, level=log_level)
+
+    asyncio.run(training_summary_rebuild(args.address, args.from_address, args.chunk))
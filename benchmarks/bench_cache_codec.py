@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+- Cache codec: old JSON text (is_json + json.loads on read) vs the versioned
+  binary codec, with and without zstd; encode/decode CPU and Redis memory
+
+    python -m benchmarks.bench_cache_codec -n 20000
+    python -m benchmarks.bench_cache_codec -n 20000 --no-redis
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+from loguru import logger
+from redis.exceptions import ResponseError
+
+from utils.cache_codec import CacheCodec
+from utils.serialization_tools import is_json
+
+
+def period_list(count: int) -> list:
+    """Rows of /period-history (hack_emotions, status=2)"""
+    return [{
+        "id": 1000 - index,
+        "timestamp": 1735000000 + index * 3600,
+        "emotion": random.randint(1, 3),
+        "average": random.randint(0, 100),
+        "duration": 3600,
+        "reward": random.randint(10 ** 17, 10 ** 18),
+        "total": random.randint(0, 500),
+        "positive": random.randint(0, 200),
+        "neutral": random.randint(0, 200),
+        "negative": random.randint(0, 200),
+    } for index in range(count)]
+
+
+def chat_transcript(turns: int) -> list:
+    """Pending conversation of /api/ai/chat"""
+    words = "today I feel the market is moving and my mood follows it closely again".split()
+    return [{
+        "role": "user" if index % 2 == 0 else "assistant",
+        "content": " ".join(random.choice(words) for _ in range(60 if index % 2 else 25)),
+    } for index in range(turns)]
+
+
+def legacy_encode(value) -> str:
+    return json.dumps(value)
+
+
+def legacy_decode(data: str):
+    # What get_redis_data did: parse once to check, then parse again
+    if is_json(data):
+        return json.loads(data)
+    return data
+
+
+def timed(func, arg, total: int) -> float:
+    start = time.perf_counter()
+    for _ in range(total):
+        func(arg)
+    return (time.perf_counter() - start) / total * 1e6
+
+
+async def redis_memory(entries: dict) -> dict:
+    from utils.cache import get_redis_connection
+    from utils.redis.init import init_redis, close_redis
+    await init_redis()
+    usage = {}
+    try:
+        async with get_redis_connection(True) as cache:
+            for name, data in entries.items():
+                key = f"hackathon:bench:codec:{name}"
+                await cache.set(key, data)
+                try:
+                    usage[name] = await cache.memory_usage(key)
+                except ResponseError:
+                    # Servers without MEMORY USAGE: value length only
+                    usage[name] = await cache.strlen(key)
+                await cache.delete(key)
+    finally:
+        await close_redis()
+    return usage
+
+
+async def main(total: int, use_redis: bool):
+    payloads = {
+        "period-history (10)": period_list(10),
+        "period-history (200)": period_list(200),
+        "chat (12 turns)": chat_transcript(12),
+    }
+    codecs = {
+        "json text": (legacy_encode, legacy_decode),
+        "codec": (CacheCodec(compress_min=0).encode, CacheCodec(compress_min=0).decode),
+        "codec+zstd": (CacheCodec().encode, CacheCodec().decode),
+    }
+    entries = {}
+    rows = []
+    for payload_name, payload in payloads.items():
+        for codec_name, (encode, decode) in codecs.items():
+            data = encode(payload)
+            assert decode(data) == payload
+            entries[f"{payload_name}|{codec_name}"] = data
+            rows.append((payload_name, codec_name, len(data), timed(encode, payload, total), timed(decode, data, total)))
+
+    usage = await redis_memory(entries) if use_redis else {}
+    print(f"{'payload':<22}{'codec':<12}{'bytes':>8}{'redis':>8}{'encode us':>11}{'decode us':>11}")
+    for payload_name, codec_name, size, encode_us, decode_us in rows:
+        memory = usage.get(f"{payload_name}|{codec_name}") or "-"
+        print(f"{payload_name:<22}{codec_name:<12}{size:>8}{memory:>8}{encode_us:>11.2f}{decode_us:>11.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--total', type=int, default=20000)
+    parser.add_argument('--no-redis', action='store_true', help="skip MEMORY USAGE")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stdout, level="ERROR")
+
+    asyncio.run(main(args.total, not args.no_redis))
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+- AI chat transcript per turn: the whole JSON value read, appended and written
+  back (old /chat + aichat_response_sync) vs the capped list of utils.chat_history
+- Conversations of 12 turns; bytes written per turn and time per turn
+
+    python -m benchmarks.bench_chat_history -n 200
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+from loguru import logger
+from redis.client import NEVER_DECODE
+
+from utils.cache import get_redis_connection
+from utils.chat_history import ChatHistory
+from utils.redis.init import init_redis, close_redis
+
+TURNS = 12
+WORDS = "today I feel the market is moving and my mood follows it closely again".split()
+
+
+def message(words: int) -> str:
+    return " ".join(random.choice(WORDS) for _ in range(words))
+
+
+async def json_conversation(address: str) -> tuple[int, int]:
+    """Returns (bytes written, bytes read)"""
+    key = f"hackathon:bench:aichat:{address}:pending"
+    written = read = 0
+    async with get_redis_connection(True) as cache:
+        history = [{"role": "assistant", "content": message(60)}]
+        data = json.dumps(history)
+        await cache.set(key, data, ex=1800)
+        written += len(data)
+        for _ in range(TURNS // 2):
+            # /chat: read, de-duplicate, append the user message, write back
+            data = await cache.get(key)
+            read += len(data)
+            conversation_list = json.loads(data)
+            history = [turn for index, turn in enumerate(conversation_list) if index == 0 or turn != conversation_list[index - 1]]
+            history.append({"role": "user", "content": message(25)})
+            data = json.dumps(history)
+            await cache.set(key, data, ex=1800)
+            written += len(data)
+            # aichat_response_sync: append the answer, write everything again
+            history.append({"role": "assistant", "content": message(60)})
+            data = json.dumps(history)
+            await cache.set(key, data, ex=1800)
+            written += len(data)
+        await cache.delete(key)
+    return written, read
+
+
+async def list_conversation(address: str) -> tuple[int, int]:
+    history = ChatHistory(f"bench:{address}")
+    written = read = 0
+
+    async def save():
+        nonlocal written
+        written += sum(len(args[-1]) for command, args in history._ops if command in ("rpush", "lset"))
+        await history.save()
+
+    history.append("assistant", message(60))
+    await save()
+    for _ in range(TURNS // 2):
+        async with get_redis_connection(True) as cache:
+            # /chat still reads the transcript: the model gets all of it
+            read += sum(len(item) for item in await cache.execute_command("LRANGE", history.key, 0, -1, **{NEVER_DECODE: []}))
+        history.append("user", message(25))
+        await save()
+        history.append("assistant", message(60))
+        await save()
+    async with get_redis_connection(True) as cache:
+        await cache.delete(history.key)
+    return written, read
+
+
+async def run(name, conversation, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    written = read = 0
+
+    async def one(index):
+        nonlocal written, read
+        async with semaphore:
+            w, r = await conversation(f"0x{index:040x}")
+            written += w
+            read += r
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(total)))
+    elapsed = time.perf_counter() - start
+    turns = total * TURNS
+    print(f"{name:<12} written/turn: {written / turns:8.1f} B  read/turn: {read / turns:8.1f} B  ms/turn: {elapsed / turns * 1000:7.3f}")
+
+
+async def main(total, concurrency):
+    await init_redis()
+    try:
+        await run("json blob", json_conversation, total, concurrency)
+        await run("capped list", list_conversation, total, concurrency)
+    finally:
+        await close_redis()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--total', type=int, default=200, help="conversations of 12 turns")
+    parser.add_argument('-c', '--concurrency', type=int, default=20)
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stdout, level="ERROR")
+
+    asyncio.run(main(args.total, args.concurrency))
@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+- Query-plan regression check: seeds a scratch database on a local MySQL with millions
+  of rows, applies migrations/, then EXPLAINs every SQL statement of api/*.py, utils/*.py
+  and the daemons; exits 1 when one of them scans a whole table (type ALL or index)
+- The database given by --database is dropped and rebuilt, never point it at real data
+
+    python -m benchmarks.bench_query_plans -n 2000000 --periods 100000
+    python -m benchmarks.bench_query_plans --no-seed            # plans only, data kept
+    python -m benchmarks.bench_query_plans --no-migrate         # the plans without the indexes
+"""
+import argparse
+import ast
+import glob
+import os
+import random
+import re
+import sys
+import time
+
+import pymysql
+from loguru import logger
+
+from config import DB_CONFIG
+from utils.migrations import split_statements, migrate
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCES = ["api/*.py", "utils/*.py", "app-*.py", "web3-*.py"]
+SQL_START = re.compile(r"^\s*(SELECT|UPDATE|INSERT|DELETE|WITH)\s")
+FULL_SCANS = ("ALL", "index")
+
+CHAINS = [11155111, 84532, 43113]
+NETWORKS = ["eth", "base", "avax", "bsc"]
+DAYS = 365
+USERS_PER_ROW = 20      # one user per 20 training rows
+SEED_BATCH = 10000
+
+# f-string parts of the statements
+FORMAT_SAMPLES = {
+    "trainnetwork": "eth",
+    "emotion_columns[period_emotion]": "emotion_positive",
+    "placeholders": "%s",
+}
+SQL_KEYWORDS = {"AND", "OR", "IN", "NOT", "IS", "BETWEEN"}
+
+
+def address_of(index: int) -> str:
+    return "0x%040x" % index
+
+
+def tx_hash_of(index: int) -> str:
+    return "0x%064x" % index
+
+
+def day_of(index: int) -> str:
+    return time.strftime("%Y-%m-%d", time.localtime(time.time() - (DAYS - index) * 86400))
+
+
+# ------------------------------------------------------------------------------------
+
+def extract_statements() -> list[tuple[str, str]]:
+    """(file:line, sql) of the string literals that are SQL on the seeded tables"""
+    statements = []
+    for pattern in SOURCES:
+        for path in sorted(glob.glob(os.path.join(REPO, pattern))):
+            with open(path, encoding="utf-8") as f:
+                tree = ast.parse(f.read())
+            inner = set()
+            for node in ast.walk(tree):
+                if isinstance(node, ast.JoinedStr):
+                    inner.update(id(value) for value in node.values)
+            for node in ast.walk(tree):
+                if id(node) in inner:
+                    continue
+                if isinstance(node, ast.Constant) and isinstance(node.value, str):
+                    sql = node.value
+                elif isinstance(node, ast.JoinedStr):
+                    sql = "".join(
+                        value.value if isinstance(value, ast.Constant) else FORMAT_SAMPLES.get(ast.unparse(value.value), "{?}")
+                        for value in node.values
+                    )
+                else:
+                    continue
+                if SQL_START.match(sql) and "hack_" in sql:
+                    statements.append((f"{os.path.relpath(path, REPO)}:{node.lineno}", sql))
+    return statements
+
+
+def bind(sql: str, samples: dict) -> str:
+    """Each %s replaced by a seeded value for the column in front of it"""
+    parts = sql.split("%s")
+    bound = parts[0]
+    for part in parts[1:]:
+        names = re.findall(r"[A-Za-z_][A-Za-z_0-9]*", bound[-80:])
+        column = next((name for name in reversed(names) if name.upper() not in SQL_KEYWORDS), "")
+        if column.startswith("trainid_"):
+            column = "trainid"
+        bound += samples.get(column, "0") + part
+    return bound
+
+
+# ------------------------------------------------------------------------------------
+
+def seed(cursor, rows: int, periods: int):
+    rng = random.Random(7)
+    users = max(1, rows // USERS_PER_ROW)
+    with open(os.path.join(REPO, "create_tables.sql"), encoding="utf-8") as f:
+        for statement in split_statements(f.read()):
+            if not statement.upper().startswith("CREATE DATABASE"):
+                cursor.execute(statement)
+    cursor.execute("DROP TABLE IF EXISTS schema_migrations")
+
+    start = time.perf_counter()
+    insert_query = """
+                    INSERT INTO hack_emotions
+                        (chain_id, period_id, period_duration, period_end, period_emotion, period_total, status)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    """
+    # create_tables.sql has periods 1-10 of each chain
+    values = [
+        (chain_id, period_id, 86400, period_id * 86400, rng.randint(1, 3), rng.randint(0, 500), 2 if period_id < periods else 1)
+        for chain_id in CHAINS for period_id in range(11, periods + 1)
+    ]
+    for index in range(0, len(values), SEED_BATCH):
+        cursor.executemany(insert_query, values[index:index + SEED_BATCH])
+    logger.info(f"hack_emotions: {len(values)} rows, {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    insert_query = """
+                    INSERT INTO hack_emotion_training
+                        (address, detail, status, date, trainid_eth, trainid_base, trainid_avax, trainid_bsc, created_time)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    """
+    for index in range(0, rows, SEED_BATCH):
+        values = []
+        for one in range(index, min(rows, index + SEED_BATCH)):
+            day = one * DAYS // rows
+            status = rng.choice((1, 2))
+            trainids = [0] * len(NETWORKS)
+            if status == 2:
+                trainids[rng.randrange(len(NETWORKS))] = one
+            created = time.localtime(time.time() - (DAYS - day) * 86400 + rng.randrange(86400))
+            # One in 50 details is not an emotion result (letters), never listed
+            detail = "error" if one % 50 == 0 else f"{rng.randint(1, 3)}_{rng.randint(0, 99)}"
+            values.append((address_of(rng.randrange(users)), detail, status, day_of(day), *trainids,
+                           time.strftime("%Y-%m-%d %H:%M:%S", created)))
+        cursor.executemany(insert_query, values)
+    logger.info(f"hack_emotion_training: {rows} rows, {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    insert_query = """
+                    INSERT INTO hack_emotion_onchain
+                        (address, tx_chainid, tx_hash, period_id, period_emotion, status)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                    """
+    for index in range(0, rows, SEED_BATCH):
+        values = [
+            (address_of(rng.randrange(users)), str(CHAINS[0]), tx_hash_of(one), rng.randint(1, periods), rng.randint(1, 3), 1)
+            for one in range(index, min(rows, index + SEED_BATCH))
+        ]
+        cursor.executemany(insert_query, values)
+    logger.info(f"hack_emotion_onchain: {rows} rows, {time.perf_counter() - start:.1f}s")
+
+    cursor.connection.commit()
+    cursor.execute("ANALYZE TABLE hack_emotions, hack_emotion_training, hack_emotion_onchain")
+    cursor.fetchall()
+
+
+def explain(cursor, statements, samples, verbose) -> list[str]:
+    """Locations of the statements with a full scan"""
+    failed = []
+    for location, sql in statements:
+        bound = bind(sql, samples)
+        try:
+            cursor.execute("EXPLAIN " + bound)
+            plan = cursor.fetchall()
+        except pymysql.err.MySQLError as e:
+            logger.error(f"{location} EXPLAIN failed: {e.args}\n{bound}")
+            failed.append(location)
+            continue
+        # <derivedN>/<subqueryN> are temporary tables, the INSERT row is the insert target
+        scans = [
+            row for row in plan
+            if row['type'] in FULL_SCANS and row['select_type'] != "INSERT" and not (row['table'] or "").startswith("<")
+        ]
+        if scans:
+            failed.append(location)
+        if scans or verbose:
+            print(f"{'FULL SCAN' if scans else 'ok':<9} {location}")
+            for row in plan:
+                print(f"          {row['select_type']:<18} {str(row['table']):<22} {str(row['type']):<7} "
+                      f"key: {str(row['key']):<28} rows: {row['rows']}")
+    return failed
+
+
+def main(args):
+    conn = pymysql.connect(host=args.host, port=args.port, user=args.user, passwd=args.password, charset='utf8mb4')
+    try:
+        cursor = conn.cursor(pymysql.cursors.DictCursor)
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{args.database}` charset utf8mb4")
+        conn.select_db(args.database)
+        if not args.no_seed:
+            seed(cursor, args.rows, args.periods)
+        if not args.no_migrate:
+            start = time.perf_counter()
+            done = migrate(conn)
+            logger.info(f"migrations: {[one.version for one in done]}, {time.perf_counter() - start:.1f}s")
+
+        users = max(1, args.rows // USERS_PER_ROW)
+        samples = {
+            "address": f"'{address_of(users // 2)}'",
+            "date": f"'{day_of(DAYS // 2)}'",
+            "status": "1",
+            "chain_id": str(CHAINS[0]),
+            "period_id": str(args.periods // 2),
+            "tx_hash": f"'{tx_hash_of(args.rows // 2)}'",
+            "id": str(args.rows // 2),
+            "trainid": str(args.rows // 2),
+            "FROM_UNIXTIME": str(int(time.time()) - 7 * 86400),
+            "LIMIT": "10",
+        }
+        statements = extract_statements()
+        failed = explain(cursor, statements, samples, args.verbose)
+    finally:
+        conn.close()
+    print(f"statements: {len(statements)}  full scans: {len(failed)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--rows", type=int, default=2000000, help="rows of hack_emotion_training and of hack_emotion_onchain")
+    parser.add_argument("--periods", type=int, default=100000, help="periods per chain in hack_emotions")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DB_CONFIG['port'])
+    parser.add_argument("--user", type=str, default=DB_CONFIG['username'])
+    parser.add_argument("--password", type=str, default=DB_CONFIG['password'])
+    parser.add_argument("--database", type=str, default="hack_bench_plans")
+    parser.add_argument("--no-seed", action="store_true", help="keep the data of the last run")
+    parser.add_argument("--no-migrate", action="store_true")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print every plan")
+    args = parser.parse_args()
+    logger.remove()
+    logger.add(sys.stderr, level="INFO")
+    sys.exit(main(args))
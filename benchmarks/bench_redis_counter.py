@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+- Contention on one counter: JSON read-modify-write (EXISTS, GET, SET)
+  vs the server-side HINCRBY of increment_redis_data
+
+    python -m benchmarks.bench_redis_counter -n 2000 -c 50
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from loguru import logger
+
+from utils.cache import get_redis_connection, get_redis_hash, set_redis_hash, increment_redis_data
+from utils.redis.init import init_redis, close_redis
+
+KEY = "hackathon:bench:counter"
+
+
+async def json_increment(key: str):
+    # What increment_redis_data used to do
+    async with get_redis_connection(True) as cache:
+        if await cache.exists(key):
+            data = json.loads(await cache.get(key))
+            data['status'] += 1
+            await cache.set(key, json.dumps(data), ex=86400)
+
+
+async def run(name, increment, read, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await increment()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+    value = await read()
+    print(f"{name:<18} final: {value:>6}  lost updates: {total - value:>6}  ops/sec: {total / elapsed:8.1f}")
+
+
+async def main(total, concurrency):
+    await init_redis()
+    try:
+        async with get_redis_connection(True) as cache:
+            await cache.set(KEY, json.dumps({"detail": "", "status": 0}), ex=86400)
+
+            async def read_json():
+                return json.loads(await cache.get(KEY))['status']
+
+            await run("json read-modify", lambda: json_increment(KEY), read_json, total, concurrency)
+
+        await set_redis_hash(True, KEY, {"detail": "", "status": 0}, ex=86400)
+
+        async def read_hash():
+            return int((await get_redis_hash(True, KEY))['status'])
+
+        await run("hincrby", lambda: increment_redis_data(True, KEY, "status"), read_hash, total, concurrency)
+        async with get_redis_connection(True) as cache:
+            print(f"ttl kept: {await cache.ttl(KEY)}s")
+            await cache.delete(KEY)
+    finally:
+        await close_redis()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--total', type=int, default=2000)
+    parser.add_argument('-c', '--concurrency', type=int, default=50)
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stdout, level="ERROR")
+
+    asyncio.run(main(args.total, args.concurrency))
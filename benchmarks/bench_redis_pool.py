@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+- Redis ops/sec: connect/ping/close per call vs the shared per-worker client
+
+    python -m benchmarks.bench_redis_pool -n 5000 -c 50
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+from loguru import logger
+
+from utils.redis.init import RedisMixin, init_redis, close_redis, get_shared_redis
+
+
+async def per_call_get(key):
+    # Behaviour before the shared client: new client + PING + command + close
+    redis_conn = await RedisMixin().connect_redis
+    try:
+        return await redis_conn.get(key)
+    finally:
+        await redis_conn.aclose()
+
+
+async def shared_get(key):
+    redis_conn = await get_shared_redis(True)
+    return await redis_conn.get(key)
+
+
+async def run(name, func, total, concurrency, key):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await func(key)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+    print(f"{name:<10} ops: {total:>7}  concurrency: {concurrency:>4}  elapsed: {elapsed:8.3f}s  ops/sec: {total / elapsed:10.1f}")
+    return total / elapsed
+
+
+async def main(total, concurrency):
+    key = "hackathon:bench:pool"
+    await init_redis()
+    redis_conn = await get_shared_redis(True)
+    await redis_conn.set(key, "1", ex=300)
+
+    per_call = await run("per-call", per_call_get, total, concurrency, key)
+    shared = await run("shared", shared_get, total, concurrency, key)
+    print(f"speedup: {shared / per_call:.1f}x")
+
+    await redis_conn.delete(key)
+    await close_redis()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--total', type=int, default=5000)
+    parser.add_argument('-c', '--concurrency', type=int, default=50)
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stdout, level="WARNING")
+
+    asyncio.run(main(args.total, args.concurrency))
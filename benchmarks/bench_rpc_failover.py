@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+- RPC failover harness: three local stubs (flaky, tail-latency, slow),
+  single endpoint vs scored failover vs scored failover + hedging
+
+    python -m benchmarks.bench_rpc_failover -n 500 -c 20
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+
+import aiohttp
+from loguru import logger
+from web3 import AsyncWeb3
+
+from benchmarks.rpc_stub import RpcStub
+from utils.rpc_endpoints import EndpointSet, AsyncFailoverHTTPProvider
+from utils.web3_registry import PROVIDER_CACHE_KWARGS
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0
+
+
+async def run(name, provider, total, concurrency):
+    async_w3 = AsyncWeb3(provider)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await async_w3.eth.call({"to": "0x" + "11" * 20, "data": "0x"})
+                latencies.append((time.perf_counter() - start) * 1000)
+            except Exception:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+    print(f"{name:<16} ok: {len(latencies):>6}  errors: {errors:>5}  "
+          f"p50: {statistics.median(latencies) if latencies else 0:8.1f}ms  "
+          f"p95: {percentile(latencies, 0.95):8.1f}ms  p99: {percentile(latencies, 0.99):8.1f}ms  "
+          f"ops/sec: {total / elapsed:8.1f}")
+
+
+async def main(total, concurrency, base_port):
+    stubs = [
+        RpcStub(base_port, latency_ms=15, fail_rate=0.2),                   # fast but flaky
+        RpcStub(base_port + 1, latency_ms=20, tail_ms=800, tail_rate=0.1),  # long tail
+        RpcStub(base_port + 2, latency_ms=120),                             # slow and steady
+    ]
+    for stub in stubs:
+        await stub.start()
+    urls = [stub.url for stub in stubs]
+
+    session = aiohttp.ClientSession()
+    try:
+        single = AsyncFailoverHTTPProvider(EndpointSet(urls[:1]), session, 10, hedge=False, **PROVIDER_CACHE_KWARGS)
+        await run("single (flaky)", single, total, concurrency)
+
+        failover = AsyncFailoverHTTPProvider(EndpointSet(urls), session, 10, hedge=False, **PROVIDER_CACHE_KWARGS)
+        await run("failover", failover, total, concurrency)
+
+        hedged_endpoints = EndpointSet(urls)
+        hedged = AsyncFailoverHTTPProvider(hedged_endpoints, session, 10, hedge=True, **PROVIDER_CACHE_KWARGS)
+        await run("failover+hedge", hedged, total, concurrency)
+        for endpoint in hedged_endpoints.stats():
+            print(json.dumps({key: value for key, value in endpoint.items() if key != "histogram"}))
+    finally:
+        await session.close()
+        for stub in stubs:
+            await stub.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--total', type=int, default=500)
+    parser.add_argument('-c', '--concurrency', type=int, default=20)
+    parser.add_argument('-p', '--port', type=int, default=18600)
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stdout, level="ERROR")
+
+    asyncio.run(main(args.total, args.concurrency, args.port))
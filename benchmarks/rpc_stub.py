@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+- Local JSON-RPC stub with injected latency and failures, for the RPC failover harness
+
+    python -m benchmarks.rpc_stub --port 18545 --latency 20 --tail 500 --tail-rate 0.05 --fail-rate 0.1
+"""
+import argparse
+import asyncio
+import json
+import random
+
+from aiohttp import web
+
+CHAIN_ID = 84532
+RESULT_WORD = "0x" + "00" * 31 + "05"
+
+
+class RpcStub:
+    def __init__(self, port: int, latency_ms: float = 10, tail_ms: float = 0, tail_rate: float = 0, fail_rate: float = 0):
+        self.port = port
+        self.latency_ms = latency_ms
+        self.tail_ms = tail_ms
+        self.tail_rate = tail_rate
+        self.fail_rate = fail_rate
+        self.requests = 0
+        self.failures = 0
+        self._runner: web.AppRunner | None = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def answer(self, request: dict) -> dict:
+        method = request.get('method')
+        if method == "eth_chainId":
+            result = hex(CHAIN_ID)
+        elif method == "web3_clientVersion":
+            result = "rpc-stub/1.0"
+        elif method == "eth_blockNumber":
+            result = hex(1000000)
+        elif method == "eth_call":
+            result = RESULT_WORD
+        else:
+            return {"jsonrpc": "2.0", "id": request.get('id'), "error": {"code": -32601, "message": "Method not found"}}
+        return {"jsonrpc": "2.0", "id": request.get('id'), "result": result}
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        payload = await request.json()
+        delay = self.tail_ms if random.random() < self.tail_rate else self.latency_ms
+        await asyncio.sleep(delay / 1000)
+        if random.random() < self.fail_rate:
+            self.failures += 1
+            return web.Response(status=502, text="bad gateway")
+        if isinstance(payload, list):
+            body = [self.answer(item) for item in payload]
+        else:
+            body = self.answer(payload)
+        return web.Response(text=json.dumps(body), content_type="application/json")
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/", self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, "127.0.0.1", self.port).start()
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+
+async def main(args):
+    stub = RpcStub(args.port, args.latency, args.tail, args.tail_rate, args.fail_rate)
+    await stub.start()
+    print(f"rpc stub on {stub.url}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=18545)
+    parser.add_argument('--latency', type=float, default=10, help="ms")
+    parser.add_argument('--tail', type=float, default=0, help="ms of a slow answer")
+    parser.add_argument('--tail-rate', type=float, default=0)
+    parser.add_argument('--fail-rate', type=float, default=0)
+    asyncio.run(main(parser.parse_args()))
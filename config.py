@@ -47,6 +47,9 @@ if ENVIRONMENT == "prod":
     FASTAPI_REDOC_URL = None
     FASTAPI_OPENAPI_URL = None
 
+## Internal endpoints (metrics / stats)
+INTERNAL_KEY = os.getenv("INTERNAL_KEY", default="")
+
 ## UVICORN
 UVICORN_HOST = os.getenv("UVICORN_HOST", default="127.0.0.1")
 UVICORN_PORT = int(os.getenv("UVICORN_PORT", default=8000))
@@ -74,21 +77,43 @@ APP_CONFIG = {
 
 ## MySQL Configuration
 MYSQL_MASTER = os.getenv("MYSQL_MASTER", default="127.0.0.1")
-MYSQL_SLAVE = os.getenv("MYSQL_SLAVE", default="127.0.0.1")
+MYSQL_SLAVE = os.getenv("MYSQL_SLAVE", default="127.0.0.1")  # replicas: host[:port],host[:port],...
+MYSQL_SLAVE_WEIGHTS = os.getenv("MYSQL_SLAVE_WEIGHTS", default="")  # relative capacity of each replica, 1 when empty
 MYSQL_PORT = int(os.getenv("MYSQL_PORT", default=3306))
 MYSQL_USERNAME = os.getenv("MYSQL_USERNAME", default="root")
 MYSQL_ENCRYPT = os.getenv("MYSQL_PASSWORD", default=None)
 MYSQL_PASSWORD = FNet.decrypt(MYSQL_ENCRYPT.encode()).decode()
 MYSQL_DATABASE = os.getenv("MYSQL_DATABASE", default="gaea_hackathon")
-MYSQL_MAXCONNECT = int(os.getenv("MYSQL_MAXCONNECT", default=1000))
+MYSQL_MINCONNECT = int(os.getenv("MYSQL_MINCONNECT", default=5))
+MYSQL_MAXCONNECT = int(os.getenv("MYSQL_MAXCONNECT", default=50))
+MYSQL_ACQUIRE_TIMEOUT = float(os.getenv("MYSQL_ACQUIRE_TIMEOUT", default=5))
+MYSQL_RECYCLE = int(os.getenv("MYSQL_RECYCLE", default=600))
+MYSQL_PIN_SECONDS = int(os.getenv("MYSQL_PIN_SECONDS", default=5))  # reads of an address go to the master this long after its writes
+MYSQL_MAX_LAG = float(os.getenv("MYSQL_MAX_LAG", default=2))  # replica lag (seconds) above which reads go to the master
+MYSQL_LAG_INTERVAL = float(os.getenv("MYSQL_LAG_INTERVAL", default=1))  # seconds between replica lag checks, per worker
+MYSQL_SLAVES = []
+replica_weights = [weight.strip() for weight in MYSQL_SLAVE_WEIGHTS.split(",")]
+for index, replica in enumerate(host.strip() for host in (MYSQL_SLAVE or MYSQL_MASTER).split(",") if host.strip()):
+    MYSQL_SLAVES.append({
+        "host": replica.split(":")[0],
+        "port": int(replica.split(":")[1]) if ":" in replica else MYSQL_PORT,
+        "weight": float(replica_weights[index]) if index < len(replica_weights) and replica_weights[index] else 1.0,
+    })
 DB_CONFIG = {
     "master": MYSQL_MASTER,
-    "slave": MYSQL_SLAVE,
+    "slave": MYSQL_SLAVES[0]['host'],
+    "slaves": MYSQL_SLAVES,
     "port": MYSQL_PORT,
     "username": MYSQL_USERNAME,
     "password": MYSQL_PASSWORD,
     "database": MYSQL_DATABASE,
-    "max_connect": MYSQL_MAXCONNECT,
+    "min_connect": MYSQL_MINCONNECT,
+    "max_connect": MYSQL_MAXCONNECT,  # per worker, per role
+    "acquire_timeout": MYSQL_ACQUIRE_TIMEOUT,
+    "pool_recycle": MYSQL_RECYCLE,
+    "pin_seconds": MYSQL_PIN_SECONDS,
+    "max_lag": MYSQL_MAX_LAG,
+    "lag_interval": MYSQL_LAG_INTERVAL,
 }
 
 ## REDIS Configuration
@@ -99,6 +124,13 @@ REDIS_USERNAME = os.getenv("REDIS_USERNAME", default=None)
 REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", default=None)
 REDIS_DB = int(os.getenv("REDIS_DB", default=0))
 REDIS_TIMEOUT = int(os.getenv("REDIS_TIMEOUT", default=5))
+REDIS_SENTINEL_NAME = os.getenv("REDIS_SENTINEL_NAME", default="mymaster")
+REDIS_MAXCONNECT = int(os.getenv("REDIS_MAXCONNECT", default=200))
+REDIS_HEALTH_CHECK = int(os.getenv("REDIS_HEALTH_CHECK", default=30))
+L1_CACHE_SIZE = int(os.getenv("L1_CACHE_SIZE", default=1024))  # in-process entries of hot cache keys, 0 = off
+CACHE_COMPRESS_MIN = int(os.getenv("CACHE_COMPRESS_MIN", default=2048))  # zstd cache values from this many bytes, 0 = never
+DAY_ROLLOVER_LEAD = int(os.getenv("DAY_ROLLOVER_LEAD", default=600))  # seconds before local midnight the next day is pre-warmed
+DAY_ROLLOVER_ACTIVE = int(os.getenv("DAY_ROLLOVER_ACTIVE", default=172800))  # users seen within this many seconds are pre-warmed
 REDIS_CONFIG = {
     "mode": REDIS_MODE,
     "master": REDIS_MASTER,
@@ -107,6 +139,9 @@ REDIS_CONFIG = {
     "password": REDIS_PASSWORD,
     "db": REDIS_DB,
     "timeout": REDIS_TIMEOUT,
+    "sentinel_name": REDIS_SENTINEL_NAME,
+    "max_connections": REDIS_MAXCONNECT,  # per worker, per role
+    "health_check_interval": REDIS_HEALTH_CHECK,
 }
 
 # AI
@@ -117,6 +152,13 @@ AI_CONFIG: list = json.loads(AI_API_CONFIG)
 # web3
 WEB3_NETWORK = os.getenv("WEB3_NETWORK", default="Base Sepolia")
 WEB3_CONFIG = os.getenv("WEB3_CONFIG", default="")
+WEB3_HTTP_POOL = int(os.getenv("WEB3_HTTP_POOL", default=20))  # keep-alive connections per RPC endpoint
+WEB3_HTTP_TIMEOUT = int(os.getenv("WEB3_HTTP_TIMEOUT", default=10))
+WEB3_HEDGE = int(os.getenv("WEB3_HEDGE", default=1))  # duplicate slow reads to the next-best endpoint
+WEB3_HEDGE_MIN_MS = int(os.getenv("WEB3_HEDGE_MIN_MS", default=50))
+WEB3_HEDGE_MAX_MS = int(os.getenv("WEB3_HEDGE_MAX_MS", default=2000))
+WEB3_EJECT_SECONDS = int(os.getenv("WEB3_EJECT_SECONDS", default=30))  # endpoint cool-down after repeated failures
+IMMUTABLE_CACHE_SIZE = int(os.getenv("IMMUTABLE_CACHE_SIZE", default=4096))  # in-process entries of closed-period reads
 # print(f"WEB3_CONFIG: {WEB3_CONFIG}")
 
 # white prikey
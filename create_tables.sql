@@ -1,4 +1,5 @@
 CREATE DATABASE hack_hackathon charset utf8mb4;
+-- Indexes and later schema changes: migrations/, applied with python app-migrate.py
 -- ------------------------------------------------------------------------
 
 -- Table: User training record
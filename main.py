@@ -1,6 +1,7 @@
 import argparse
 import asyncio
 import uvicorn
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
@@ -8,6 +9,10 @@ from fastapi.staticfiles import StaticFiles
 from api.router import router as api_router
 from config import *
 from utils.log import Loggers, log as logger
+from utils.database import init_db_pool, close_db_pool
+from utils.redis.init import register_redis, close_redis
+from utils.local_cache import local_cache
+from utils.web3_registry import close_chain_clients
 
 # argparse
 parser = argparse.ArgumentParser()
@@ -24,7 +29,27 @@ logger.remove()
 logger.add(sys.stdout, level=str(run_log).upper())
 Loggers.init_config()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Per-worker shared clients, reused by every request
+    await register_redis(app)
+    # Hot keys in process, dropped on every write through Redis pub/sub
+    local_cache.start()
+    try:
+        await init_db_pool()
+    except Exception as e:
+        # Pools are opened again lazily on first request
+        logger.error(f"init_db_pool() except ERROR: {str(e)}")
+    yield
+    await local_cache.stop()
+    await close_chain_clients()
+    await close_db_pool()
+    await close_redis()
+
+
 app = FastAPI(
+    lifespan=lifespan,
     title=FASTAPI_TITLE,
     version=FASTAPI_VERSION,
     description=FASTAPI_DESCRIPTION,
@@ -0,0 +1,25 @@
+-- Indexes of the hot access paths (api/*.py, app-open-emotion.py, web3-emotion_event.py)
+-- The unique key fails while duplicate periods exist, find them first with:
+--   SELECT chain_id, period_id, COUNT(*) FROM hack_emotions GROUP BY chain_id, period_id HAVING COUNT(*) > 1;
+
+-- emotion_period, open_emotion and the listener: chain_id=%s AND period_id=%s
+ALTER TABLE hack_emotions ADD UNIQUE INDEX uk_chain_period (chain_id, period_id);
+-- chain_id=%s AND status=%s, settled list ORDER BY period_id DESC
+ALTER TABLE hack_emotions ADD INDEX idx_chain_status_period (chain_id, status, period_id);
+
+-- address=%s AND status=%s AND date=%s, address=%s AND date=%s
+ALTER TABLE hack_emotion_training ADD INDEX idx_address_date_status (address, date, status);
+-- check-in list: address=%s AND status=2 AND created_time > %s
+ALTER TABLE hack_emotion_training ADD INDEX idx_address_status_created (address, status, created_time);
+-- listener: trainid_{network}=%s
+ALTER TABLE hack_emotion_training ADD INDEX idx_trainid_eth (trainid_eth);
+ALTER TABLE hack_emotion_training ADD INDEX idx_trainid_base (trainid_base);
+ALTER TABLE hack_emotion_training ADD INDEX idx_trainid_avax (trainid_avax);
+ALTER TABLE hack_emotion_training ADD INDEX idx_trainid_bsc (trainid_bsc);
+
+-- address=%s AND status=1 [AND period_id >= %s], GROUP BY / ORDER BY period_id
+ALTER TABLE hack_emotion_onchain ADD INDEX idx_address_status_period (address, status, period_id);
+-- Covered by the index above
+ALTER TABLE hack_emotion_onchain DROP INDEX idx_address;
+-- Same column as the UNIQUE (tx_hash) key
+ALTER TABLE hack_emotion_onchain DROP INDEX idx_tx_hash;
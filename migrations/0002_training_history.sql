@@ -0,0 +1,21 @@
+-- /api/ai/history: keyset pages over the rows without letters in detail, total kept per address
+
+-- Letters mark details that are not an emotion result, never listed (was contains_letter() after the page was read)
+ALTER TABLE hack_emotion_training ADD COLUMN visible TINYINT AS (detail NOT REGEXP '[a-zA-Z]') VIRTUAL;
+-- address=%s AND visible=1 AND id < %s ORDER BY id DESC (the primary key ends every secondary index)
+ALTER TABLE hack_emotion_training ADD INDEX idx_address_visible (address, visible);
+
+-- Listed rows per address, bumped in the transaction of each insert
+CREATE TABLE IF NOT EXISTS hack_emotion_training_count
+(
+    `address`             varchar(64)   NOT NULL,
+    `total`               int           DEFAULT 0 ,
+    `updated_time`        datetime      DEFAULT NULL ,
+    PRIMARY KEY (`address`)  USING BTREE
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_general_ci ROW_FORMAT = Dynamic;
+
+-- Existing history; safe to run again, it recounts
+INSERT INTO hack_emotion_training_count (address, total, updated_time)
+    SELECT counted.address, counted.total, NOW()
+    FROM (SELECT address, COUNT(*) AS total FROM hack_emotion_training WHERE visible = 1 GROUP BY address) AS counted
+ON DUPLICATE KEY UPDATE total = counted.total, updated_time = NOW();
@@ -0,0 +1,15 @@
+-- /api/ai/list: one row per address, kept up to date on every training insert (utils/training_summary.py)
+-- Filled by: python app-training-summary.py
+
+CREATE TABLE IF NOT EXISTS hack_emotion_training_summary
+(
+    `address`             varchar(64)   NOT NULL,
+    `train_date`          varchar(32)   DEFAULT '', -- last aitraining (status 1)
+    `train_detail`        varchar(64)   DEFAULT '',
+    `deep_date`           varchar(32)   DEFAULT '', -- last deeptraining (status 2)
+    `streak`              int           DEFAULT 0 , -- consecutive deeptraining days up to deep_date
+    `recent`              varchar(1024) DEFAULT '', -- JSON [{date, detail, status}], deeptraining days of the last week, newest first
+
+    `updated_time`        datetime      DEFAULT NULL ,
+    PRIMARY KEY (`address`)  USING BTREE
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_general_ci ROW_FORMAT = Dynamic;
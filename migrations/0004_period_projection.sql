@@ -0,0 +1,20 @@
+-- /api/emotion/period: the current period of each chain, one row, written by the daemons (utils/period_projection.py)
+
+CREATE TABLE IF NOT EXISTS hack_emotion_current
+(
+    `chain_id`             int       NOT NULL,
+    `period_id`            int       DEFAULT 0 ,
+    `period_end`           int       DEFAULT 0 ,
+    `period_duration`      int       DEFAULT 0 ,
+    `period_price`         int       DEFAULT 0 ,
+    `period_putmoney`      int       DEFAULT 0 ,
+    `period_proportion`    int       DEFAULT 0 ,
+    `period_reward`        bigint    DEFAULT 0 ,
+    `period_total`         int       DEFAULT 0 ,
+    `status`               int       DEFAULT 0 , -- 1-in progress, 2-completed
+    `last_emotion`         int       DEFAULT 0 , -- emotion of period_id - 1
+    `last_average`         int       DEFAULT 0 ,
+
+    `updated_time`        datetime      DEFAULT NULL ,
+    PRIMARY KEY (`chain_id`)  USING BTREE
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_general_ci ROW_FORMAT = Dynamic;
@@ -0,0 +1,79 @@
+import asyncio
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import time
+
+import pytest
+from cryptography.fernet import Fernet
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+# config.py reads .env from the working directory: the tests run on a throwaway one,
+# never on the real credentials
+_key = Fernet.generate_key()
+_fernet = Fernet(_key)
+TEST_ENV = {
+    "KEY": _key.decode(),
+    "MYSQL_PASSWORD": _fernet.encrypt(b"test").decode(),
+    "WEB3_NETWORK": "Base Sepolia",
+    "WEB3_CONFIG": json.dumps([{
+        "network": "Base Sepolia", "chain_id": 84532, "server": "http://127.0.0.1:18545",
+        "emotion": "0x" + "1" * 40, "gas": 1, "interval": 1,
+        "white_prikey": _fernet.encrypt(b"a" * 64).decode(),
+    }]),
+    "AI_API_CONFIG": "[]",
+}
+os.environ.update(TEST_ENV)
+# DayClock works in local time: the tests pin it to UTC
+os.environ["TZ"] = "UTC"
+time.tzset()
+_workdir = tempfile.mkdtemp(prefix="hackathon-tests-")
+with open(os.path.join(_workdir, ".env"), "w") as f:
+    f.writelines(f"{key}='{value}'\n" for key, value in TEST_ENV.items())
+os.chdir(_workdir)
+
+
+@pytest.fixture
+def redis_run():
+    """run(coro_func): awaits coro_func() on a new loop whose shared Redis clients are one fakeredis server"""
+    import fakeredis
+    from utils.immutable_cache import immutable_cache
+    from utils.local_cache import local_cache
+    from utils.redis import init
+
+    # The in-process layers in front of Redis start as empty as the server
+    immutable_cache._lru.clear()
+    local_cache.clear()
+
+    server = fakeredis.FakeServer()
+
+    def run(coro_func, *args):
+        async def main():
+            fake = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+            init._redis_clients.clear()
+            init._redis_clients.update({True: fake, False: fake})
+            init._redis_loop = asyncio.get_running_loop()
+            try:
+                return await coro_func(*args)
+            finally:
+                init._redis_clients.clear()
+                init._redis_loop = None
+                await fake.aclose()
+        return asyncio.run(main())
+
+    return run
+
+
+@pytest.fixture
+def load_daemon():
+    """load_daemon("app-open-emotion.py"): the daemon script as a module, its __main__ block not run"""
+    def load(filename):
+        spec = importlib.util.spec_from_file_location(filename[:-3].replace("-", "_"), os.path.join(REPO, filename))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+    return load
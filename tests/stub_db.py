@@ -0,0 +1,104 @@
+import re
+import sqlite3
+from contextlib import asynccontextmanager
+
+
+class StubCursor:
+    """aiomysql-like DictCursor answering each statement with the first handler whose marker it contains"""
+
+    def __init__(self, handlers: dict):
+        # marker (substring of the SQL) -> function(values) -> list of rows
+        self.handlers = handlers
+        self.rows = []
+        self.executed = []
+        self.rowcount = 0
+        self.lastrowid = 0
+
+    async def execute(self, query, values=None):
+        self.executed.append((query, values))
+        for marker, handler in self.handlers.items():
+            if marker in query:
+                self.rows = handler(values) or []
+                return len(self.rows)
+        self.rows = []
+        return 0
+
+    async def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    async def fetchall(self):
+        return list(self.rows)
+
+
+class StubPool:
+    def __init__(self, handlers: dict):
+        self.handlers = handlers
+
+    @asynccontextmanager
+    async def cursor(self):
+        yield StubCursor(self.handlers)
+
+
+EMOTION_SCHEMA = """
+CREATE TABLE hack_emotions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    chain_id INT DEFAULT 0, period_id INT DEFAULT 0, period_duration INT DEFAULT 0, period_price INT DEFAULT 0,
+    period_putmoney INT DEFAULT 0, period_proportion INT DEFAULT 80, period_start INT DEFAULT 0, period_end INT DEFAULT 0,
+    period_emotion INT DEFAULT 0, period_average INT DEFAULT 0, period_reward INT DEFAULT 0, period_total INT DEFAULT 0,
+    emotion_positive INT DEFAULT 0, emotion_neutral INT DEFAULT 0, emotion_negative INT DEFAULT 0, status INT DEFAULT 0,
+    created_time DATETIME DEFAULT CURRENT_TIMESTAMP, updated_time DATETIME DEFAULT NULL
+);
+CREATE TABLE hack_emotion_current (
+    chain_id INT NOT NULL PRIMARY KEY, period_id INT DEFAULT 0, period_end INT DEFAULT 0, period_duration INT DEFAULT 0,
+    period_price INT DEFAULT 0, period_putmoney INT DEFAULT 0, period_proportion INT DEFAULT 0, period_reward BIGINT DEFAULT 0,
+    period_total INT DEFAULT 0, status INT DEFAULT 0, last_emotion INT DEFAULT 0, last_average INT DEFAULT 0,
+    updated_time DATETIME DEFAULT NULL
+);
+"""
+
+
+def to_sqlite(query: str) -> str:
+    """The MySQL of the daemons in sqlite: placeholders, NOW(), ON DUPLICATE KEY UPDATE"""
+    query = query.replace("%s", "?").replace("NOW()", "CURRENT_TIMESTAMP")
+    query = query.replace("ON DUPLICATE KEY UPDATE", "ON CONFLICT DO UPDATE SET")
+    return re.sub(r"VALUES\((\w+)\)", r"excluded.\1", query)
+
+
+class SqliteCursor:
+    """pymysql-like DictCursor over an in-memory sqlite database with the hack_emotions tables"""
+
+    def __init__(self, connection: sqlite3.Connection | None = None):
+        if connection is None:
+            connection = sqlite3.connect(":memory:")
+            connection.row_factory = sqlite3.Row
+            connection.executescript(EMOTION_SCHEMA)
+        self.connection = connection
+        self.rows = []
+        self.rowcount = 0
+
+    def execute(self, query, values=None):
+        if values is not None and not isinstance(values, (tuple, list)):
+            values = (values,)
+        cursor = self.connection.execute(to_sqlite(query), values or ())
+        self.rows = [dict(row) for row in cursor.fetchall()]
+        self.rowcount = cursor.rowcount
+        return self.rowcount
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return list(self.rows)
+
+
+class AsyncSqliteCursor(SqliteCursor):
+    """The same database as an aiomysql-like cursor, for the readers of the API"""
+
+    async def execute(self, query, values=None):
+        return super().execute(query, values)
+
+    async def fetchone(self):
+        return super().fetchone()
+
+    async def fetchall(self):
+        return super().fetchall()
@@ -0,0 +1,109 @@
+import asyncio
+import time
+
+from eth_abi import decode, encode
+from eth_utils import keccak
+from web3 import AsyncWeb3, AsyncHTTPProvider, Web3
+
+from utils.multicall import MULTICALL3_ADDRESS
+from utils.web3_abi import contract_abi_emotion
+
+EMOTION_ADDRESS = "0x" + "1" * 40
+
+
+class StubChain:
+    """Emotion contract state served by StubProvider"""
+
+    def __init__(self, issue: int = 0, proportion: int = 80):
+        self.issue = issue
+        self.proportion = proportion
+        # period_id -> end, price, putmoney, total, emotion, average, counts (positive, neutral, negative)
+        self.periods: dict[int, dict] = {}
+
+    def open(self, period_id: int, end: int, price: int = 1000, putmoney: int = 500, total: int = 0):
+        self.periods[period_id] = {"end": end, "price": price, "putmoney": putmoney, "total": total,
+                                   "emotion": 0, "average": 0, "counts": (0, 0, 0)}
+        self.issue = period_id
+
+    def settle(self, period_id: int, emotion: int, average: int, counts=(1, 1, 1)):
+        self.periods[period_id].update(emotion=emotion, average=average, counts=counts)
+
+    def period(self, period_id: int) -> dict:
+        return self.periods.get(period_id, {"end": 0, "price": 0, "putmoney": 0, "total": 0,
+                                            "emotion": 0, "average": 0, "counts": (0, 0, 0)})
+
+    def views(self) -> dict:
+        return {
+            "Issue()": ([], ["uint256"], lambda: (self.issue,)),
+            "userProportion()": ([], ["uint256"], lambda: (self.proportion,)),
+            "IssueAddressNum(uint256)": (["uint256"], ["uint256"], lambda p: (self.period(p)["total"],)),
+            "IssueInformation(uint256)": (["uint256"], ["uint256", "uint256", "uint256"],
+                                          lambda p: (self.period(p)["end"], self.period(p)["price"], self.period(p)["putmoney"])),
+            "IssueEmotion(uint256)": (["uint256"], ["uint256"], lambda p: (self.period(p)["emotion"],)),
+            "IssueReward(uint256)": (["uint256"], ["uint256"], lambda p: (self.period(p)["average"],)),
+            "getIssueEmotionAddrslength(uint256,uint256)": (["uint256", "uint256"], ["uint256"],
+                                                            lambda p, e: (self.period(p)["counts"][e - 1],)),
+        }
+
+    def call(self, data: bytes) -> bytes:
+        for signature, (inputs, outputs, view) in self.views().items():
+            if keccak(text=signature)[:4] == data[:4]:
+                args = decode(inputs, data[4:]) if inputs else ()
+                return encode(outputs, view(*args))
+        raise ValueError(f"unknown selector {data[:4].hex()}")
+
+
+class StubProvider(AsyncHTTPProvider):
+    """AsyncHTTPProvider answering from a StubChain after `latency` seconds, Multicall3 included"""
+
+    def __init__(self, chain: StubChain, latency: float):
+        super().__init__("http://127.0.0.1:1")
+        self.chain = chain
+        self.latency = latency
+        self.eth_calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def answer(self, method, params):
+        if method == "eth_chainId":
+            return hex(84532)
+        if method == "eth_blockNumber":
+            return hex(100)
+        if method != "eth_call":
+            raise ValueError(f"unexpected {method}")
+        self.eth_calls += 1
+        transaction = params[0]
+        data = bytes.fromhex((transaction.get("data") or transaction.get("input"))[2:])
+        if transaction["to"].lower() == MULTICALL3_ADDRESS.lower():
+            calls = decode(["(address,bool,bytes)[]"], data[4:])[0]
+            results = [(True, self.chain.call(call_data)) for _, _, call_data in calls]
+            return "0x" + encode(["(bool,bytes)[]"], [results]).hex()
+        return "0x" + self.chain.call(data).hex()
+
+    async def make_request(self, method, params):
+        # eth_chainId and friends are cached by the real providers (PROVIDER_CACHE_KWARGS): no latency
+        if method != "eth_call":
+            return {"jsonrpc": "2.0", "id": 1, "result": self.answer(method, params)}
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            return {"jsonrpc": "2.0", "id": 1, "result": self.answer(method, params)}
+        finally:
+            self.in_flight -= 1
+
+    async def make_batch_request(self, requests):
+        await asyncio.sleep(self.latency)
+        return [{"jsonrpc": "2.0", "id": index, "result": self.answer(method, params)}
+                for index, (method, params) in enumerate(requests)]
+
+
+def stub_contract(chain: StubChain, latency: float = 0.0):
+    """(emotion contract, provider) on a fresh AsyncWeb3 over StubProvider"""
+    provider = StubProvider(chain, latency)
+    async_web3 = AsyncWeb3(provider)
+    return async_web3.eth.contract(address=Web3.to_checksum_address(EMOTION_ADDRESS), abi=contract_abi_emotion), provider
+
+
+def now() -> int:
+    return int(time.time())
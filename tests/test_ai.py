@@ -0,0 +1,59 @@
+import api.ai as ai
+from stub_db import StubCursor
+from utils.cache import get_redis_connection
+from utils.user_state import user_state
+
+ADDRESS = "0x" + "c" * 40
+
+
+def pending_key(today: str) -> str:
+    return f"hackathon:aitrain:{ADDRESS}:{today}:pending"
+
+
+def test_completed_training_does_not_block_the_next_call(redis_run):
+    async def scenario():
+        today = ai.clock.today()
+        async with user_state(ADDRESS, today) as state:
+            state.set("aitrain:{today}:detail", {"detail": "joy", "status": 1})
+            state.set_counter("aitrain:{today}:status", 1)
+        cursor = StubCursor({})
+        response = await ai.ai_complete(ai.CheckInRequest(detail="joy"), address=ADDRESS, cursor=cursor)
+        async with get_redis_connection(True) as cache:
+            pending = await cache.exists(pending_key(today))
+        return response, pending, cursor.executed
+
+    response, pending, executed = redis_run(scenario)
+    assert response["msg"] == "Training already completed"
+    assert not pending
+    assert executed == []
+
+
+def test_pending_call_is_rejected(redis_run):
+    async def scenario():
+        today = ai.clock.today()
+        async with get_redis_connection(True) as cache:
+            await cache.set(pending_key(today), 1, ex=60)
+        cursor = StubCursor({})
+        response = await ai.ai_complete(ai.CheckInRequest(detail="joy"), address=ADDRESS, cursor=cursor)
+        return response, cursor.executed
+
+    response, executed = redis_run(scenario)
+    assert response["msg"] == "Please wait for the last completion"
+    # Only the completed check ran, never the insert
+    assert all("INSERT" not in query for query, _ in executed)
+
+
+def test_chat_rechecks_an_empty_check(redis_run):
+    async def scenario():
+        today = ai.clock.today()
+        # '' is what the first chat of the day stores before any training
+        async with user_state(ADDRESS, today) as state:
+            state.set("aichat:{today}:check", "")
+        cursor = StubCursor({"hack_emotion_training": lambda values: [{"detail": "1_deep"}]})
+        response = await ai.ai_chat(ai.AIChatRequest(message="hello"), address=ADDRESS, cursorSlave=cursor)
+        return response, len(cursor.executed)
+
+    response, queries = redis_run(scenario)
+    # A deep training recorded since then is seen on the next chat
+    assert response == {"code": 200, "success": True, "msg": "positive"}
+    assert queries == 1
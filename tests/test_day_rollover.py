@@ -0,0 +1,143 @@
+import datetime
+
+import pytest
+
+import utils.participation as participation
+import utils.user_state as user_state
+from utils.cache import get_redis_connection
+from utils.day_clock import DayClock
+from utils.day_rollover import DayRollover
+from utils.user_state import ACTIVE_USERS_KEY, load_user_state
+
+# 2026-10-18 23:55:00 UTC, five minutes before the rollover midnight
+BEFORE_MIDNIGHT = datetime.datetime(2026, 10, 18, 23, 55, tzinfo=datetime.timezone.utc).timestamp()
+TODAY, TOMORROW = "2026-10-18", "2026-10-19"
+ADDRESSES = ["0x" + str(n) * 40 for n in range(1, 4)]
+
+
+class FixedTime:
+    def __init__(self, now: float):
+        self.value = now
+
+    def __call__(self) -> float:
+        return self.value
+
+
+@pytest.fixture
+def fixed_clock(monkeypatch):
+    now = FixedTime(BEFORE_MIDNIGHT)
+    clock = DayClock(now=now)
+    monkeypatch.setattr(user_state, "clock", clock)
+    monkeypatch.setattr(participation, "clock", clock)
+    return clock, now
+
+
+def test_clock_across_midnight(fixed_clock):
+    clock, now = fixed_clock
+    assert (clock.today(), clock.today(1), clock.today(-1)) == (TODAY, TOMORROW, "2026-10-17")
+    assert clock.seconds_to_midnight() == 300
+    assert clock.day_end(TODAY) == clock.day_start(TOMORROW) == BEFORE_MIDNIGHT + 300
+    now.value += 301
+    assert clock.today() == TOMORROW
+    assert clock.seconds_to_midnight() == 86400 - 1
+
+
+def test_due_once_inside_the_lead_window(fixed_clock):
+    clock, now = fixed_clock
+    rollover = DayRollover(warm=None, clock=clock, lead=600)
+    now.value -= 600
+    assert not rollover.due()
+    now.value += 300
+    assert rollover.due()
+    rollover.last_day = TOMORROW
+    assert not rollover.due()
+    # Just after midnight the next window is a day away
+    now.value += 310
+    assert not rollover.due()
+
+
+def test_rollover_prewarms_the_coming_day(redis_run, fixed_clock):
+    clock, now = fixed_clock
+    warmed = []
+
+    async def warm(state):
+        warmed.append((state.address, state.today))
+        state.set("aitrain:{today}:detail", {"day": state.today})
+
+    async def scenario():
+        async with get_redis_connection(True) as cache:
+            await cache.zadd(ACTIVE_USERS_KEY, {address: now.value - 60 for address in ADDRESSES})
+            await cache.zadd(ACTIVE_USERS_KEY, {"0xquiet": now.value - 3 * 86400})
+        rollover = DayRollover(warm, clock=clock, lead=600, chunk=2, pause=0)
+        assert rollover.due() and await rollover.acquire(TOMORROW)
+        assert not await rollover.acquire(TOMORROW)
+        stats = await rollover.run()
+        # Still the old day: the field of the coming one is kept, not expired
+        before = await load_user_state(ADDRESSES[0])
+        now.value += 301
+        after = [await load_user_state(address) for address in ADDRESSES]
+        async with get_redis_connection(True) as cache:
+            active = await cache.zrange(ACTIVE_USERS_KEY, 0, -1)
+        return rollover, stats, before, after, active
+
+    rollover, stats, before, after, active = redis_run(scenario)
+    assert sorted(warmed) == [(address, TOMORROW) for address in ADDRESSES]
+    assert (stats["day"], stats["users"], stats["written"], stats["errors"]) == (TOMORROW, 3, 3, 0)
+    assert stats["before_midnight"] == 300
+    assert not rollover.due()
+    assert before.today == TODAY and before.get("aitrain:{today}:detail") is None
+    assert before.get("aitrain:2026-10-19:detail") == {"day": TOMORROW}
+    for state in after:
+        assert state.today == TOMORROW
+        assert state.get("aitrain:{today}:detail") == {"day": TOMORROW}
+    assert "0xquiet" not in active
+
+
+def test_rollover_errors_do_not_stop_the_others(redis_run, fixed_clock):
+    clock, now = fixed_clock
+
+    async def warm(state):
+        if state.address == ADDRESSES[1]:
+            raise ValueError("mysql down")
+        state.set("aitrain:{today}:detail", {"day": state.today})
+
+    async def scenario():
+        async with get_redis_connection(True) as cache:
+            await cache.zadd(ACTIVE_USERS_KEY, {address: now.value for address in ADDRESSES})
+        return await DayRollover(warm, clock=clock, pause=0).run()
+
+    stats = redis_run(scenario)
+    assert (stats["users"], stats["written"], stats["errors"]) == (3, 2, 1)
+
+
+def test_participation_across_midnight(redis_run, fixed_clock):
+    clock, now = fixed_clock
+    first, second = ADDRESSES[:2]
+
+    async def scenario():
+        # 23:59:59 and 00:00:01: two days, one bit each
+        now.value = BEFORE_MIDNIGHT + 299
+        await participation.mark(first, clock.today(), participation.KIND_DEEPTRAIN)
+        await participation.mark(second, clock.today(), participation.KIND_DEEPTRAIN)
+        before = await participation.streak(first)
+        now.value = BEFORE_MIDNIGHT + 301
+        # Today still open: yesterday's streak holds
+        open_day = await participation.streak(first)
+        await participation.mark(first, clock.today(), participation.KIND_DEEPTRAIN)
+        return {
+            "before": before,
+            "open_day": open_day,
+            "after": await participation.streak(first),
+            "second": await participation.streak(second),
+            "counts": [await participation.daily_count(day, participation.KIND_DEEPTRAIN) for day in (TODAY, TOMORROW)],
+            "streak2": await participation.streak_count(TOMORROW, 2),
+            "retention": await participation.retention(TOMORROW, 1),
+            "ids": [await participation.user_id(address) for address in (first, second)],
+        }
+
+    result = redis_run(scenario)
+    assert (result["before"], result["open_day"], result["after"], result["second"]) == (1, 1, 2, 1)
+    assert result["counts"] == [2, 1]
+    assert result["streak2"] == 1
+    assert result["retention"] == 0.5
+    assert result["ids"] == [1, 2]
@@ -0,0 +1,41 @@
+import asyncio
+
+from utils.cache import get_or_load
+
+
+def test_coalesced_callers_get_private_copies(redis_run):
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"id": 5, "items": [1, 2]}
+
+    async def caller(index):
+        value = await get_or_load(True, "hackathon:test:coalesce", loader, ex=60)
+        # What emotion_period / emotion_period_history do with the result
+        value["user_emotion"] = index
+        value["items"].append(index)
+        await asyncio.sleep(0)
+        return value
+
+    async def main():
+        return await asyncio.gather(*[caller(index) for index in range(5)])
+
+    values = redis_run(main)
+    assert len(calls) == 1
+    for index, value in enumerate(values):
+        assert value["user_emotion"] == index
+        assert value["items"] == [1, 2, index]
+
+
+def test_cached_value_is_not_mutated(redis_run):
+    async def loader():
+        return {"id": 5}
+
+    async def main():
+        first = await get_or_load(True, "hackathon:test:mutate", loader, ex=60)
+        first["user_emotion"] = 1
+        return await get_or_load(True, "hackathon:test:mutate", loader, ex=60)
+
+    assert redis_run(main) == {"id": 5}
@@ -0,0 +1,190 @@
+import os
+import uuid
+
+import pymysql
+import pytest
+
+from conftest import REPO
+from utils.migrations import ALREADY_APPLIED_ERRORS, apply_migration, load_migrations, migrate, split_statements
+
+# The schema tests need a disposable MySQL 8 server, e.g.
+#   TEST_MYSQL_HOST=127.0.0.1 TEST_MYSQL_PASSWORD=... python -m pytest tests/test_migrations.py
+# they create and drop their own hack_test_* databases
+MYSQL = {
+    "host": os.getenv("TEST_MYSQL_HOST", ""),
+    "port": int(os.getenv("TEST_MYSQL_PORT", 3306)),
+    "user": os.getenv("TEST_MYSQL_USER", "root"),
+    "passwd": os.getenv("TEST_MYSQL_PASSWORD", ""),
+}
+
+
+def test_versions_are_ordered_and_unique():
+    migrations = load_migrations()
+    versions = [one.version for one in migrations]
+    assert versions == sorted(set(versions))
+    assert versions[0] == "0001"
+    for migration in migrations:
+        assert migration.statements, migration.name
+        assert not any(statement.startswith("--") for statement in migration.statements)
+
+
+def test_split_statements():
+    sql = "-- comment; not a statement\nALTER TABLE a ADD INDEX i (x);\n\n  -- another\nCREATE TABLE b\n(\n  id int\n);\n"
+    assert split_statements(sql) == ["ALTER TABLE a ADD INDEX i (x)", "CREATE TABLE b\n(\n  id int\n)"]
+
+
+class RecordingCursor:
+    """Fails the statements listed in errors (statement -> errno) like MySQL would"""
+
+    def __init__(self, errors: dict):
+        self.errors = errors
+        self.executed = []
+        self.committed = 0
+        self.connection = self
+
+    def commit(self):
+        self.committed += 1
+
+    def execute(self, query, values=None):
+        if query in self.errors:
+            raise pymysql.err.OperationalError(self.errors[query], "error")
+        self.executed.append((query, values))
+
+
+def test_apply_skips_already_applied_statements():
+    migration = load_migrations()[0]
+    # A run that stopped half way: the first statements already went through
+    done = migration.statements[:2]
+    cursor = RecordingCursor({statement: 1061 for statement in done})
+    apply_migration(cursor, migration)
+    assert [query for query, _ in cursor.executed[:-1]] == migration.statements[2:]
+    assert cursor.executed[-1][1] == (migration.version, migration.name, migration.checksum)
+    assert cursor.committed == 1
+    assert 1061 in ALREADY_APPLIED_ERRORS
+
+
+def test_apply_stops_on_real_errors():
+    migration = load_migrations()[0]
+    cursor = RecordingCursor({migration.statements[0]: 1146})    # table doesn't exist
+    with pytest.raises(pymysql.err.OperationalError):
+        apply_migration(cursor, migration)
+    assert cursor.committed == 0
+
+
+# ------------------------------------------------------------------------------------
+
+@pytest.fixture
+def database():
+    """connect(): a connection on a fresh, empty database, dropped afterwards"""
+    if not MYSQL["host"]:
+        pytest.skip("TEST_MYSQL_HOST not set")
+    name = f"hack_test_{uuid.uuid4().hex[:8]}"
+    conns = []
+    admin = pymysql.connect(charset="utf8mb4", autocommit=True, **MYSQL)
+    admin.cursor().execute(f"CREATE DATABASE `{name}` charset utf8mb4")
+
+    def connect():
+        conn = pymysql.connect(db=name, charset="utf8mb4", **MYSQL)
+        conns.append(conn)
+        return conn
+
+    yield connect
+    for conn in conns:
+        conn.close()
+    admin.cursor().execute(f"DROP DATABASE `{name}`")
+    admin.close()
+
+
+def create_tables(conn):
+    with open(os.path.join(REPO, "create_tables.sql"), encoding="utf-8") as f:
+        statements = split_statements(f.read())
+    cursor = conn.cursor()
+    for statement in statements:
+        if not statement.upper().startswith("CREATE DATABASE"):
+            cursor.execute(statement)
+    conn.commit()
+
+
+def indexes(conn, table: str) -> set:
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    cursor.execute(f"SHOW INDEX FROM {table}")
+    return {row["Key_name"] for row in cursor.fetchall()}
+
+
+def schema(conn) -> dict:
+    """Tables with their columns and indexes"""
+    cursor = conn.cursor()
+    cursor.execute("SHOW TABLES")
+    tables = sorted(row[0] for row in cursor.fetchall())
+    result = {}
+    for table in tables:
+        cursor.execute(f"SHOW CREATE TABLE {table}")
+        # AUTO_INCREMENT moves with the data, not with the schema
+        result[table] = " ".join(part for part in cursor.fetchone()[1].split() if not part.startswith("AUTO_INCREMENT="))
+    return result
+
+
+def check_migrated(conn):
+    versions = [one.version for one in load_migrations()]
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    cursor.execute("SELECT version FROM schema_migrations ORDER BY version")
+    assert [row["version"] for row in cursor.fetchall()] == versions
+    assert {"uk_chain_period", "idx_chain_status_period"} <= indexes(conn, "hack_emotions")
+    assert {"idx_address_date_status", "idx_address_visible", "idx_trainid_eth"} <= indexes(conn, "hack_emotion_training")
+    onchain = indexes(conn, "hack_emotion_onchain")
+    assert "idx_address_status_period" in onchain and "idx_address" not in onchain and "idx_tx_hash" not in onchain
+    for table in ("hack_emotion_training_count", "hack_emotion_training_summary", "hack_emotion_current"):
+        assert table in schema(conn)
+
+
+def test_empty_schema(database):
+    """New install: create_tables.sql, then the whole chain"""
+    conn = database()
+    create_tables(conn)
+    applied = migrate(conn)
+    assert [one.version for one in applied] == [one.version for one in load_migrations()]
+    check_migrated(conn)
+
+
+def test_baseline_schema_with_data(database):
+    """An existing database: the tables of create_tables.sql with history in them"""
+    conn = database()
+    create_tables(conn)
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    rows = [
+        ("0xaa", "1_20", 1, "2026-10-01"),
+        ("0xaa", "2_30", 2, "2026-10-01"),
+        ("0xaa", "error", 1, "2026-10-02"),     # letters: never listed
+        ("0xbb", "3_10", 1, "2026-10-02"),
+    ]
+    cursor.executemany("INSERT INTO hack_emotion_training (address, detail, status, date) VALUES (%s, %s, %s, %s)", rows)
+    conn.commit()
+
+    migrate(conn)
+    check_migrated(conn)
+    cursor.execute("SELECT detail, visible FROM hack_emotion_training ORDER BY id")
+    assert [row["visible"] for row in cursor.fetchall()] == [1, 1, 0, 1]
+    cursor.execute("SELECT address, total FROM hack_emotion_training_count ORDER BY address")
+    assert cursor.fetchall() == [{"address": "0xaa", "total": 2}, {"address": "0xbb", "total": 1}]
+
+
+def test_rerun_is_idempotent(database):
+    conn = database()
+    create_tables(conn)
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO hack_emotion_training (address, detail, status, date) VALUES ('0xaa', '1_20', 1, '2026-10-01')")
+    conn.commit()
+    migrate(conn)
+    before = schema(conn)
+
+    # Nothing pending: nothing runs
+    assert migrate(conn) == []
+    assert schema(conn) == before
+
+    # Version rows lost (or a run that died before recording them): every statement runs again
+    cursor.execute("DELETE FROM schema_migrations")
+    conn.commit()
+    assert len(migrate(conn)) == len(load_migrations())
+    assert schema(conn) == before
+    cursor.execute("SELECT total FROM hack_emotion_training_count WHERE address = '0xaa'")
+    assert cursor.fetchone()[0] == 1
@@ -0,0 +1,76 @@
+from stub_db import SqliteCursor
+from stub_rpc import StubChain, stub_contract, now
+from utils.multicall import MULTICALL3_ADDRESS
+
+CHAIN_ID = 84532
+
+
+class StubChainClient:
+    def __init__(self, contract):
+        self.contract = contract
+        self.multicall_address = MULTICALL3_ADDRESS
+
+    async def get_async_emotion_contract(self):
+        return self.contract
+
+
+def settled_rows(cursor):
+    cursor.execute("SELECT period_id, period_emotion, period_total, status FROM hack_emotions WHERE chain_id=%s ORDER BY period_id", (CHAIN_ID,))
+    return cursor.fetchall()
+
+
+def test_missed_periods_are_one_batched_read(redis_run, load_daemon):
+    daemon = load_daemon("app-open-emotion.py")
+    chain = StubChain()
+    for period_id in range(1, 7):
+        chain.open(period_id, now() - 1000 + period_id, total=period_id)
+        chain.settle(period_id, emotion=period_id % 3 + 1, average=100 + period_id)
+    chain.open(7, now() + 3600)
+    contract, provider = stub_contract(chain)
+    cursor = SqliteCursor()
+
+    redis_run(daemon.sync_missed_periods, cursor, CHAIN_ID, StubChainClient(contract), list(range(1, 7)))
+
+    assert provider.eth_calls == 1
+    assert settled_rows(cursor) == [
+        {"period_id": period_id, "period_emotion": period_id % 3 + 1, "period_total": period_id, "status": 2}
+        for period_id in range(1, 7)
+    ]
+
+
+def test_missed_periods_skip_the_unsettled(redis_run, load_daemon):
+    daemon = load_daemon("app-open-emotion.py")
+    chain = StubChain()
+    chain.open(1, now() - 100, total=2)
+    chain.settle(1, emotion=1, average=50)
+    chain.open(2, now() - 10)               # ended, not drawn yet
+    chain.open(3, now() + 3600)
+    chain.settle(3, emotion=2, average=10)  # drawn, still running
+    contract, _ = stub_contract(chain)
+    cursor = SqliteCursor()
+
+    redis_run(daemon.sync_missed_periods, cursor, CHAIN_ID, StubChainClient(contract), [1, 2, 3])
+
+    assert [row["period_id"] for row in settled_rows(cursor)] == [1]
+
+
+def test_cached_periods_only_read_the_proportion(redis_run, load_daemon):
+    daemon = load_daemon("app-open-emotion.py")
+    chain = StubChain()
+    for period_id in (1, 2):
+        chain.open(period_id, now() - 100, total=1)
+        chain.settle(period_id, emotion=1, average=10)
+    contract, provider = stub_contract(chain)
+
+    async def twice():
+        await daemon.sync_missed_periods(SqliteCursor(), CHAIN_ID, StubChainClient(contract), [1, 2])
+        # userProportion() takes no period: it is never cached with the settled views
+        chain.proportion = 50
+        cursor = SqliteCursor()
+        await daemon.sync_missed_periods(cursor, CHAIN_ID, StubChainClient(contract), [1, 2])
+        return cursor
+
+    cursor = redis_run(twice)
+    assert provider.eth_calls == 2
+    cursor.execute("SELECT period_proportion FROM hack_emotions WHERE chain_id=%s", (CHAIN_ID,))
+    assert [row["period_proportion"] for row in cursor.fetchall()] == [50, 50]
@@ -0,0 +1,170 @@
+import asyncio
+
+import fakeredis
+
+import api.emotion as emotion
+from stub_db import SqliteCursor, AsyncSqliteCursor
+from stub_rpc import StubChain, stub_contract, now
+from utils.multicall import MULTICALL3_ADDRESS
+from utils.period_projection import project_period, publish_projection, publish_projection_blocking, load_projection, PROJECTION_KEY
+from utils.period_settlement import SETTLE_QUERY, settle_values
+from utils.redis import init
+from utils.redis.init import run_blocking
+from utils.cache import get_redis_data
+
+CHAIN_ID = 84532
+PRICE = 280000
+PUTMONEY = 1000000
+
+# The vote of web3-emotion_event.py
+VOTE_QUERY = """
+                UPDATE hack_emotions 
+                SET
+                    period_total = period_total + 1,
+                    emotion_positive = emotion_positive + 1,
+                    updated_time = NOW() 
+                WHERE
+                    chain_id=%s AND period_id=%s AND status = 1
+                """
+
+
+class StubChainClient:
+    def __init__(self, contract):
+        self.contract = contract
+        self.multicall_address = MULTICALL3_ADDRESS
+
+    async def get_async_emotion_contract(self):
+        return self.contract
+
+
+def seeded_cursor() -> SqliteCursor:
+    """hack_emotions as create_tables.sql seeds it: periods 1-3 configured, none started"""
+    cursor = SqliteCursor()
+    for period_id, duration in ((1, 1800), (2, 7200), (3, 86400)):
+        cursor.execute("INSERT INTO hack_emotions (chain_id, period_id, period_duration, period_price, period_putmoney, period_proportion, status) VALUES (%s, %s, %s, %s, %s, %s, 0)",
+                       (CHAIN_ID, period_id, duration, PRICE, PUTMONEY, 80))
+    return cursor
+
+
+async def assert_matches_contract(cursor, contract):
+    projection = await load_projection(CHAIN_ID)
+    from_contract = await emotion.load_period_from_contract(contract, CHAIN_ID, AsyncSqliteCursor(cursor.connection), MULTICALL3_ADDRESS)
+    assert projection == from_contract
+    return projection
+
+
+async def open_period(daemon, cursor, chain, period_id):
+    """The status=1 write of app-open-emotion.py for the period the contract is running"""
+    info = chain.period(period_id)
+    daemon.update_current_period(cursor, CHAIN_ID, period_id, info["end"], info["putmoney"], info["price"], info["total"], *info["counts"])
+    await daemon.refresh_projection(cursor, CHAIN_ID)
+
+
+async def settle_and_open_next(daemon, cursor, chain, period_id, emotion_value, average):
+    """The ended branch of app-open-emotion.py: openNewIssue, next period status=1, this one status=2"""
+    chain.periods[period_id]["end"] = now() - 1
+    chain.settle(period_id, emotion=emotion_value, average=average)
+    chain.open(period_id + 1, now() + 7200, price=PRICE + 10000, putmoney=PUTMONEY)
+    info = chain.period(period_id + 1)
+    daemon.open_next_period(cursor, CHAIN_ID, period_id + 1, now(), info["end"], info["price"], info["putmoney"])
+    await daemon.refresh_projection(cursor, CHAIN_ID)
+    settled = chain.period(period_id)
+    snapshot = daemon.PeriodSnapshot(period_id=period_id, end_timestamp=settled["end"], price=settled["price"],
+                                     putmoney=settled["putmoney"], proportion=chain.proportion, total=settled["total"],
+                                     emotion=emotion_value, average=average, positive=settled["counts"][0],
+                                     neutral=settled["counts"][1], negative=settled["counts"][2])
+    cursor.execute(SETTLE_QUERY, settle_values(CHAIN_ID, snapshot))
+    cursor.connection.commit()
+    await daemon.refresh_projection(cursor, CHAIN_ID)
+
+
+def test_projection_follows_open_and_votes(redis_run, load_daemon):
+    daemon = load_daemon("app-open-emotion.py")
+    chain = StubChain()
+    chain.open(1, now() + 1800, price=PRICE, putmoney=PUTMONEY)
+    contract, _ = stub_contract(chain)
+    cursor = seeded_cursor()
+
+    async def scenario():
+        await open_period(daemon, cursor, chain, 1)
+        opened = await assert_matches_contract(cursor, contract)
+        assert opened["id"] == 1 and opened["status"] == 1 and opened["duration"] == 1800
+
+        for _ in range(3):
+            chain.periods[1]["total"] += 1
+            cursor.execute(VOTE_QUERY, (CHAIN_ID, 1))
+            projection = project_period(cursor, CHAIN_ID)
+            cursor.connection.commit()
+            await publish_projection(CHAIN_ID, projection)
+        voted = await assert_matches_contract(cursor, contract)
+        assert voted["total"] == 3 and voted["reward"] > opened["reward"]
+
+    redis_run(scenario)
+
+
+def test_projection_follows_settlement(redis_run, load_daemon):
+    daemon = load_daemon("app-open-emotion.py")
+    chain = StubChain()
+    chain.open(1, now() + 1800, price=PRICE, putmoney=PUTMONEY, total=4)
+    contract, _ = stub_contract(chain)
+    cursor = seeded_cursor()
+
+    async def scenario():
+        await open_period(daemon, cursor, chain, 1)
+        await settle_and_open_next(daemon, cursor, chain, 1, emotion_value=2, average=150)
+        projection = await assert_matches_contract(cursor, contract)
+        assert projection["id"] == 2 and projection["status"] == 1
+        assert (projection["last_emotion"], projection["last_average"]) == (2, 150)
+        assert projection["price"] == PRICE + 10000 and projection["duration"] == 7200
+
+    redis_run(scenario)
+
+
+def test_projection_follows_missed_periods(redis_run, load_daemon):
+    daemon = load_daemon("app-open-emotion.py")
+    chain = StubChain()
+    for period_id in range(1, 6):
+        chain.open(period_id, now() - 1000 + period_id, total=period_id)
+        chain.settle(period_id, emotion=period_id % 3 + 1, average=100 + period_id)
+    chain.open(6, now() + 3600, total=2)
+    contract, _ = stub_contract(chain)
+    cursor = seeded_cursor()
+
+    async def scenario():
+        # Periods 4 and 5 were never in the database, 6 is running
+        await daemon.sync_missed_periods(cursor, CHAIN_ID, StubChainClient(contract), [4, 5])
+        await daemon.refresh_projection(cursor, CHAIN_ID)
+        await open_period(daemon, cursor, chain, 6)
+        projection = await assert_matches_contract(cursor, contract)
+        assert projection["id"] == 6 and projection["status"] == 1
+        assert (projection["last_emotion"], projection["last_average"]) == (5 % 3 + 1, 105)
+
+    redis_run(scenario)
+
+
+def test_run_blocking_reuses_one_loop_and_client(monkeypatch):
+    server = fakeredis.FakeServer()
+    created = []
+
+    async def init_fake_redis():
+        fake = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+        created.append(fake)
+        init._redis_clients.clear()
+        init._redis_clients.update({True: fake, False: fake})
+        init._redis_loop = asyncio.get_running_loop()
+
+    async def running_loop():
+        return asyncio.get_running_loop()
+
+    monkeypatch.setattr(init, "init_redis", init_fake_redis)
+    try:
+        for period_id in range(1, 4):
+            publish_projection_blocking(CHAIN_ID, {"id": period_id, "status": 1})
+        loops = {run_blocking(running_loop) for _ in range(3)}
+        published = run_blocking(get_redis_data, False, PROJECTION_KEY.format(chain_id=CHAIN_ID))
+    finally:
+        run_blocking(init.close_redis)
+
+    assert len(created) == 1
+    assert len(loops) == 1 and not next(iter(loops)).is_closed()
+    assert published == {"id": 3, "status": 1}
@@ -0,0 +1,73 @@
+import asyncio
+import time
+
+import api.emotion as emotion
+import utils.period_projection as period_projection
+from stub_db import StubCursor, StubPool
+from stub_rpc import StubChain, stub_contract, now
+from utils.multicall import MULTICALL3_ADDRESS
+
+CHAIN_ID = 84532
+LATENCY = 0.3
+CONCURRENCY = 20
+
+
+def chain_with_open_period() -> StubChain:
+    chain = StubChain()
+    chain.open(4, now() - 100, total=7)
+    chain.settle(4, emotion=2, average=150)
+    chain.open(5, now() + 3600, total=3)
+    return chain
+
+
+def mysql_handlers() -> dict:
+    return {
+        "hack_emotion_current": lambda values: [],
+        "`status`=1": lambda values: [{"period_id": 5}],
+        "period_duration": lambda values: [{"period_id": 5, "period_duration": 86400}],
+        "hack_emotion_onchain": lambda values: [],
+    }
+
+
+def test_contract_reads_overlap(redis_run):
+    contract, provider = stub_contract(chain_with_open_period(), LATENCY)
+
+    async def main():
+        start = time.perf_counter()
+        infos = await asyncio.gather(*[
+            emotion.load_period_from_contract(contract, CHAIN_ID, StubCursor(mysql_handlers()), MULTICALL3_ADDRESS)
+            for _ in range(CONCURRENCY)
+        ])
+        return time.perf_counter() - start, infos
+
+    elapsed, infos = redis_run(main)
+    assert all(info["id"] == 5 and info["total"] == 3 and info["status"] == 1 for info in infos)
+    assert infos[0]["last_emotion"] == 2 and infos[0]["duration"] == 86400
+    # One eth_call per read, all in flight together: one latency, not CONCURRENCY of them
+    assert provider.eth_calls == CONCURRENCY
+    assert provider.max_in_flight == CONCURRENCY
+    assert elapsed < 2 * LATENCY
+
+
+def test_period_handlers_do_not_block(redis_run, monkeypatch):
+    contract, provider = stub_contract(chain_with_open_period(), LATENCY)
+
+    async def get_emotion_contract(web3_config):
+        return contract
+
+    monkeypatch.setattr(emotion, "get_emotion_contract", get_emotion_contract)
+    monkeypatch.setattr(emotion, "db_pool_slave", StubPool(mysql_handlers()))
+    monkeypatch.setattr(period_projection, "db_pool_slave", StubPool(mysql_handlers()))
+
+    async def main():
+        start = time.perf_counter()
+        responses = await asyncio.gather(*[
+            emotion.emotion_period(emotion.EmotionRequest(chain_id=CHAIN_ID), f"0x{index:040x}", StubCursor(mysql_handlers()))
+            for index in range(CONCURRENCY)
+        ])
+        return time.perf_counter() - start, responses
+
+    elapsed, responses = redis_run(main)
+    assert all(response["code"] == 200 and response["data"]["id"] == 5 for response in responses)
+    assert provider.eth_calls >= 1
+    assert elapsed < 2 * LATENCY
@@ -0,0 +1,140 @@
+import asyncio
+import time
+
+import api.emotion as emotion
+from stub_db import SqliteCursor, StubCursor, StubPool
+from stub_rpc import StubChain, stub_contract, now
+from utils.cache import get_redis_connection
+from utils.multicall import MULTICALL3_ADDRESS
+from utils.period_projection import load_projection, publish_projection
+from utils.period_settlement import SETTLE_QUEUE_KEY, SETTLE_RETRY, enqueue_settlement, retry_settlement, claim_settlements
+
+CHAIN_ID = 84532
+ADDRESS = "0x" + "a" * 40
+
+
+async def queue():
+    async with get_redis_connection(False) as cache:
+        return dict(await cache.zrange(SETTLE_QUEUE_KEY, 0, -1, withscores=True))
+
+
+def test_enqueue_keeps_one_job_per_period(redis_run):
+    async def scenario():
+        first = await enqueue_settlement(CHAIN_ID, [0, 3, 4])
+        again = await asyncio.gather(*(enqueue_settlement(CHAIN_ID, [3, 4, 5]) for _ in range(10)))
+        return first, again, await queue()
+
+    first, again, jobs = redis_run(scenario)
+    assert first == 2
+    assert sum(again) == 1
+    assert sorted(jobs) == [f"{CHAIN_ID}:3", f"{CHAIN_ID}:4", f"{CHAIN_ID}:5"]
+
+
+def test_claim_takes_due_jobs_once(redis_run):
+    async def scenario():
+        await enqueue_settlement(CHAIN_ID, [3, 4])
+        await enqueue_settlement(1, [7])
+        claims = await asyncio.gather(*(claim_settlements() for _ in range(5)))
+        return claims, await queue()
+
+    claims, jobs = redis_run(scenario)
+    claimed = {}
+    for claim in claims:
+        for chain_id, period_ids in claim.items():
+            claimed.setdefault(chain_id, []).extend(period_ids)
+    assert {chain_id: sorted(period_ids) for chain_id, period_ids in claimed.items()} == {CHAIN_ID: [3, 4], 1: [7]}
+    assert jobs == {}
+
+
+def test_retry_is_not_due_before_its_delay(redis_run):
+    async def scenario():
+        await enqueue_settlement(CHAIN_ID, [3])
+        await claim_settlements()
+        await retry_settlement(CHAIN_ID, 3)
+        # Queued again by a request meanwhile: the later score stays
+        await enqueue_settlement(CHAIN_ID, [3])
+        return await claim_settlements(), await queue()
+
+    claimed, jobs = redis_run(scenario)
+    assert claimed == {}
+    assert jobs[f"{CHAIN_ID}:3"] >= time.time() + SETTLE_RETRY - 5
+
+
+class StubChainClient:
+    emotion_address_valid = True
+
+    def __init__(self, contract):
+        self.contract = contract
+        self.emotion_address = contract.address
+        self.multicall_address = MULTICALL3_ADDRESS
+
+    async def get_async_emotion_contract(self):
+        return self.contract
+
+
+def test_settle_chain_retries_periods_not_closed(redis_run, load_daemon, monkeypatch):
+    daemon = load_daemon("app-period-settle.py")
+    chain = StubChain()
+    chain.open(1, now() - 100, total=5)
+    chain.settle(1, emotion=3, average=120)
+    chain.open(2, now() - 10)               # ended, not drawn yet
+    chain.open(3, now() + 3600)
+    contract, _ = stub_contract(chain)
+    monkeypatch.setattr(daemon, "get_chain_client", lambda chain_id: StubChainClient(contract))
+    cursor = SqliteCursor()
+    for period_id in (1, 2, 3):
+        cursor.execute("INSERT INTO hack_emotions (chain_id, period_id, status) VALUES (%s, %s, 1)", (CHAIN_ID, period_id))
+
+    current_key = f"hackathon:period:{CHAIN_ID}:current"
+
+    async def scenario():
+        async with get_redis_connection(True) as cache:
+            await cache.set(current_key, "{}", ex=60)
+        settled = await daemon.settle_chain(cursor, CHAIN_ID, [1, 2, 3])
+        async with get_redis_connection(True) as cache:
+            current = await cache.exists(current_key)
+        return settled, await queue(), await load_projection(CHAIN_ID), current
+
+    settled, jobs, projection, current = redis_run(scenario)
+    cursor.execute("SELECT period_id, period_emotion, period_total, status FROM hack_emotions ORDER BY period_id")
+    assert settled == 1
+    assert cursor.fetchall()[0] == {"period_id": 1, "period_emotion": 3, "period_total": 5, "status": 2}
+    assert sorted(jobs) == [f"{CHAIN_ID}:2", f"{CHAIN_ID}:3"]
+    assert min(jobs.values()) > time.time()
+    assert projection["id"] == 3 and projection["last_emotion"] == 0
+    # The old current-period snapshot is not served any more
+    assert not current
+
+
+def period_history(redis_run, monkeypatch, settled_up_to, current_id, current_status):
+    settled_rows = [{"id": period_id, "timestamp": 0, "emotion": 1, "average": 0, "duration": 0, "reward": 0,
+                     "total": 0, "positive": 0, "neutral": 0, "negative": 0}
+                    for period_id in range(settled_up_to, 0, -1)][:10]
+    monkeypatch.setattr(emotion, "db_pool_slave", StubPool({"status=2": lambda values: settled_rows}))
+    cursor = StubCursor({"hack_emotion_onchain": lambda values: []})
+
+    async def scenario():
+        await publish_projection(CHAIN_ID, {"id": current_id, "status": current_status})
+        response = await emotion.emotion_period_history(emotion.EmotionRequest(chain_id=CHAIN_ID), address=ADDRESS, cursorSlave=cursor)
+        return response, await queue()
+
+    return redis_run(scenario)
+
+
+def test_period_history_up_to_date(redis_run, monkeypatch):
+    response, jobs = period_history(redis_run, monkeypatch, settled_up_to=5, current_id=6, current_status=1)
+    assert response["code"] == 200 and response["catching_up"] is False
+    assert [row["id"] for row in response["data"]] == [5, 4, 3, 2, 1]
+    assert jobs == {}
+
+
+def test_period_history_catching_up_queues_the_gap(redis_run, monkeypatch):
+    response, jobs = period_history(redis_run, monkeypatch, settled_up_to=3, current_id=6, current_status=1)
+    assert response["code"] == 200 and response["catching_up"] is True
+    assert sorted(jobs) == [f"{CHAIN_ID}:4", f"{CHAIN_ID}:5"]
+
+
+def test_period_history_catching_up_includes_ended_current(redis_run, monkeypatch):
+    response, jobs = period_history(redis_run, monkeypatch, settled_up_to=3, current_id=6, current_status=2)
+    assert response["catching_up"] is True
+    assert sorted(jobs) == [f"{CHAIN_ID}:4", f"{CHAIN_ID}:5", f"{CHAIN_ID}:6"]
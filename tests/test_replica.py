@@ -0,0 +1,93 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+import pymysql
+import pytest
+
+from utils.database import Replica, ReplicaSet, EJECT_AFTER
+
+
+class FakePool:
+    def __init__(self, fail_connect=False):
+        self.config = {"host": "replica-1"}
+        self.fail_connect = fail_connect
+
+    @asynccontextmanager
+    async def cursor(self):
+        if self.fail_connect:
+            raise pymysql.err.OperationalError(2003, "Can't connect to MySQL server")
+        yield object()
+
+
+async def use(replica, error=None):
+    async with replica.cursor():
+        if error is not None:
+            raise error
+
+
+def test_query_errors_do_not_eject():
+    replica = Replica(FakePool(), 1)
+    # Unknown column, lock wait timeout, max_execution_time: all OperationalError
+    for errno in (1054, 1205, 3024) * EJECT_AFTER:
+        with pytest.raises(pymysql.err.OperationalError):
+            asyncio.run(use(replica, pymysql.err.OperationalError(errno, "query failed")))
+    assert not replica.ejected
+    assert replica.failures == 0
+    assert replica.errors == 0
+    assert replica.in_flight == 0
+    assert replica.served == 0
+
+
+def test_connect_errors_eject():
+    replica = Replica(FakePool(fail_connect=True), 1)
+    for _ in range(EJECT_AFTER):
+        with pytest.raises(pymysql.err.OperationalError):
+            asyncio.run(use(replica))
+    assert replica.ejected
+    assert replica.errors == EJECT_AFTER
+    assert replica.in_flight == 0
+
+
+def test_success_resets_failures():
+    pool = FakePool(fail_connect=True)
+    replica = Replica(pool, 1)
+    with pytest.raises(pymysql.err.OperationalError):
+        asyncio.run(use(replica))
+    pool.fail_connect = False
+    asyncio.run(use(replica))
+    assert replica.failures == 0
+    assert replica.served == 1
+
+
+def replica_set(*replicas):
+    replica_set = ReplicaSet("slave", [], [], 1, FakePool(), max_lag=10, lag_interval=3600)
+    replica_set.replicas = list(replicas)
+    for replica in replicas:
+        # Lag already measured: no probe in the background
+        replica.checked = time.monotonic()
+    return replica_set
+
+
+async def read(replica_set, error=None):
+    async with replica_set.cursor():
+        if error is not None:
+            raise error
+
+
+def test_connect_error_falls_back_to_the_master():
+    replica = Replica(FakePool(fail_connect=True), 1)
+    replicas = replica_set(replica)
+    asyncio.run(read(replicas))
+    assert replica.ejected
+    assert replicas.fallback_reads == 1
+    assert replica.in_flight == 0
+
+
+def test_query_error_is_not_retried_on_the_master():
+    replica = Replica(FakePool(), 1)
+    replicas = replica_set(replica)
+    with pytest.raises(pymysql.err.OperationalError):
+        asyncio.run(read(replicas, pymysql.err.OperationalError(1054, "Unknown column")))
+    assert not replica.ejected
+    assert replicas.fallback_reads == 0
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+import requests
+
+from utils.rpc_endpoints import AsyncFailoverHTTPProvider, EndpointSet, FailoverHTTPProvider
+
+URLS = ["http://rpc-1", "http://rpc-2"]
+
+
+class FakeResponse:
+    content = b'{"jsonrpc": "2.0", "id": 1, "result": "0x1"}'
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeSession:
+    """requests.Session whose first endpoint times out"""
+
+    def __init__(self):
+        self.posted = []
+
+    def post(self, url, data=None, **kwargs):
+        self.posted.append(url)
+        if url == URLS[0]:
+            raise requests.exceptions.ReadTimeout("read timed out")
+        return FakeResponse()
+
+
+@pytest.mark.parametrize("method, posted", [
+    ("eth_call", URLS),
+    ("eth_getTransactionCount", URLS),
+    ("eth_sendRawTransaction", URLS[:1]),
+    ("eth_sendTransaction", URLS[:1]),
+])
+def test_sync_sends_are_never_resent(method, posted):
+    session = FakeSession()
+    provider = FailoverHTTPProvider(EndpointSet(URLS), session, 10)
+    if posted == URLS:
+        assert provider._make_request(method, b"{}") == FakeResponse.content
+    else:
+        with pytest.raises(requests.exceptions.ReadTimeout):
+            provider._make_request(method, b"{}")
+    assert session.posted == posted
+
+
+def test_sync_batch_with_a_send_is_not_resent():
+    session = FakeSession()
+    provider = FailoverHTTPProvider(EndpointSet(URLS), session, 10)
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        provider.make_batch_request([("eth_call", []), ("eth_sendRawTransaction", ["0x00"])])
+    assert session.posted == URLS[:1]
+
+
+@pytest.mark.parametrize("method, posted", [
+    ("eth_call", URLS),
+    ("eth_sendRawTransaction", URLS[:1]),
+])
+def test_async_sends_are_never_resent(method, posted):
+    async def scenario():
+        provider = AsyncFailoverHTTPProvider(EndpointSet(URLS), None, 10, hedge=False)
+        seen = []
+
+        async def post_endpoint(endpoint, request_data):
+            seen.append(endpoint.url)
+            if endpoint.url == URLS[0]:
+                raise asyncio.TimeoutError()
+            return FakeResponse.content
+
+        provider._post_endpoint = post_endpoint
+        try:
+            await provider._make_request(method, b"{}")
+        except asyncio.TimeoutError:
+            pass
+        return seen
+
+    assert asyncio.run(scenario()) == posted
@@ -0,0 +1,147 @@
+import base64
+
+import pytest
+
+import api.ai as ai
+from stub_db import StubCursor
+from utils.training_history import HISTORY_HEAD_ID, HISTORY_MAX_LIMIT, decode_cursor, encode_cursor
+
+ADDRESS = "0x" + "a" * 40
+
+
+@pytest.mark.parametrize("last_id", [0, 1, 9, 123456, HISTORY_HEAD_ID])
+def test_cursor_round_trip(last_id):
+    token = encode_cursor(last_id)
+    assert "=" not in token
+    assert decode_cursor(token) == last_id
+
+
+def tamper(token: str) -> str:
+    # One character changed: still base64, not the same id any more or not an id at all
+    return token[:-1] + ("A" if token[-1] != "A" else "B")
+
+
+@pytest.mark.parametrize("token", [
+    "",
+    "!!!",
+    "not-a-cursor",
+    base64.urlsafe_b64encode(b"h2:5").decode(),         # other version
+    base64.urlsafe_b64encode(b"h1:").decode(),
+    base64.urlsafe_b64encode(b"h1:-5").decode(),
+    base64.urlsafe_b64encode(b"h1:5x").decode(),
+    base64.urlsafe_b64encode(b"5").decode(),
+    base64.urlsafe_b64encode("h1:٣".encode()).decode(),  # a digit to str.isdigit, not to us
+])
+def test_invalid_cursors(token):
+    with pytest.raises(ValueError):
+        decode_cursor(token)
+
+
+def test_tampered_cursor_is_rejected_or_another_id():
+    token = encode_cursor(4242)
+    try:
+        assert decode_cursor(tamper(token)) != 4242
+    except ValueError:
+        pass
+
+
+# ------------------------------------------------------------------------------------
+
+class History:
+    """hack_emotion_training of one address, served like MySQL serves HISTORY_QUERY"""
+
+    def __init__(self):
+        self.rows = []
+
+    def add(self, date: str, detail: str, status: int):
+        self.rows.append({"id": len(self.rows) + 1, "date": date, "detail": detail, "status": status,
+                          "visible": int(not any(char.isalpha() for char in detail))})
+
+    def page(self, values):
+        address, before, offset, count = values
+        listed = sorted((row for row in self.rows if row["visible"] and row["id"] < before), key=lambda row: -row["id"])
+        return [{key: row[key] for key in ("id", "date", "detail", "status")} for row in listed[offset:offset + count]]
+
+    def cursor(self):
+        return StubCursor({
+            "hack_emotion_training_count": lambda values: [{"total": sum(row["visible"] for row in self.rows)}],
+            "visible = 1 AND id < %s": self.page,
+        })
+
+
+def walk(redis_run, history, limit):
+    """Every page from the first through the cursors: (rows, responses)"""
+    async def main():
+        responses = [await ai.ai_history(page=1, limit=limit, cursor=None, address=ADDRESS, cursorSlave=history.cursor())]
+        while responses[-1]["next"]:
+            responses.append(await ai.ai_history(page=1, limit=limit, cursor=responses[-1]["next"], address=ADDRESS, cursorSlave=history.cursor()))
+        return responses
+
+    responses = redis_run(main)
+    return [one for response in responses for one in response["data"]], responses
+
+
+def test_pages_across_duplicate_dates(redis_run):
+    history = History()
+    # Two rows (status 1 and 2) on most days, same date on both: boundaries fall inside a date
+    for day in range(1, 12):
+        history.add(f"2026-10-{day:02d}", f"{day % 3 + 1}_{day}", 1)
+        if day % 4:
+            history.add(f"2026-10-{day:02d}", f"{day % 3 + 1}_{day}", 2)
+    history.add("2026-10-12", "error", 1)       # letters: not listed
+    visible = [row for row in history.rows if row["visible"]]
+
+    for limit in (1, 2, 3, 4, 7, len(visible), len(visible) + 5):
+        rows, responses = walk(redis_run, history, limit)
+        expected = [(row["detail"], row["status"]) for row in sorted(visible, key=lambda row: -row["id"])]
+        assert [(one["detail"], one["status"]) for one in rows] == expected, limit
+        assert all(len(response["data"]) == limit for response in responses[:-1])
+        assert responses[-1]["next"] is None
+        assert all(response["total"] == len(visible) for response in responses)
+
+
+def test_inserts_between_pages_do_not_shift(redis_run):
+    history = History()
+    for day in range(1, 6):
+        history.add(f"2026-10-{day:02d}", f"1_{day}", 1)
+        history.add(f"2026-10-{day:02d}", f"1_{day}", 2)
+
+    async def first():
+        return await ai.ai_history(page=1, limit=3, cursor=None, address=ADDRESS, cursorSlave=history.cursor())
+
+    first_page = redis_run(first)
+    # Same date as the newest rows, after the first page was read
+    history.add("2026-10-05", "2_9", 1)
+
+    async def second():
+        return await ai.ai_history(page=1, limit=3, cursor=first_page["next"], address=ADDRESS, cursorSlave=history.cursor())
+
+    second_page = redis_run(second)
+    seen = first_page["data"] + second_page["data"]
+    assert [(one["detail"], one["status"]) for one in seen] == [
+        ("1_5", 2), ("1_5", 1), ("1_4", 2), ("1_4", 1), ("1_3", 2), ("1_3", 1),
+    ]
+
+
+def test_invalid_cursor_answers_400(redis_run):
+    history = History()
+    history.add("2026-10-01", "1_1", 1)
+
+    async def main():
+        return await ai.ai_history(page=1, limit=10, cursor="garbage", address=ADDRESS, cursorSlave=history.cursor())
+
+    assert redis_run(main) == {"code": 400, "success": False, "msg": "Invalid cursor"}
+
+
+def test_limit_is_clamped(redis_run):
+    history = History()
+    for day in range(1, 130):
+        history.add(f"2026-10-{day % 28 + 1:02d}", f"1_{day}", 1)
+
+    async def main(limit):
+        return await ai.ai_history(page=1, limit=limit, cursor=None, address=ADDRESS, cursorSlave=history.cursor())
+
+    response = redis_run(main, -5)
+    assert len(response["data"]) == 1 and response["next"] is not None
+    response = redis_run(main, 1000)
+    assert len(response["data"]) == HISTORY_MAX_LIMIT and response["next"] is not None
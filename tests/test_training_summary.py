@@ -0,0 +1,33 @@
+from utils.training_summary import add_deep_training, current_streak, cycle, empty_summary
+
+ADDRESS = "0x" + "a" * 40
+
+
+def summary_of(*dates):
+    summary = empty_summary(ADDRESS)
+    for date in dates:
+        add_deep_training(summary, date, f"detail {date}")
+    return summary
+
+
+def test_cycle_stops_at_the_first_gap():
+    # 2026-10-15 missing: the 14th and 13th are no longer part of the run
+    summary = summary_of("2026-10-13", "2026-10-14", "2026-10-16", "2026-10-17", "2026-10-18")
+    assert [one['date'] for one in cycle(summary, "2026-10-18")] == ["2026-10-18", "2026-10-17", "2026-10-16"]
+    assert current_streak(summary, "2026-10-18") == 3
+
+
+def test_cycle_ends_yesterday_while_today_is_open():
+    summary = summary_of("2026-10-15", "2026-10-16", "2026-10-17")
+    assert [one['date'] for one in cycle(summary, "2026-10-18")] == ["2026-10-17", "2026-10-16", "2026-10-15"]
+
+
+def test_cycle_is_empty_after_a_missed_day():
+    summary = summary_of("2026-10-15", "2026-10-16")
+    assert cycle(summary, "2026-10-18") == []
+    assert cycle(empty_summary(ADDRESS), "2026-10-18") == []
+
+
+def test_cycle_keeps_to_the_window():
+    summary = summary_of(*(f"2026-10-{day:02d}" for day in range(10, 19)))
+    assert [one['date'] for one in cycle(summary, "2026-10-18")] == [f"2026-10-{day}" for day in range(18, 13, -1)]
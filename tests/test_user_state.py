@@ -0,0 +1,61 @@
+import pytest
+
+import utils.user_state as user_state
+from utils.cache import get_redis_connection
+from utils.day_clock import DayClock
+from utils.user_state import ACTIVE_USERS_KEY, USER_STATE_FIELDS, ACTIVE_FIELD, load_user_state, user_state as open_user_state
+
+ADDRESS = "0x" + "b" * 40
+START = 1792281600.0    # 2026-10-18 00:00:00 UTC
+
+
+class FixedTime:
+    def __init__(self, now: float):
+        self.value = now
+
+    def __call__(self) -> float:
+        return self.value
+
+
+@pytest.fixture
+def now(monkeypatch):
+    now = FixedTime(START + 3600)
+    monkeypatch.setattr(user_state, "clock", DayClock(now=now))
+    return now
+
+
+async def active_score():
+    async with get_redis_connection(True) as cache:
+        return await cache.zscore(ACTIVE_USERS_KEY, ADDRESS)
+
+
+def test_touch_writes_once_per_interval(redis_run, now):
+    async def scenario():
+        scores = []
+        for step in (0, 10, 600, USER_STATE_FIELDS[ACTIVE_FIELD]):
+            now.value += step
+            await load_user_state(ADDRESS)
+            scores.append(await active_score())
+        async with get_redis_connection(True) as cache:
+            ttl = await cache.ttl(user_state.USER_STATE_KEY.format(address=ADDRESS))
+        return scores, ttl
+
+    scores, ttl = redis_run(scenario)
+    first = START + 3600
+    assert scores == [first, first, first, first + 610 + USER_STATE_FIELDS[ACTIVE_FIELD]]
+    assert 0 < ttl <= user_state.USER_STATE_EX
+
+
+def test_save_after_expired_touch_keeps_it(redis_run, now):
+    async def scenario():
+        await load_user_state(ADDRESS)
+        now.value += USER_STATE_FIELDS[ACTIVE_FIELD] + 1
+        async with open_user_state(ADDRESS) as state:
+            state.set("training:summary", {"total": 1})
+        now.value += 10
+        state = await load_user_state(ADDRESS)
+        return state.get(ACTIVE_FIELD), state.get("training:summary"), await active_score()
+
+    active, summary, score = redis_run(scenario)
+    assert (active, summary) == (1, {"total": 1})
+    assert score == START + 3600 + USER_STATE_FIELDS[ACTIVE_FIELD] + 1
@@ -1,96 +1,616 @@
 import asyncio
-import json
-from builtins import anext
+import copy
+import functools
+import inspect
+import random
+import time
+import uuid
 from contextlib import asynccontextmanager
 
+from redis.client import NEVER_DECODE
+
+from utils.cache_codec import cache_codec
+from utils.cache_metrics import cache_metrics
+from utils.local_cache import local_cache
 from utils.log import log as logger
-from utils.redis.init import get_redis
-from utils.serialization_tools import is_json, get_dict_target_value
+from utils.redis.init import RedisMixin, get_shared_redis
+from utils.serialization_tools import get_dict_target_value
 
 
 @asynccontextmanager
 async def get_redis_connection(master_db: bool | None = True):
-    _c = get_redis(master_db)
-    if _c is None:
-        raise RuntimeError("Unable to connect to Redis: _c")
-    cache = await anext(_c)
+    cache = await get_shared_redis(master_db)
+    if cache is not None:
+        yield cache
+        return
+    # Threads that run their own event loop (asyncio.run) cannot share the pooled client
+    cache = await RedisMixin(bool(master_db)).connect_redis
     if cache is None:
         raise RuntimeError("Unable to connect to Redis: cache")
     try:
         yield cache
     finally:
-        pass
+        await cache.aclose()
 
 
-async def validate_key_and_data(cache, key: str):
-    if not await cache.exists(key):
-        return None
-    data = await cache.get(key)
-    if not data:
-        return None
+def decode_redis_data(data, value_key: str = None):
+    """Decode a value read with NEVER_DECODE, exactly once"""
+    value = cache_codec.decode(data)
+    if value_key and value is not None:
+        return get_dict_target_value(value, value_key)
+    return value
+
+
+def encode_redis_data(value) -> bytes:
+    return cache_codec.encode(value)
+
+
+async def get_raw(cache, key: str):
+    # Cache values are bytes, skip the client's utf-8 decoding
+    return await cache.execute_command("GET", key, **{NEVER_DECODE: []})
+
+
+async def get_raw_cached(master_db: bool, key: str):
+    """get_raw through the in-process L1 for hot key families"""
+    start = time.perf_counter()
+    data = local_cache.get(key)
+    if data is not None:
+        cache_metrics.read(key, len(data), time.perf_counter() - start, l1=True)
+        return data
+    epoch = local_cache.epoch
+    try:
+        async with get_redis_connection(master_db) as cache:
+            data = await get_raw(cache, key)
+    except Exception:
+        cache_metrics.error(key)
+        raise
+    cache_metrics.read(key, len(data) if data else None, time.perf_counter() - start)
+    local_cache.set(key, data, epoch)
     return data
 
 
-async def increment_redis_data(master_db: bool, key: str, value_key: str = None, **kwargs) -> bool:
+async def publish_invalidation(*keys: str):
+    """Drop the hot ones among keys from every worker's L1, after a write or delete"""
+    hot = local_cache.hot_keys(keys)
+    if not hot:
+        return
+    try:
+        async with get_redis_connection(True) as cache:
+            await local_cache.publish(cache, *hot)
+    except Exception as e:
+        logger.error(f"publish_invalidation {hot} Exception: {str(e)}")
+
+
+# HINCRBY only if the record is cached: a missing key must not come back as a lone counter.
+# HINCRBY leaves the TTL alone
+INCREMENT_HASH_SCRIPT = """
+if redis.call('exists', KEYS[1]) == 1 then
+    return redis.call('hincrby', KEYS[1], ARGV[1], ARGV[2])
+end
+return false
+"""
+
+
+async def increment_redis_data(master_db: bool, key: str, value_key: str, amount: int = 1) -> int | None:
+    """Atomically add amount to one counter field of a cached hash record, in one round trip; None if not cached"""
+    start = time.perf_counter()
     try:
         async with get_redis_connection(master_db) as cache:
-            data = await validate_key_and_data(cache, key)
-            if not data:
-                return False
-            # print(f"increment_redis_data key: {key} data: {data}")
-            if is_json(data):
-                data = json.loads(data)
-                if value_key and int(get_dict_target_value(data, value_key)) >= 0:
-                    data[value_key] += 1
-                    data_json = json.dumps(data)
-                    await cache.set(key, data_json, **kwargs)
-            return True
+            value = await cache.eval(INCREMENT_HASH_SCRIPT, 1, key, value_key, amount)
     except Exception as e:
+        cache_metrics.error(key)
         logger.error(f"increment_redis_data Exception: {str(e)}")
-        return False
+        return None
+    cache_metrics.write(key, 0, time.perf_counter() - start)
+    return None if value is None else int(value)
 
 
-async def get_redis_data(master_db: bool, key: str, value_key: str = None):
+async def get_redis_hash(master_db: bool, key: str) -> dict | None:
+    """A record stored with set_redis_hash (HGETALL), None on a miss. Values come back as str"""
+    start = time.perf_counter()
     try:
         async with get_redis_connection(master_db) as cache:
-            data = await validate_key_and_data(cache, key)
-            if not data:
-                return None
-            # print(f"get_redis_data {key} data: {data}")
-            if is_json(data):
-                data = json.loads(data)
-                if value_key:
-                    return get_dict_target_value(data, value_key)
-            return data
+            record = await cache.hgetall(key)
+    except Exception as e:
+        cache_metrics.error(key)
+        logger.error(f"get_redis_hash Exception: {str(e)}")
+        return None
+    cache_metrics.read(key, sum(len(field) + len(value) for field, value in record.items()) if record else None, time.perf_counter() - start)
+    return record or None
+
+
+async def set_redis_hash(master_db: bool, key: str, mapping: dict, ex: int | None = None):
+    """Replace a record with a hash (also replaces an old JSON string under the same key)"""
+    start = time.perf_counter()
+    mapping = {field: "" if value is None else value for field, value in mapping.items()}
+    try:
+        async with get_redis_connection(master_db) as cache:
+            pipe = cache.pipeline(transaction=True)
+            pipe.delete(key)
+            pipe.hset(key, mapping=mapping)
+            if ex:
+                pipe.expire(key, ex)
+            await pipe.execute()
+    except Exception as e:
+        cache_metrics.error(key)
+        logger.error(f"set_redis_hash Exception: {str(e)}")
+        return None
+    cache_metrics.write(key, sum(len(str(field)) + len(str(value)) for field, value in mapping.items()), time.perf_counter() - start)
+
+
+async def get_redis_data(master_db: bool, key: str, value_key: str = None):
+    try:
+        data = await get_raw_cached(master_db, key)
+        # print(f"get_redis_data {key} data: {data}")
+        return decode_redis_data(data, value_key)
     except Exception as e:
         logger.error(f"get_redis_data Exception: {str(e)}")
         return None
 
 
 async def set_redis_data(master_db: bool, key: str, value=None, **kwargs):
+    start = time.perf_counter()
     try:
+        data = encode_redis_data(value)
         async with get_redis_connection(master_db) as cache:
-            if isinstance(value, dict) or isinstance(value, list):
-                value = json.dumps(value)
             # print(f"set_redis_data {key} value: {value}")
-            await cache.set(key, value, **kwargs)
+            await cache.set(key, data, **kwargs)
     except Exception as e:
+        cache_metrics.error(key)
         logger.error(f"set_redis_data Exception: {str(e)}")
         return None
+    cache_metrics.write(key, len(data), time.perf_counter() - start)
+    await publish_invalidation(key)
 
 
 async def del_redis_data(master_db: bool, key: str) -> bool:
+    return await delete_many(master_db, key) > 0
+
+
+async def get_many(master_db: bool, keys: list, value_key: str = None) -> list:
+    """Values of keys in one MGET, None for misses"""
+    if not keys:
+        return []
+    start = time.perf_counter()
+    try:
+        async with get_redis_connection(master_db) as cache:
+            values = await cache.execute_command("MGET", *keys, **{NEVER_DECODE: []})
+    except Exception as e:
+        for key in keys:
+            cache_metrics.error(key)
+        logger.error(f"get_many Exception: {str(e)}")
+        return [None] * len(keys)
+    elapsed = time.perf_counter() - start
+    for key, data in zip(keys, values):
+        cache_metrics.read(key, len(data) if data else None, elapsed)
     try:
+        return [decode_redis_data(data, value_key) for data in values]
+    except Exception as e:
+        logger.error(f"get_many Exception: {str(e)}")
+        return [None] * len(keys)
+
+
+async def set_many(master_db: bool, mapping: dict, **kwargs):
+    """SET every key of mapping with the same options (ex, nx...), in one pipeline"""
+    if not mapping:
+        return
+    start = time.perf_counter()
+    try:
+        encoded = {key: encode_redis_data(value) for key, value in mapping.items()}
         async with get_redis_connection(master_db) as cache:
-            data = await validate_key_and_data(cache, key)
-            if not data:
-                return False
-            await cache.delete(key)
-            return True
+            pipe = cache.pipeline(transaction=False)
+            for key, data in encoded.items():
+                pipe.set(key, data, **kwargs)
+            await pipe.execute()
+    except Exception as e:
+        for key in mapping:
+            cache_metrics.error(key)
+        logger.error(f"set_many Exception: {str(e)}")
+        return None
+    elapsed = time.perf_counter() - start
+    for key, data in encoded.items():
+        cache_metrics.write(key, len(data), elapsed)
+    await publish_invalidation(*mapping)
+
+
+async def delete_many(master_db: bool, *keys: str) -> int:
+    """UNLINK keys in one command, number of keys that existed"""
+    if not keys:
+        return 0
+    start = time.perf_counter()
+    try:
+        async with get_redis_connection(master_db) as cache:
+            deleted = await cache.unlink(*keys)
+    except Exception as e:
+        for key in keys:
+            cache_metrics.error(key)
+        logger.error(f"delete_many Exception: {str(e)}")
+        return 0
+    elapsed = time.perf_counter() - start
+    for key in keys:
+        cache_metrics.delete(key, elapsed)
+    await publish_invalidation(*keys)
+    return deleted
+
+
+class RedisBatch:
+    """
+    Independent cache operations of one request, sent in one pipeline:
+
+        async with redis_batch(True) as batch:
+            detail = batch.hgetall(detail_key)
+            pending = batch.set(pending_key, 1, ex=60, nx=True)
+        detail.result(), pending.result()
+
+    Each op returns a future resolved when the block exits (or on flush());
+    a failed op resolves to None, like the helpers above. Nothing is sent if the block raises.
+    """
+
+    def __init__(self, master_db: bool):
+        self.master_db = master_db
+        # (command, args, kwargs, future, decode, key, kind); kind is read/write/delete for the metrics
+        self._ops: list[tuple[str, tuple, dict, asyncio.Future, object, str, str | None]] = []
+        self._written: list[str] = []
+
+    def _add(self, command: str, *args, key: str, kind: str | None = None, decode=None, **kwargs) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._ops.append((command, args, kwargs, future, decode, key, kind))
+        return future
+
+    def get(self, key: str) -> asyncio.Future:
+        return self._add("execute_command", "GET", key, key=key, kind="read", decode=decode_redis_data, **{NEVER_DECODE: []})
+
+    def set(self, key: str, value, **kwargs) -> asyncio.Future:
+        self._written.append(key)
+        return self._add("set", key, encode_redis_data(value), key=key, kind="write", **kwargs)
+
+    def delete(self, *keys: str) -> asyncio.Future:
+        self._written.extend(keys)
+        return self._add("unlink", *keys, key=keys[0], kind="delete")
+
+    def hgetall(self, key: str) -> asyncio.Future:
+        return self._add("hgetall", key, key=key, kind="read")
+
+    def hgetall_raw(self, key: str) -> asyncio.Future:
+        # Fields and values as bytes, for hashes of codec-encoded values
+        return self._add("execute_command", "HGETALL", key, key=key, kind="read", **{NEVER_DECODE: []})
+
+    def hset(self, key: str, mapping: dict) -> asyncio.Future:
+        return self._add("hset", key, mapping=mapping, key=key, kind="write")
+
+    def hdel(self, key: str, *fields: str) -> asyncio.Future:
+        return self._add("hdel", key, *fields, key=key, kind="delete")
+
+    def lrange_raw(self, key: str, start: int = 0, end: int = -1) -> asyncio.Future:
+        return self._add("execute_command", "LRANGE", key, start, end, key=key, kind="read", **{NEVER_DECODE: []})
+
+    def rpush(self, key: str, *values: bytes) -> asyncio.Future:
+        return self._add("rpush", key, *values, key=key, kind="write")
+
+    def lset(self, key: str, index: int, value: bytes) -> asyncio.Future:
+        return self._add("lset", key, index, value, key=key, kind="write")
+
+    def rpop(self, key: str) -> asyncio.Future:
+        return self._add("rpop", key, key=key, kind="delete")
+
+    def ltrim(self, key: str, start: int, end: int) -> asyncio.Future:
+        return self._add("ltrim", key, start, end, key=key)
+
+    def zadd(self, key: str, mapping: dict) -> asyncio.Future:
+        return self._add("zadd", key, mapping, key=key, kind="write")
+
+    def incr(self, key: str) -> asyncio.Future:
+        return self._add("incr", key, key=key)
+
+    def expire(self, key: str, ex: int) -> asyncio.Future:
+        return self._add("expire", key, ex, key=key)
+
+    def eval(self, script: str, numkeys: int, *args) -> asyncio.Future:
+        return self._add("eval", script, numkeys, *args, key=str(args[0]) if numkeys else "eval", kind="write")
+
+    @staticmethod
+    def _record(command: str, args: tuple, key: str, kind: str | None, result, elapsed: float):
+        if kind == "read":
+            size = None
+            if isinstance(result, bytes):
+                size = len(result)
+            elif isinstance(result, list):
+                size = sum(len(item) for item in result) if result else None
+            elif result:
+                size = sum(len(field) + len(value) for field, value in result.items())
+            cache_metrics.read(key, size, elapsed)
+        elif kind == "write":
+            if command == "set":
+                size = len(args[1])
+            elif command == "rpush":
+                size = sum(len(value) for value in args[1:])
+            elif command == "lset":
+                size = len(args[2])
+            else:
+                size = 0
+            cache_metrics.write(key, size, elapsed)
+        elif kind == "delete":
+            cache_metrics.delete(key, elapsed)
+
+    async def flush(self):
+        ops, self._ops = self._ops, []
+        written, self._written = self._written, []
+        if not ops:
+            return
+        start = time.perf_counter()
+        try:
+            async with get_redis_connection(self.master_db) as cache:
+                pipe = cache.pipeline(transaction=False)
+                for command, args, kwargs, *_ in ops:
+                    getattr(pipe, command)(*args, **kwargs)
+                results = await pipe.execute(raise_on_error=False)
+        except Exception as e:
+            logger.error(f"RedisBatch Exception: {str(e)}")
+            results = [e] * len(ops)
+        elapsed = time.perf_counter() - start
+        for (command, args, _, future, decode, key, kind), result in zip(ops, results):
+            if isinstance(result, Exception):
+                cache_metrics.error(key)
+                logger.error(f"RedisBatch {command} {key} Exception: {str(result)}")
+                result = None
+            else:
+                self._record(command, args, key, kind, result, elapsed)
+                if decode is not None:
+                    try:
+                        result = decode(result)
+                    except Exception as e:
+                        logger.error(f"RedisBatch {command} {key} decode Exception: {str(e)}")
+                        result = None
+            if not future.done():
+                future.set_result(result)
+        await publish_invalidation(*written)
+
+
+@asynccontextmanager
+async def redis_batch(master_db: bool | None = True):
+    batch = RedisBatch(bool(master_db))
+    try:
+        yield batch
+    except BaseException:
+        for _, _, _, future, *_ in batch._ops:
+            future.cancel()
+        raise
+    await batch.flush()
+
+
+# ------------------------------------------------------------------------------------
+# get-or-load: one loader per key across requests (in-process) and workers (Redis lock),
+# stale values served while a single caller refreshes them
+
+LOCK_SUFFIX = ":lock"
+LOCK_WAIT_INTERVAL = 0.05
+# Delete the lock only if we still own it
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+_inflight: dict[str, tuple[asyncio.Task, bool]] = {}
+get_or_load_stats = {
+    "hits": 0,
+    "stale_hits": 0,
+    "misses": 0,
+    "coalesced": 0,
+    "loads": 0,
+    "lock_waits": 0,
+    "refreshes": 0,
+    "errors": 0,
+}
+
+
+def jittered_ttl(ex: int, jitter: float = 0.1) -> int:
+    """Shorten a TTL by up to `jitter` so keys written together do not expire together"""
+    if ex <= 1 or jitter <= 0:
+        return ex
+    return max(1, int(ex * (1 - random.uniform(0, jitter))))
+
+
+async def get_cached(master_db: bool, key: str):
+    """(value, fresh) of a key written by get_or_load/set_cached, (None, False) on a miss"""
+    data = await get_raw_cached(master_db, key)
+    envelope = cache_codec.decode(data)
+    if not envelope:
+        return None, False
+    return envelope['v'], time.time() < envelope['f']
+
+
+async def set_cached(key: str, value, ex: int, stale_ex: int = 0, jitter: float = 0.1):
+    """Fresh for ~ex seconds, then served stale for stale_ex more while it is refreshed"""
+    fresh_ex = jittered_ttl(ex, jitter)
+    envelope = cache_codec.encode({"v": value, "f": time.time() + fresh_ex})
+    start = time.perf_counter()
+    try:
+        async with get_redis_connection(True) as cache:
+            await cache.set(key, envelope, ex=fresh_ex + stale_ex)
+    except Exception:
+        cache_metrics.error(key)
+        raise
+    cache_metrics.write(key, len(envelope), time.perf_counter() - start)
+    await publish_invalidation(key)
+
+
+async def _acquire_lock(key: str, token: str, lock_timeout: float) -> bool:
+    async with get_redis_connection(True) as cache:
+        return bool(await cache.set(key + LOCK_SUFFIX, token, nx=True, px=int(lock_timeout * 1000)))
+
+
+async def _release_lock(key: str, token: str):
+    async with get_redis_connection(True) as cache:
+        await cache.eval(RELEASE_LOCK_SCRIPT, 1, key + LOCK_SUFFIX, token)
+
+
+async def _load(master_db: bool, key: str, loader, ex: int, stale_ex: int, jitter: float, lock_timeout: float, wait: bool):
+    token = uuid.uuid4().hex
+    try:
+        locked = await _acquire_lock(key, token, lock_timeout)
+    except Exception as e:
+        logger.error(f"get_or_load lock {key} Exception: {str(e)}")
+        locked = False
+    else:
+        if not locked:
+            if not wait:
+                # Another worker is already refreshing
+                return None
+            get_or_load_stats['lock_waits'] += 1
+            deadline = time.monotonic() + lock_timeout
+            while time.monotonic() < deadline:
+                await asyncio.sleep(LOCK_WAIT_INTERVAL)
+                value, fresh = await get_cached(master_db, key)
+                if fresh:
+                    return value
+                async with get_redis_connection(True) as cache:
+                    if not await cache.exists(key + LOCK_SUFFIX):
+                        break
+            # The holder gave up or is too slow: load without the lock
+    try:
+        get_or_load_stats['loads'] += 1
+        value = await loader()
+        if value is not None:
+            await set_cached(key, value, ex, stale_ex, jitter)
+        return value
+    finally:
+        if locked:
+            try:
+                await _release_lock(key, token)
+            except Exception as e:
+                logger.error(f"get_or_load unlock {key} Exception: {str(e)}")
+
+
+def _start_load(master_db: bool, key: str, loader, ex: int, stale_ex: int, jitter: float, lock_timeout: float, wait: bool) -> asyncio.Task:
+    task = asyncio.ensure_future(_load(master_db, key, loader, ex, stale_ex, jitter, lock_timeout, wait))
+    _inflight[key] = (task, wait)
+
+    def done(finished: asyncio.Task):
+        if _inflight.get(key, (None,))[0] is finished:
+            del _inflight[key]
+        # Always retrieve the exception: waiters may have been cancelled
+        error = None if finished.cancelled() else finished.exception()
+        if error is not None and not wait:
+            get_or_load_stats['errors'] += 1
+            logger.error(f"get_or_load refresh {key} Exception: {str(error)}")
+
+    task.add_done_callback(done)
+    return task
+
+
+async def get_or_load(master_db: bool, key: str, loader, ex: int = 60, stale_ex: int = 0, jitter: float = 0.1, lock_timeout: float = 10):
+    """
+    Cached value of key, calling `loader()` (no arguments, awaitable) at most once per key
+    across this worker's concurrent requests and across workers.
+    stale_ex > 0: an expired value is still returned for up to stale_ex seconds while
+    one caller refreshes it in the background - the loader must then not rely on
+    request-scoped resources (cursors). None results are not cached.
+    """
+    try:
+        value, fresh = await get_cached(master_db, key)
     except Exception as e:
-        logger.error(f"del_redis_data Exception: {str(e)}")
+        logger.error(f"get_or_load {key} Exception: {str(e)}")
+        value, fresh = None, False
+    if value is not None:
+        if fresh:
+            get_or_load_stats['hits'] += 1
+            return value
+        if stale_ex > 0:
+            get_or_load_stats['stale_hits'] += 1
+            if key not in _inflight:
+                get_or_load_stats['refreshes'] += 1
+                _start_load(master_db, key, loader, ex, stale_ex, jitter, lock_timeout, wait=False)
+            return value
+    get_or_load_stats['misses'] += 1
+    task, wait = _inflight.get(key, (None, False))
+    # A background refresh may give up on the lock, only join real loads
+    if task is not None and wait and task.get_loop() is asyncio.get_running_loop():
+        get_or_load_stats['coalesced'] += 1
+    else:
+        task = _start_load(master_db, key, loader, ex, stale_ex, jitter, lock_timeout, wait=True)
+    # Callers mutate the result: the task's object stays private, every caller (the one
+    # that started the load too) gets its own copy
+    return copy.deepcopy(await asyncio.shield(task))
+
+
+# ------------------------------------------------------------------------------------
+# @cached: key template + TTL + tags; a tag is invalidated by bumping its generation,
+# which is part of every key carrying that tag
+
+TAG_KEY_PREFIX = "hackathon:tag"
+# Must outlive every tagged entry: a generation that expires restarts at 0 and could revive old entries
+TAG_EX = 30 * 86400
+
+
+def tag_key(tag: str) -> str:
+    return f"{TAG_KEY_PREFIX}:{tag}"
+
+
+async def get_tag_generations(tags: list) -> list:
+    if not tags:
+        return []
+    # Master: an invalidation must be visible to the very next read
+    async with get_redis_connection(True) as cache:
+        pipe = cache.pipeline(transaction=False)
+        for tag in tags:
+            pipe.get(tag_key(tag))
+        values = await pipe.execute()
+    return [int(value or 0) for value in values]
+
+
+async def invalidate_tags(*tags: str, batch: RedisBatch | None = None) -> bool:
+    """Drop every @cached entry carrying one of the tags, in one round trip (or as part of batch)"""
+    if batch is not None:
+        for tag in tags:
+            batch.incr(tag_key(tag))
+            batch.expire(tag_key(tag), TAG_EX)
+        return True
+    try:
+        async with get_redis_connection(True) as cache:
+            pipe = cache.pipeline(transaction=False)
+            for tag in tags:
+                pipe.incr(tag_key(tag))
+                pipe.expire(tag_key(tag), TAG_EX)
+            await pipe.execute()
+        return True
+    except Exception as e:
+        logger.error(f"invalidate_tags {tags} Exception: {str(e)}")
         return False
 
 
+def cached(key: str, ex: int, tags: tuple = (), stale_ex: int = 0, master_db: bool = False):
+    """
+    Cache an async loader under a key template filled from its arguments:
+
+        @cached("hackathon:trainall:{address}:count", ex=600, tags=("user:{address}:training",))
+        async def load_history_count(cursorSlave, address): ...
+
+    Arguments not named in the templates (cursors) are only passed through.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            arguments = signature.bind(*args, **kwargs)
+            arguments.apply_defaults()
+            cache_key = key.format(**arguments.arguments)
+            try:
+                generations = await get_tag_generations([tag.format(**arguments.arguments) for tag in tags])
+            except Exception as e:
+                logger.error(f"cached {cache_key} Exception: {str(e)}")
+                return await func(*args, **kwargs)
+            if generations:
+                cache_key += ":g" + ".".join(str(generation) for generation in generations)
+            return await get_or_load(master_db, cache_key, lambda: func(*args, **kwargs), ex=ex, stale_ex=stale_ex)
+
+        wrapper.key_template = key
+        wrapper.tags = tags
+        return wrapper
+    return decorator
+
+
 if __name__ == '__main__':
     asyncio.run(get_redis_data(True, 'sys:settings'))
@@ -0,0 +1,89 @@
+"""
+- Cache values as bytes: 3-byte header (magic, format, schema version) + payload
+- Entries written before the header existed (plain JSON text or raw strings) still decode
+- Read them with NEVER_DECODE: the Redis clients use decode_responses=True
+"""
+
+import json
+
+from config import CACHE_COMPRESS_MIN
+from utils.log import log as logger
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CODEC_MAGIC = 0xC1  # never the first byte of UTF-8 text, so never of an old entry
+# Bump when the shape of cached values changes: older entries then read as misses
+CODEC_SCHEMA = 1
+
+FORMAT_ORJSON = ord("j")
+FORMAT_JSON = ord("p")  # stdlib json: values orjson cannot hold (ints above 64 bits, wei amounts)
+FORMAT_ZSTD = 0x80      # flag: payload is zstd-compressed
+
+
+def _dumps(value) -> tuple[int, bytes]:
+    if orjson is not None:
+        try:
+            return FORMAT_ORJSON, orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass
+    return FORMAT_JSON, json.dumps(value, separators=(",", ":")).encode()
+
+
+def _loads(fmt: int, payload: bytes):
+    if fmt == FORMAT_ORJSON and orjson is not None:
+        return orjson.loads(payload)
+    # orjson output is plain JSON, stdlib json reads it too
+    return json.loads(payload)
+
+
+class CacheCodec:
+    def __init__(self, compress_min: int = CACHE_COMPRESS_MIN, schema: int = CODEC_SCHEMA):
+        # 0 disables compression
+        self.compress_min = compress_min if zstandard is not None else 0
+        self.schema = schema
+        self._compressor = zstandard.ZstdCompressor(level=3) if self.compress_min else None
+        self._decompressor = zstandard.ZstdDecompressor() if zstandard is not None else None
+
+    def encode(self, value) -> bytes:
+        fmt, payload = _dumps(value)
+        if self.compress_min and len(payload) >= self.compress_min:
+            fmt, payload = fmt | FORMAT_ZSTD, self._compressor.compress(payload)
+        return bytes((CODEC_MAGIC, fmt, self.schema)) + payload
+
+    def decode(self, data: bytes | str | None):
+        """The cached value, None for a miss or an entry this version cannot read"""
+        if not data:
+            return None
+        if isinstance(data, str) or data[0] != CODEC_MAGIC:
+            return self.decode_legacy(data)
+        if len(data) < 3 or data[2] != self.schema:
+            return None
+        fmt, payload = data[1], data[3:]
+        if fmt & FORMAT_ZSTD:
+            if self._decompressor is None:
+                logger.warning("CacheCodec: zstd entry but zstandard is not installed")
+                return None
+            fmt, payload = fmt & ~FORMAT_ZSTD, self._decompressor.decompress(payload)
+        if fmt not in (FORMAT_ORJSON, FORMAT_JSON):
+            logger.warning(f"CacheCodec: unreadable format {fmt}")
+            return None
+        return _loads(fmt, payload)
+
+    @staticmethod
+    def decode_legacy(data: bytes | str):
+        # JSON text from json.dumps (stdlib keeps big ints exact), or a raw string stored as is
+        try:
+            return json.loads(data)
+        except ValueError:
+            return data.decode() if isinstance(data, bytes) else data
+
+
+cache_codec = CacheCodec()
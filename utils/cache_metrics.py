@@ -0,0 +1,160 @@
+"""
+- Per key family (key with its variable segments stripped) cache counters:
+  hits, L1 hits, misses, errors, writes, deletes, latency histogram, value sizes
+- Hot keys: Space-Saving top-K over a sample of the reads
+"""
+
+import bisect
+import functools
+import random
+import re
+
+LATENCY_BUCKETS_MS = (0.25, 0.5, 1, 2, 5, 10, 25, 50, 100, 250, 1000)
+HOT_KEYS_SIZE = 50         # counters kept by the top-K sketch
+HOT_KEYS_SAMPLE = 0.1      # share of reads fed to it
+
+# Variable key segments, first match wins
+SEGMENT_PATTERNS = (
+    (re.compile(r"^0x[0-9a-fA-F]{40}$"), "{address}"),
+    (re.compile(r"^\d{4}-\d{2}-\d{2}$"), "{date}"),
+    (re.compile(r"^-?\d+$"), "{n}"),
+    (re.compile(r"^g\d+(\.\d+)*$"), "{gen}"),
+    (re.compile(r"^[0-9a-fA-F]{32,}$"), "{hash}"),
+)
+
+
+@functools.lru_cache(maxsize=4096)
+def key_family(key: str) -> str:
+    """hackathon:aitrain:0xAb..:2024-05-01:detail -> hackathon:aitrain:{address}:{date}:detail"""
+    segments = []
+    for segment in key.split(":"):
+        for pattern, placeholder in SEGMENT_PATTERNS:
+            if pattern.match(segment):
+                segment = placeholder
+                break
+        segments.append(segment)
+    return ":".join(segments)
+
+
+class FamilyStats:
+    def __init__(self):
+        self.hits = 0
+        self.l1_hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.writes = 0
+        self.deletes = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.max_size = 0
+        self.histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def observe(self, elapsed: float):
+        self.histogram[bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed * 1000)] += 1
+
+    def quantile(self, q: float) -> float | None:
+        """Latency quantile in ms, upper bound of its histogram bucket"""
+        total = sum(self.histogram)
+        if total == 0:
+            return None
+        seen = 0
+        for index, count in enumerate(self.histogram):
+            seen += count
+            if seen >= q * total:
+                return LATENCY_BUCKETS_MS[min(index, len(LATENCY_BUCKETS_MS) - 1)]
+        return LATENCY_BUCKETS_MS[-1]
+
+    def stats(self) -> dict:
+        reads = self.hits + self.l1_hits + self.misses
+        return {
+            "reads": reads,
+            "hits": self.hits,
+            "l1_hits": self.l1_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits + self.l1_hits) / reads, 4) if reads else 0,
+            "errors": self.errors,
+            "writes": self.writes,
+            "deletes": self.deletes,
+            "avg_size": round(self.bytes_read / (self.hits + self.l1_hits)) if self.hits + self.l1_hits else 0,
+            "max_size": self.max_size,
+            "bytes_written": self.bytes_written,
+            "p50_ms": self.quantile(0.5),
+            "p99_ms": self.quantile(0.99),
+        }
+
+
+class HotKeys:
+    """Space-Saving: a key that is not tracked replaces the smallest counter and inherits its count"""
+
+    def __init__(self, size: int = HOT_KEYS_SIZE, sample: float = HOT_KEYS_SAMPLE):
+        self.size = size
+        self.sample = sample
+        self.counters: dict[str, int] = {}
+
+    def offer(self, key: str):
+        if random.random() >= self.sample:
+            return
+        if key in self.counters:
+            self.counters[key] += 1
+        elif len(self.counters) < self.size:
+            self.counters[key] = 1
+        else:
+            smallest = min(self.counters, key=self.counters.get)
+            self.counters[key] = self.counters.pop(smallest) + 1
+
+    def top(self, count: int = 20) -> list:
+        ranked = sorted(self.counters.items(), key=lambda item: item[1], reverse=True)[:count]
+        # Scaled back to estimated reads
+        return [{"key": key, "reads": round(hits / self.sample)} for key, hits in ranked]
+
+
+class CacheMetrics:
+    def __init__(self):
+        self.families: dict[str, FamilyStats] = {}
+        self.hot_keys = HotKeys()
+
+    def family(self, key: str) -> FamilyStats:
+        name = key_family(key)
+        stats = self.families.get(name)
+        if stats is None:
+            stats = self.families[name] = FamilyStats()
+        return stats
+
+    def read(self, key: str, size: int | None, elapsed: float, l1: bool = False):
+        """size: length of the value read, None for a miss"""
+        stats = self.family(key)
+        if size is None:
+            stats.misses += 1
+        else:
+            if l1:
+                stats.l1_hits += 1
+            else:
+                stats.hits += 1
+            stats.bytes_read += size
+            stats.max_size = max(stats.max_size, size)
+        stats.observe(elapsed)
+        self.hot_keys.offer(key)
+
+    def write(self, key: str, size: int, elapsed: float):
+        stats = self.family(key)
+        stats.writes += 1
+        stats.bytes_written += size
+        stats.observe(elapsed)
+
+    def delete(self, key: str, elapsed: float):
+        stats = self.family(key)
+        stats.deletes += 1
+        stats.observe(elapsed)
+
+    def error(self, key: str):
+        self.family(key).errors += 1
+
+    def stats(self) -> dict:
+        families = sorted(self.families.items(), key=lambda item: item[1].hits + item[1].l1_hits + item[1].misses, reverse=True)
+        return {
+            "families": {name: stats.stats() for name, stats in families},
+            "hot_keys": self.hot_keys.top(),
+        }
+
+
+cache_metrics = CacheMetrics()
@@ -0,0 +1,119 @@
+"""
+- AI chat transcript of a user as a capped Redis list, one entry per turn
+- A turn writes only itself (RPUSH, or LSET over the last entry), then LTRIM + EXPIRE:
+  the bytes sent per turn follow the message size, not the transcript size
+- The role rules of the transcript (user never first, one entry per role in a row,
+  nothing after a terminal state) are applied here before anything is queued
+"""
+
+from utils.cache import RedisBatch, redis_batch
+from utils.cache_codec import cache_codec
+from utils.log import log as logger
+
+CHAT_HISTORY_KEY = "hackathon:aichat:{address}:turns"
+CHAT_HISTORY_MAX = 16      # entries kept: 12 turns end a chat, plus the terminal state
+CHAT_HISTORY_EX = 1800     # sliding, renewed by every write
+CHAT_MESSAGE_MAX = 2000
+TERMINAL_ROLES = ("200", "400", "405")
+
+
+class ChatHistory:
+    def __init__(self, address: str):
+        self.key = CHAT_HISTORY_KEY.format(address=address)
+        self.turns: list[dict] = []
+        # (command, args) applied in order by queue_save
+        self._ops: list[tuple[str, tuple]] = []
+        self._loading = None
+
+    # -- load --
+
+    def load(self, batch: RedisBatch):
+        """Queue the LRANGE in a batch; call ready() once it is flushed"""
+        self._loading = batch.lrange_raw(self.key)
+
+    async def ready(self):
+        raw = self._loading.result() if self._loading is not None else None
+        self._loading = None
+        self.turns = []
+        for data in raw or []:
+            try:
+                turn = cache_codec.decode(data)
+            except Exception as e:
+                logger.error(f"ChatHistory {self.key} Exception: {str(e)}")
+                continue
+            if turn:
+                self.turns.append(turn)
+
+    # -- read --
+
+    @property
+    def ended(self) -> bool:
+        return bool(self.turns) and self.turns[-1]['role'] in TERMINAL_ROLES
+
+    @property
+    def last(self) -> dict | None:
+        return self.turns[-1] if self.turns else None
+
+    # -- write, sent by save() --
+
+    def append(self, role: str, message: str) -> bool:
+        """Add a turn following the transcript rules, False when it was skipped"""
+        if not self.turns and role == "user":
+            logger.warning("The first input cannot be user, skip")
+            return False
+        if not message.strip():
+            logger.warning("Input is empty, skip")
+            return False
+        if len(message) > CHAT_MESSAGE_MAX:
+            logger.warning("Input too long, truncated")
+            message = message[:CHAT_MESSAGE_MAX]
+        if self.ended:
+            logger.warning("Session ended, skipped")
+            return False
+        turn = {"role": role, "content": message}
+        if self.turns and self.turns[-1]['role'] == role:
+            logger.warning("Input exists, delete and re-enter")
+            self.turns[-1] = turn
+            self._ops.append(("lset", (-1, cache_codec.encode(turn))))
+        else:
+            self.turns.append(turn)
+            self._ops.append(("rpush", (cache_codec.encode(turn),)))
+        return True
+
+    def pop(self) -> dict | None:
+        if not self.turns:
+            return None
+        # A turn pushed in this same request is simply never sent
+        if self._ops and self._ops[-1][0] == "rpush" and len(self._ops[-1][1]) == 1:
+            self._ops.pop()
+        else:
+            self._ops.append(("rpop", ()))
+        return self.turns.pop()
+
+    def replace(self, turns: list):
+        """Whole transcript at once: reset (turns=[]) or an old transcript moved here"""
+        self.turns = list(turns)
+        self._ops = [("delete", ())]
+        if self.turns:
+            self._ops.append(("rpush", tuple(cache_codec.encode(turn) for turn in self.turns)))
+
+    @property
+    def changed(self) -> bool:
+        return bool(self._ops)
+
+    def queue_save(self, batch: RedisBatch):
+        """Add the pending writes to a batch"""
+        if not self.changed:
+            return
+        ops, self._ops = self._ops, []
+        for command, args in ops:
+            getattr(batch, command)(self.key, *args)
+        if self.turns:
+            batch.ltrim(self.key, -CHAT_HISTORY_MAX, -1)
+            batch.expire(self.key, CHAT_HISTORY_EX)
+
+    async def save(self):
+        if not self.changed:
+            return
+        async with redis_batch(True) as batch:
+            self.queue_save(batch)
@@ -1,8 +1,14 @@
+import asyncio
+import random
+import time
 import aiomysql
-import sys
+import pymysql
+from contextlib import asynccontextmanager, AsyncExitStack
 from fastapi import HTTPException, Depends
 from jose import JWTError
 
+from utils.cache import RedisBatch, get_redis_connection
+from utils.security import get_current_address
 from utils.log import log as logger
 from config import DB_CONFIG
 
@@ -14,89 +20,424 @@ DATABASE_CONFIG = {
     "password": DB_CONFIG['password'],
     "db": DB_CONFIG['database'],
     "autocommit": True,
-    "minsize": 1,
+    "minsize": DB_CONFIG['min_connect'],
     "maxsize": DB_CONFIG['max_connect'],
     "connect_timeout": 10,
-    "pool_recycle": 60,
+    "pool_recycle": DB_CONFIG['pool_recycle'],
     "echo": False
 }
 
-# Create a database connection pool
+# One pool per replica
+DATABASE_CONFIG_SLAVES = [{
+    "host": replica['host'],
+    "port": replica['port'],
+    "user": DB_CONFIG['username'],
+    "password": DB_CONFIG['password'],
+    "db": DB_CONFIG['database'],
+    "autocommit": True,
+    "minsize": DB_CONFIG['min_connect'],
+    "maxsize": DB_CONFIG['max_connect'],
+    "connect_timeout": 10,
+    "pool_recycle": DB_CONFIG['pool_recycle'],
+    "echo": False
+} for replica in DB_CONFIG['slaves']]
+
+
+class DatabasePool:
+    """aiomysql pool created once per worker, with acquire timeout and wait statistics"""
+
+    def __init__(self, name: str, config: dict, acquire_timeout: float):
+        self.name = name
+        self.config = config
+        self.acquire_timeout = acquire_timeout
+        self.pool: aiomysql.Pool | None = None
+        self._lock = asyncio.Lock()
+        self.waiting = 0
+        self.acquired = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    async def open(self) -> aiomysql.Pool:
+        if self.pool is not None and not self.pool.closed:
+            return self.pool
+        async with self._lock:
+            if self.pool is None or self.pool.closed:
+                self.pool = await aiomysql.create_pool(**self.config)
+                logger.info(f"Database pool '{self.name}' ready - host: {self.config['host']} minsize: {self.config['minsize']} maxsize: {self.config['maxsize']}")
+        return self.pool
+
+    async def close(self):
+        if self.pool is None:
+            return
+        self.pool.close()
+        await self.pool.wait_closed()
+        self.pool = None
+
+    @asynccontextmanager
+    async def connection(self):
+        pool = await self.open()
+        start = time.perf_counter()
+        self.waiting += 1
+        try:
+            connection = await asyncio.wait_for(pool.acquire(), timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.waiting -= 1
+        wait = time.perf_counter() - start
+        self.acquired += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        try:
+            yield connection
+        finally:
+            pool.release(connection)
+
+    @asynccontextmanager
+    async def cursor(self):
+        async with self.connection() as connection:
+            async with connection.cursor(aiomysql.DictCursor) as cursor:
+                yield cursor
+
+    def stats(self) -> dict:
+        pool = self.pool
+        size = pool.size if pool else 0
+        free = pool.freesize if pool else 0
+        return {
+            "host": self.config['host'],
+            "minsize": self.config['minsize'],
+            "maxsize": self.config['maxsize'],
+            "size": size,
+            "in_use": size - free,
+            "free": free,
+            "waiting": self.waiting,
+            "acquired": self.acquired,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "wait_avg_ms": round(self.wait_total / self.acquired * 1000, 3) if self.acquired else 0,
+            "wait_max_ms": round(self.wait_max * 1000, 3),
+        }
+
+
+# ------------------------------------------------------------------------------------
+# Replicas: weighted least-outstanding-requests, ejected on connection errors/timeouts
+# or lag, re-admitted by the probe that also measures their lag
+
+# MySQL 8.0.22+ / older servers
+REPLICA_STATUS_QUERIES = (
+    ("SHOW REPLICA STATUS", "Seconds_Behind_Source"),
+    ("SHOW SLAVE STATUS", "Seconds_Behind_Master"),
+)
+# Connection-level failures; query errors (syntax, constraints) say nothing about the replica
+REPLICA_ERRORS = (asyncio.TimeoutError, pymysql.err.OperationalError, pymysql.err.InterfaceError, OSError)
+EJECT_AFTER = 3         # consecutive failures
+EJECT_SECONDS = 5       # first ejection, doubled after each failed probe
+EJECT_MAX_SECONDS = 120
+LATENCY_ALPHA = 0.1     # EWMA weight of the last connection hold time
+
+
+class Replica:
+    def __init__(self, pool: DatabasePool, weight: float):
+        self.pool = pool
+        self.weight = weight if weight > 0 else 1.0
+        self.in_flight = 0
+        self.latency = 0.0
+        self.served = 0
+        self.failures = 0
+        self.errors = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.eject_seconds = EJECT_SECONDS
+        # None: unknown (replication stopped or the probe failed)
+        self.lag: float | None = 0.0
+        self.checked = 0.0
+        self._probe: asyncio.Task | None = None
+
+    @property
+    def ejected(self) -> bool:
+        return self.ejected_until > 0
+
+    def usable(self, max_lag: float) -> bool:
+        return not self.ejected and self.lag is not None and self.lag <= max_lag
+
+    def eject(self, reason: str):
+        if not self.ejected:
+            self.ejections += 1
+            logger.error(f"Replica {self.pool.config['host']} ejected: {reason}")
+        self.ejected_until = time.monotonic() + self.eject_seconds
+        self.eject_seconds = min(self.eject_seconds * 2, EJECT_MAX_SECONDS)
+
+    def readmit(self):
+        if self.ejected:
+            logger.info(f"Replica {self.pool.config['host']} re-admitted")
+        self.ejected_until = 0.0
+        self.eject_seconds = EJECT_SECONDS
+        self.failures = 0
+
+    @asynccontextmanager
+    async def cursor(self):
+        start = time.perf_counter()
+        self.in_flight += 1
+        try:
+            async with AsyncExitStack() as stack:
+                # Only getting the connection counts against the replica: errors of the
+                # caller's queries (unknown column, lock wait, max_execution_time) go through
+                try:
+                    cursor = await stack.enter_async_context(self.pool.cursor())
+                except REPLICA_ERRORS as e:
+                    self.errors += 1
+                    self.failures += 1
+                    if self.failures >= EJECT_AFTER:
+                        self.eject(f"{type(e).__name__} {str(e)}")
+                    raise
+                self.failures = 0
+                yield cursor
+            self.served += 1
+            self.latency += LATENCY_ALPHA * ((time.perf_counter() - start) - self.latency)
+        finally:
+            self.in_flight -= 1
+
+    async def measure_lag(self) -> float | None:
+        async with self.pool.cursor() as cursor:
+            for query, column in REPLICA_STATUS_QUERIES:
+                try:
+                    await cursor.execute(query)
+                except pymysql.err.MySQLError:
+                    continue
+                status = await cursor.fetchone()
+                if not status:
+                    # Not a replica: the same server as the master
+                    return 0.0
+                lag = status.get(column)
+                return float(lag) if lag is not None else None
+            # No privilege for either: only the probe itself says the replica is up
+            await cursor.execute("SELECT 1")
+            return 0.0
+
+    async def probe(self):
+        try:
+            self.lag = await asyncio.wait_for(self.measure_lag(), timeout=self.pool.acquire_timeout)
+            self.readmit()
+        except Exception as e:
+            self.lag = None
+            self.eject(f"probe {type(e).__name__} {str(e)}")
+        self.checked = time.monotonic()
+
+    def maybe_probe(self, interval: float):
+        """Start a background probe when due: lag every interval, ejected replicas once their time is up"""
+        if self._probe is not None and not self._probe.done():
+            return
+        now = time.monotonic()
+        if self.ejected:
+            if now < self.ejected_until:
+                return
+        elif now - self.checked < interval:
+            return
+        self.checked = now
+        self._probe = asyncio.ensure_future(self.probe())
+
+    def stats(self) -> dict:
+        return {
+            **self.pool.stats(),
+            "weight": self.weight,
+            "in_flight": self.in_flight,
+            "latency_ms": round(self.latency * 1000, 3),
+            "served": self.served,
+            "errors": self.errors,
+            "ejected": self.ejected,
+            "ejections": self.ejections,
+            "lag": self.lag,
+        }
+
+
+class ReplicaSet:
+    """The replicas behind the interface of one DatabasePool; reads fall back to the master when none is usable"""
+
+    def __init__(self, name: str, configs: list[dict], weights: list[float], acquire_timeout: float,
+                 fallback: DatabasePool, max_lag: float, lag_interval: float):
+        self.replicas = [
+            Replica(DatabasePool(f"{name}-{index}", config, acquire_timeout), weight)
+            for index, (config, weight) in enumerate(zip(configs, weights))
+        ]
+        self.fallback = fallback
+        self.max_lag = max_lag
+        self.lag_interval = lag_interval
+        self.fallback_reads = 0
+
+    async def open(self):
+        for replica in self.replicas:
+            try:
+                await replica.pool.open()
+            except Exception as e:
+                replica.eject(f"open {str(e)}")
+        return self
+
+    async def close(self):
+        for replica in self.replicas:
+            if replica._probe is not None:
+                replica._probe.cancel()
+            await replica.pool.close()
+
+    def choose(self) -> Replica | None:
+        candidates = []
+        for replica in self.replicas:
+            replica.maybe_probe(self.lag_interval)
+            if replica.usable(self.max_lag):
+                candidates.append(replica)
+        if not candidates:
+            return None
+        # Fewest requests in flight for its weight, random among equals
+        return min(candidates, key=lambda replica: ((replica.in_flight + 1) / replica.weight, random.random()))
+
+    @asynccontextmanager
+    async def cursor(self):
+        replica = self.choose()
+        async with AsyncExitStack() as stack:
+            cursor = None
+            if replica is not None:
+                # A replica that is down but not ejected yet must not fail the read: it goes to the master
+                try:
+                    cursor = await stack.enter_async_context(replica.cursor())
+                except REPLICA_ERRORS as e:
+                    replica.eject(f"{type(e).__name__} {str(e)}")
+            if cursor is None:
+                self.fallback_reads += 1
+                cursor = await stack.enter_async_context(self.fallback.cursor())
+            yield cursor
+
+    def stats(self) -> dict:
+        return {
+            "max_lag": self.max_lag,
+            "fallback_reads": self.fallback_reads,
+            "replicas": [replica.stats() for replica in self.replicas],
+        }
+
+
+db_pool = DatabasePool("master", DATABASE_CONFIG, DB_CONFIG['acquire_timeout'])
+db_pool_slave = ReplicaSet("slave", DATABASE_CONFIG_SLAVES, [replica['weight'] for replica in DB_CONFIG['slaves']],
+                           DB_CONFIG['acquire_timeout'], db_pool, DB_CONFIG['max_lag'], DB_CONFIG['lag_interval'])
+
+
+async def init_db_pool():
+    await db_pool.open()
+    await db_pool_slave.open()
+
+
+async def close_db_pool():
+    await db_pool.close()
+    await db_pool_slave.close()
+
+
+def get_db_pool_stats() -> dict:
+    return {"master": db_pool.stats(), "slave": db_pool_slave.stats(), "routing": read_router.stats()}
+
+
+# Shared database connection pool
 async def get_db_pool():
     try:
-        pool = await aiomysql.create_pool(**DATABASE_CONFIG)
-        if pool is None:
-            logger.error(f"ERROR: Database connection failed")
-            sys.exit()
-        return pool
+        return await db_pool.open()
     except Exception as e:
         logger.error(f"get_db_pool() except ERROR: {str(e)}")
         return None
 
-# Dependency to inject database connection pool
-async def get_db(pool = Depends(get_db_pool)):
+# Dependency to inject a cursor from the shared pool
+async def get_db():
     frequently_exception = HTTPException(status_code=503, detail="Service Unavailable")
     credentials_exception = HTTPException(status_code=401, detail="Invalid JWT Token")
     try:
-        if pool is None:
-            logger.error(f"get_db() pool is None")
-            raise frequently_exception
-            yield None
-        
-        async with pool.acquire() as connection:
-            if not connection:
-                raise frequently_exception
-            async with connection.cursor(aiomysql.DictCursor) as cursor:
-                yield cursor
+        async with db_pool.cursor() as cursor:
+            yield cursor
     except JWTError:
         raise credentials_exception
     except Exception as e:
         logger.error(f"get_db() except ERROR: {str(e)}")
         raise frequently_exception
 
-DATABASE_CONFIG_SLAVE = {
-    "host": DB_CONFIG['slave'],
-    "port": DB_CONFIG['port'],
-    "user": DB_CONFIG['username'],
-    "password": DB_CONFIG['password'],
-    "db": DB_CONFIG['database'],
-    "autocommit": True,
-    "minsize": 1,
-    "maxsize": DB_CONFIG['max_connect'],
-    "connect_timeout": 10,
-    "pool_recycle": 60,
-    "echo": False
-}
-
-# Create a database connection pool
+# Shared database connection pool
 async def get_db_pool_slave():
     try:
-        pool = await aiomysql.create_pool(**DATABASE_CONFIG_SLAVE)
-        if pool is None:
-            logger.error(f"ERROR: Database connection failed")
-            sys.exit()
-        return pool
+        return await db_pool_slave.open()
     except Exception as e:
         logger.error(f"get_db_pool_slave() except ERROR: {str(e)}")
         return None
 
-# Dependency to inject database connection pool
-async def get_db_slave(pool = Depends(get_db_pool_slave)):
+# Dependency to inject a cursor from the shared pool
+async def get_db_slave():
     frequently_exception = HTTPException(status_code=503, detail="Service Unavailable")
     credentials_exception = HTTPException(status_code=401, detail="Invalid JWT Token")
     try:
-        if pool is None:
-            logger.error(f"get_db_slave() pool is None")
-            raise frequently_exception
-            yield None
-        
-        async with pool.acquire() as connection:
-            if not connection:
-                raise frequently_exception
-            async with connection.cursor(aiomysql.DictCursor) as cursor:
-                yield cursor
+        async with db_pool_slave.cursor() as cursor:
+            yield cursor
     except JWTError:
         raise credentials_exception
     except Exception as e:
         logger.error(f"get_db_slave() except ERROR: {str(e)}")
         raise frequently_exception
+
+
+# ------------------------------------------------------------------------------------
+# Read routing: replicas by default, the master for an address that has just written
+# (pinned in Redis for pin_seconds)
+
+DB_PIN_KEY = "hackathon:db:pin:{address}"
+
+
+class ReadRouter:
+    def __init__(self, master: DatabasePool, replicas: ReplicaSet, pin_seconds: int):
+        self.master = master
+        self.replicas = replicas
+        self.pin_seconds = pin_seconds
+        self.replica_reads = 0
+        self.pinned_reads = 0
+
+    async def pinned(self, address: str) -> bool:
+        try:
+            async with get_redis_connection(True) as cache:
+                return bool(await cache.exists(DB_PIN_KEY.format(address=address)))
+        except Exception as e:
+            # Unknown: the master is always right
+            logger.error(f"ReadRouter.pinned {address} Exception: {str(e)}")
+            return True
+
+    def pin(self, batch: RedisBatch, address: str):
+        """Queue the pin of an address after its write; send it before the response"""
+        batch.set(DB_PIN_KEY.format(address=address), 1, ex=self.pin_seconds)
+
+    async def pool(self, address: str | None) -> DatabasePool | ReplicaSet:
+        if address and await self.pinned(address):
+            self.pinned_reads += 1
+            return self.master
+        # Lagging or ejected replicas are skipped there, down to the master
+        self.replica_reads += 1
+        return self.replicas
+
+    def stats(self) -> dict:
+        return {
+            "pin_seconds": self.pin_seconds,
+            "replica_reads": self.replica_reads,
+            "pinned_reads": self.pinned_reads,
+        }
+
+
+read_router = ReadRouter(db_pool, db_pool_slave, DB_CONFIG['pin_seconds'])
+
+
+# Dependency: cursor for the reads of the current address (replica unless pinned or lagging)
+async def get_db_read(address: str = Depends(get_current_address)):
+    frequently_exception = HTTPException(status_code=503, detail="Service Unavailable")
+    credentials_exception = HTTPException(status_code=401, detail="Invalid JWT Token")
+    try:
+        pool = await read_router.pool(address)
+        async with pool.cursor() as cursor:
+            yield cursor
+    except JWTError:
+        raise credentials_exception
+    except Exception as e:
+        logger.error(f"get_db_read() except ERROR: {str(e)}")
+        raise frequently_exception
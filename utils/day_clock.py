@@ -0,0 +1,38 @@
+"""
+- The local calendar day used in cache keys ({today}) and for day-aligned expiry
+- One object, so tests and the rollover job can move time: DayClock(now=lambda: ...)
+"""
+
+import datetime
+import time
+
+DATE_FORMAT = "%Y-%m-%d"
+
+
+class DayClock:
+    def __init__(self, now=time.time):
+        self._now = now
+
+    def now(self) -> float:
+        return self._now()
+
+    def today(self, offset: int = 0) -> str:
+        """Local date, offset days away"""
+        day = datetime.datetime.fromtimestamp(self.now()) + datetime.timedelta(days=offset)
+        return day.strftime(DATE_FORMAT)
+
+    @staticmethod
+    def day_start(day: str) -> float:
+        """Timestamp of local 00:00 of day"""
+        return datetime.datetime.strptime(day, DATE_FORMAT).timestamp()
+
+    @staticmethod
+    def day_end(day: str) -> float:
+        """Timestamp of the local midnight that ends day"""
+        return (datetime.datetime.strptime(day, DATE_FORMAT) + datetime.timedelta(days=1)).timestamp()
+
+    def seconds_to_midnight(self) -> float:
+        return self.day_end(self.today()) - self.now()
+
+
+clock = DayClock()
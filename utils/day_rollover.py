@@ -0,0 +1,123 @@
+"""
+- Per-user keys embed the local day: at midnight every active user misses at once
+  and falls back to MySQL together
+- Shortly before midnight the next day's user state of recently active users is
+  written ahead, in chunks, so the first requests of the day find it
+- warm(state) fills the fields of one user; state.today is the coming day
+"""
+
+import asyncio
+import time
+
+from config import DAY_ROLLOVER_LEAD, DAY_ROLLOVER_ACTIVE
+from utils.cache import redis_batch, get_redis_connection, set_redis_hash, get_redis_hash
+from utils.day_clock import DayClock, clock as default_clock
+from utils.log import log as logger
+from utils.user_state import UserState, ACTIVE_USERS_KEY
+
+ROLLOVER_CHUNK = 200        # users loaded and saved per round trip
+ROLLOVER_PAUSE = 0.05       # seconds between chunks, spreads the MySQL reads
+ROLLOVER_STATS_KEY = "hackathon:rollover:stats"
+ROLLOVER_LOCK_KEY = "hackathon:rollover:{day}:lock"
+CHECK_INTERVAL = 60
+
+
+class DayRollover:
+    def __init__(self, warm, clock: DayClock = default_clock, lead: int = DAY_ROLLOVER_LEAD,
+                 active: int = DAY_ROLLOVER_ACTIVE, chunk: int = ROLLOVER_CHUNK, pause: float = ROLLOVER_PAUSE):
+        self.warm = warm
+        self.clock = clock
+        self.lead = lead
+        self.active = active
+        self.chunk = chunk
+        self.pause = pause
+        self.last_day = None
+        self.last_stats: dict = {}
+
+    def due(self) -> bool:
+        """Inside the lead window and the coming day not done yet"""
+        return self.clock.seconds_to_midnight() <= self.lead and self.last_day != self.clock.today(1)
+
+    async def active_addresses(self) -> list[str]:
+        since = self.clock.now() - self.active
+        async with get_redis_connection(True) as cache:
+            # Users gone quiet are not kept forever
+            await cache.zremrangebyscore(ACTIVE_USERS_KEY, "-inf", f"({since}")
+            return await cache.zrangebyscore(ACTIVE_USERS_KEY, since, "+inf")
+
+    async def acquire(self, day: str) -> bool:
+        """One run per day across daemons"""
+        async with get_redis_connection(True) as cache:
+            return bool(await cache.set(ROLLOVER_LOCK_KEY.format(day=day), 1, ex=2 * self.lead + 3600, nx=True))
+
+    async def warm_chunk(self, addresses: list[str], day: str) -> tuple[int, int]:
+        """Returns (users written, errors)"""
+        states = [UserState(address, day) for address in addresses]
+        async with redis_batch(True) as batch:
+            for state in states:
+                state.load(batch)
+        written = errors = 0
+        for state in states:
+            try:
+                await state.ready(migrate=False)
+                await self.warm(state)
+            except Exception as e:
+                errors += 1
+                logger.error(f"DayRollover {state.address} {day} Exception: {str(e)}")
+                continue
+            if state.changed:
+                written += 1
+        async with redis_batch(True) as batch:
+            for state in states:
+                state.queue_save(batch)
+        return written, errors
+
+    async def run(self, day: str | None = None) -> dict:
+        """Pre-warm day (the coming one by default) for every active user"""
+        day = day or self.clock.today(1)
+        started = self.clock.now()
+        start = time.perf_counter()
+        addresses = await self.active_addresses()
+        logger.info(f"DayRollover {day} - active users: {len(addresses)}")
+        written = errors = 0
+        for index in range(0, len(addresses), self.chunk):
+            chunk_written, chunk_errors = await self.warm_chunk(addresses[index:index + self.chunk], day)
+            written += chunk_written
+            errors += chunk_errors
+            await asyncio.sleep(self.pause)
+        self.last_day = day
+        self.last_stats = {
+            "day": day,
+            "started": int(started),
+            "users": len(addresses),
+            "written": written,
+            "errors": errors,
+            "seconds": round(time.perf_counter() - start, 3),
+            "before_midnight": round(self.clock.seconds_to_midnight()),
+        }
+        logger.info(f"DayRollover done: {self.last_stats}")
+        await set_redis_hash(True, ROLLOVER_STATS_KEY, self.last_stats, ex=7 * 86400)
+        return self.last_stats
+
+    async def run_forever(self):
+        while True:
+            try:
+                if self.due():
+                    day = self.clock.today(1)
+                    if await self.acquire(day):
+                        await self.run(day)
+                    else:
+                        logger.info(f"DayRollover {day} already done by another process")
+                        self.last_day = day
+            except Exception as e:
+                logger.error(f"DayRollover Exception: {str(e)}")
+            wait = self.clock.seconds_to_midnight() - self.lead
+            if wait <= 0:
+                # Done for tonight: next look after midnight
+                wait = self.clock.seconds_to_midnight() + 1
+            await asyncio.sleep(min(wait, CHECK_INTERVAL))
+
+
+async def get_rollover_stats() -> dict:
+    """Last run, as written by the rollover daemon"""
+    return await get_redis_hash(False, ROLLOVER_STATS_KEY) or {}
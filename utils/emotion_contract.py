@@ -0,0 +1,190 @@
+import time
+from dataclasses import dataclass
+
+from utils.immutable_cache import immutable_cache, immutable_key
+from utils.log import log as logger
+from utils.multicall import MULTICALL3_ADDRESS, multicall_read
+
+
+@dataclass
+class PeriodSnapshot:
+    """Views of one emotion period, read in a single round trip"""
+    period_id: int
+    end_timestamp: int = 0
+    price: int = 0
+    putmoney: int = 0
+    proportion: int = 0
+    total: int = 0
+    emotion: int = 0        # IssueEmotion(period_id), 0 until settled
+    average: int = 0        # IssueReward(period_id)
+    positive: int = 0
+    neutral: int = 0
+    negative: int = 0
+    last_emotion: int = 0   # IssueEmotion(period_id - 1)
+    last_average: int = 0   # IssueReward(period_id - 1)
+
+    @property
+    def reward(self) -> int:
+        return int(self.total * self.price * self.proportion / 100 + self.putmoney)
+
+    def is_final(self, now: int | None = None) -> bool:
+        """Settled on chain: none of its views can change any more"""
+        return self.emotion != 0 and self.end_timestamp <= (now or int(time.time()))
+
+
+def last_period_calls(period_id: int) -> list:
+    return [
+        ("IssueEmotion", (period_id - 1,)),
+        ("IssueReward", (period_id - 1,)),
+    ]
+
+
+def current_period_calls(period_id: int, include_last: bool = True) -> list:
+    calls = [
+        ("IssueAddressNum", (period_id,)),
+        ("IssueInformation", (period_id,)),
+    ]
+    if period_id > 1 and include_last:
+        calls += last_period_calls(period_id)
+    return calls
+
+
+def settled_period_calls(period_id: int) -> list:
+    return [
+        ("IssueEmotion", (period_id,)),
+        ("IssueReward", (period_id,)),
+        ("IssueAddressNum", (period_id,)),
+        ("IssueInformation", (period_id,)),
+        ("getIssueEmotionAddrslength", (period_id, 1)),
+        ("getIssueEmotionAddrslength", (period_id, 2)),
+        ("getIssueEmotionAddrslength", (period_id, 3)),
+    ]
+
+
+def settled_period_keys(chain_id: int, contract_address: str, period_id: int) -> list:
+    # userProportion() has no period argument and can still change: never cached, always read live
+    return [immutable_key(chain_id, contract_address, fn_name, args) for fn_name, args in settled_period_calls(period_id)]
+
+
+def settled_snapshot(period_id: int, proportion: int, values: list) -> PeriodSnapshot:
+    emotion, average, total, period_info, positive, neutral, negative = values
+    return PeriodSnapshot(
+        period_id=period_id,
+        end_timestamp=period_info[0],
+        price=period_info[1],
+        putmoney=period_info[2],
+        proportion=proportion,
+        total=total,
+        emotion=emotion,
+        average=average,
+        positive=positive,
+        neutral=neutral,
+        negative=negative,
+    )
+
+
+async def load_settled_periods_cached(chain_id: int, contract_address: str, period_ids: list) -> dict:
+    """{period_id: values of settled_period_calls} of the periods fully present in the immutable cache"""
+    keys = []
+    for period_id in period_ids:
+        keys += settled_period_keys(chain_id, contract_address, period_id)
+    values = await immutable_cache.get_many(keys)
+    step = len(settled_period_calls(0))
+    cached = {}
+    for index, period_id in enumerate(period_ids):
+        period_values = values[index * step: (index + 1) * step]
+        if any(value is None for value in period_values):
+            continue
+        cached[period_id] = period_values
+    return cached
+
+
+async def cache_settled_period(chain_id: int, contract_address: str, snapshot: PeriodSnapshot) -> bool:
+    """Store a settled period for good, the live period is never cached"""
+    if not snapshot.is_final():
+        return False
+    values = [
+        snapshot.emotion,
+        snapshot.average,
+        snapshot.total,
+        [snapshot.end_timestamp, snapshot.price, snapshot.putmoney],
+        snapshot.positive,
+        snapshot.neutral,
+        snapshot.negative,
+    ]
+    await immutable_cache.set_many(dict(zip(settled_period_keys(chain_id, contract_address, snapshot.period_id), values)))
+    return True
+
+
+async def read_current_period(contract, chain_id: int, period_id_hint: int = 0, multicall_address: str | None = MULTICALL3_ADDRESS) -> PeriodSnapshot:
+    """
+    Live period state. `Issue()` is read in the same batch as the views of the
+    hinted period, so a correct hint (usually the latest status=1 row) costs one round trip.
+    The previous period's results come from the immutable cache once it is settled
+    """
+    period_id = period_id_hint
+    for _ in range(2):
+        calls = [("Issue", ()), ("userProportion", ())]
+        last_keys, last_values = [], [None, None]
+        if period_id > 1:
+            last_keys = [immutable_key(chain_id, contract.address, fn_name, args) for fn_name, args in last_period_calls(period_id)]
+            last_values = await immutable_cache.get_many(last_keys)
+        include_last = None in last_values
+        if period_id > 0:
+            calls += current_period_calls(period_id, include_last)
+        values = await multicall_read(contract.w3, contract, calls, multicall_address)
+        immutable_cache.rpc_calls += len(calls)
+        issue, proportion = values[0], values[1]
+        if period_id > 0 and issue == period_id:
+            period_info = values[3]
+            snapshot = PeriodSnapshot(
+                period_id=period_id,
+                total=values[2],
+                end_timestamp=period_info[0],
+                price=period_info[1],
+                putmoney=period_info[2],
+                proportion=proportion,
+            )
+            if period_id > 1:
+                if include_last:
+                    snapshot.last_emotion, snapshot.last_average = values[4], values[5]
+                    if snapshot.last_emotion != 0:
+                        await immutable_cache.set_many(dict(zip(last_keys, values[4:6])))
+                else:
+                    snapshot.last_emotion, snapshot.last_average = last_values
+                    immutable_cache.rpc_calls_saved += len(last_keys)
+            logger.debug(f"read_current_period: {snapshot}")
+            return snapshot
+        logger.debug(f"read_current_period hint: {period_id} Issue: {issue}")
+        period_id = issue
+        if period_id == 0:
+            return PeriodSnapshot(period_id=0, proportion=proportion)
+    raise Exception(f"Issue() changed while reading period {period_id}")
+
+
+async def read_settled_periods(contract, chain_id: int, period_ids: list, multicall_address: str | None = MULTICALL3_ADDRESS) -> list:
+    """
+    Full views (emotion, average, counts) of several periods: settled periods
+    from the immutable cache, the rest in one round trip with the live userProportion()
+    """
+    period_ids = [period_id for period_id in period_ids if period_id > 0]
+    if not period_ids:
+        return []
+    step = len(settled_period_calls(0))
+    cached = await load_settled_periods_cached(chain_id, contract.address, period_ids)
+    immutable_cache.rpc_calls_saved += len(cached) * step
+    missing = [period_id for period_id in period_ids if period_id not in cached]
+    calls = [("userProportion", ())]
+    for period_id in missing:
+        calls += settled_period_calls(period_id)
+    values = await multicall_read(contract.w3, contract, calls, multicall_address)
+    immutable_cache.rpc_calls += len(calls)
+    proportion = values[0]
+    snapshots = {period_id: settled_snapshot(period_id, proportion, period_values) for period_id, period_values in cached.items()}
+    for index, period_id in enumerate(missing):
+        snapshot = settled_snapshot(period_id, proportion, values[1 + index * step: 1 + (index + 1) * step])
+        await cache_settled_period(chain_id, contract.address, snapshot)
+        snapshots[period_id] = snapshot
+    snapshots = [snapshots[period_id] for period_id in period_ids]
+    logger.debug(f"read_settled_periods: {snapshots}")
+    return snapshots
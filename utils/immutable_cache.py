@@ -0,0 +1,99 @@
+"""
+- Contract reads that can never change again (closed periods), keyed by
+  (chain_id, contract, function, args): in-process LRU in front of Redis, no TTL
+"""
+
+from collections import OrderedDict
+
+from redis.client import NEVER_DECODE
+
+from config import IMMUTABLE_CACHE_SIZE
+from utils.cache import get_redis_connection
+from utils.cache_codec import cache_codec
+from utils.log import log as logger
+
+IMMUTABLE_KEY_PREFIX = "hackathon:immutable"
+
+
+def immutable_key(chain_id: int, contract_address: str, fn_name: str, args: tuple = ()) -> str:
+    args_key = ",".join(str(arg) for arg in args)
+    return f"{IMMUTABLE_KEY_PREFIX}:{chain_id}:{contract_address.lower()}:{fn_name}:{args_key}"
+
+
+class ImmutableCache:
+    def __init__(self, maxsize: int = IMMUTABLE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._lru: OrderedDict[str, object] = OrderedDict()
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.rpc_calls = 0        # contract calls that still went to the node
+        self.rpc_calls_saved = 0  # contract calls answered from this cache
+
+    def _remember(self, key: str, value):
+        self._lru[key] = value
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.maxsize:
+            self._lru.popitem(last=False)
+
+    async def get_many(self, keys: list) -> list:
+        """Values in the order of keys, None for misses"""
+        values = [None] * len(keys)
+        remote = []
+        for index, key in enumerate(keys):
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                values[index] = self._lru[key]
+                self.local_hits += 1
+            else:
+                remote.append(index)
+        if remote:
+            try:
+                async with get_redis_connection(False) as cache:
+                    pipe = cache.pipeline(transaction=False)
+                    for index in remote:
+                        pipe.execute_command("GET", keys[index], **{NEVER_DECODE: []})
+                    results = await pipe.execute()
+            except Exception as e:
+                logger.error(f"ImmutableCache.get_many Exception: {str(e)}")
+                results = [None] * len(remote)
+            for index, data in zip(remote, results):
+                value = cache_codec.decode(data)
+                if value is None:
+                    self.misses += 1
+                    continue
+                values[index] = value
+                self.redis_hits += 1
+                self._remember(keys[index], values[index])
+        return values
+
+    async def set_many(self, mapping: dict):
+        if not mapping:
+            return
+        for key, value in mapping.items():
+            self._remember(key, value)
+        try:
+            async with get_redis_connection(True) as cache:
+                pipe = cache.pipeline(transaction=False)
+                for key, value in mapping.items():
+                    pipe.set(key, cache_codec.encode(value))
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"ImmutableCache.set_many Exception: {str(e)}")
+
+    def stats(self) -> dict:
+        hits = self.local_hits + self.redis_hits
+        lookups = hits + self.misses
+        return {
+            "size": len(self._lru),
+            "maxsize": self.maxsize,
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0,
+            "rpc_calls": self.rpc_calls,
+            "rpc_calls_saved": self.rpc_calls_saved,
+        }
+
+
+immutable_cache = ImmutableCache()
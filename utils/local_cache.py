@@ -0,0 +1,168 @@
+"""
+- In-process L1 in front of Redis for hot key families (read on most requests, rarely written)
+- Kept coherent through one pub/sub channel: every write or delete of a hot key, by any
+  worker or daemon, publishes the key and every listening worker drops it
+- Only used while this process is subscribed: no listener, no L1 (never in Redis cluster mode)
+"""
+
+import asyncio
+import re
+import time
+import uuid
+from collections import OrderedDict
+
+from config import L1_CACHE_SIZE, REDIS_CONFIG
+from utils.log import log as logger
+from utils.redis.init import get_shared_redis
+
+INVALIDATION_CHANNEL = "hackathon:cache:invalidate"
+
+# Hot key families and how long a worker may keep them, `*` is one key segment
+L1_KEY_FAMILIES = {
+    "hackathon:web3:config": 300,
+    "hackathon:period:*:projection": 5,
+    "hackathon:period:*:current": 5,
+    "hackathon:period:*:*:list": 30,
+}
+
+LISTEN_TIMEOUT = 1.0
+RECONNECT_DELAY = 5
+
+
+def _family_regex(pattern: str) -> re.Pattern:
+    return re.compile("^" + "[^:]+".join(re.escape(part) for part in pattern.split("*")) + "$")
+
+
+class LocalCache:
+    def __init__(self, maxsize: int = L1_CACHE_SIZE, families: dict = L1_KEY_FAMILIES):
+        self.maxsize = maxsize
+        self.families = [(_family_regex(pattern), ttl) for pattern, ttl in families.items()]
+        # key -> (expires_at, raw bytes as read from Redis); decoded on every hit, callers mutate values
+        self._lru: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self.worker_id = uuid.uuid4().hex
+        self.listening = False
+        # Bumped by every invalidation: a read that started before one must not fill L1
+        self.epoch = 0
+        self._task: asyncio.Task | None = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.published = 0
+
+    def ttl(self, key: str) -> int | None:
+        """L1 lifetime of key, None when it is not in a hot family"""
+        for regex, ttl in self.families:
+            if regex.match(key):
+                return ttl
+        return None
+
+    def get(self, key: str) -> bytes | None:
+        if not self.listening:
+            return None
+        entry = self._lru.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._lru[key]
+            if self.ttl(key) is not None:
+                self.misses += 1
+            return None
+        self._lru.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: str, data: bytes | None, epoch: int):
+        """Keep data read from Redis; epoch is self.epoch taken before the read"""
+        if not self.listening or not self.maxsize or not data or epoch != self.epoch:
+            return
+        ttl = self.ttl(key)
+        if ttl is None:
+            return
+        self._lru[key] = (time.monotonic() + ttl, data)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.maxsize:
+            self._lru.popitem(last=False)
+
+    def invalidate(self, *keys: str):
+        self.epoch += 1
+        for key in keys:
+            if self._lru.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        self.epoch += 1
+        self._lru.clear()
+
+    def hot_keys(self, keys) -> list:
+        return [key for key in keys if self.ttl(key) is not None]
+
+    async def publish(self, cache, *keys: str):
+        """Tell every worker to drop keys (hot ones, see hot_keys); cache is a master client"""
+        self.invalidate(*keys)
+        await cache.publish(INVALIDATION_CHANNEL, " ".join([self.worker_id] + list(keys)))
+        self.published += 1
+
+    async def listen(self):
+        while True:
+            pubsub = None
+            try:
+                cache = await get_shared_redis(True)
+                if cache is None:
+                    raise RuntimeError("Unable to connect to Redis: cache")
+                pubsub = cache.pubsub()
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                self.listening = True
+                logger.info(f"LocalCache listening on {INVALIDATION_CHANNEL}")
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=LISTEN_TIMEOUT)
+                    if message is None:
+                        continue
+                    worker_id, *keys = message['data'].split(" ")
+                    if worker_id != self.worker_id:
+                        self.invalidate(*keys)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"LocalCache.listen Exception: {str(e)}")
+            finally:
+                # Messages may have been missed: nothing cached here can be trusted
+                self.listening = False
+                self.clear()
+                if pubsub is not None:
+                    try:
+                        await pubsub.aclose()
+                    except Exception:
+                        pass
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    def start(self):
+        # The asyncio RedisCluster has no pubsub(): in cluster mode there is no listener and no L1
+        if REDIS_CONFIG['mode'] == "cluster":
+            logger.info("LocalCache disabled: no pub/sub in Redis cluster mode")
+            return
+        if self.maxsize and self._task is None:
+            self._task = asyncio.ensure_future(self.listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "listening": self.listening,
+            "size": len(self._lru),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0,
+            "invalidations": self.invalidations,
+            "published": self.published,
+        }
+
+
+local_cache = LocalCache()
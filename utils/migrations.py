@@ -0,0 +1,109 @@
+"""
+- Versioned schema changes on top of create_tables.sql: migrations/NNNN_name.sql, applied in order
+- schema_migrations records what ran; DDL commits on its own in MySQL, so a migration that
+  stopped half way is run again from the top and "already there" errors are skipped
+"""
+
+import hashlib
+import os
+import re
+from dataclasses import dataclass
+
+import pymysql
+
+from utils.log import log as logger
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+MIGRATION_FILE = re.compile(r"^(\d{4})_(\w+)\.sql$")
+
+# Duplicate column / duplicate key name / can't DROP (already gone)
+ALREADY_APPLIED_ERRORS = {1060, 1061, 1091}
+
+CREATE_MIGRATIONS_TABLE = """
+                    CREATE TABLE IF NOT EXISTS schema_migrations (
+                        version       varchar(16)   NOT NULL,
+                        name          varchar(128)  DEFAULT '',
+                        checksum      varchar(64)   DEFAULT '',
+                        applied_time  datetime      DEFAULT NOW(),
+                        PRIMARY KEY (version)
+                    ) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_general_ci
+                    """
+
+
+@dataclass
+class Migration:
+    version: str
+    name: str
+    sql: str
+
+    @property
+    def checksum(self) -> str:
+        return hashlib.sha256(self.sql.encode()).hexdigest()
+
+    @property
+    def statements(self) -> list[str]:
+        return split_statements(self.sql)
+
+
+def split_statements(sql: str) -> list[str]:
+    """Statements of a .sql file; -- comments and blank lines dropped, split on ;"""
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+    return [one.strip() for one in "\n".join(lines).split(";") if one.strip()]
+
+
+def load_migrations(directory: str = MIGRATIONS_DIR) -> list[Migration]:
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = MIGRATION_FILE.match(filename)
+        if not match:
+            continue
+        with open(os.path.join(directory, filename), encoding="utf-8") as f:
+            migrations.append(Migration(match.group(1), match.group(2), f.read()))
+    return migrations
+
+
+def applied_migrations(cursor) -> dict:
+    """version -> checksum of the migrations already run"""
+    cursor.execute(CREATE_MIGRATIONS_TABLE)
+    cursor.execute("SELECT version, checksum FROM schema_migrations")
+    return {row['version']: row['checksum'] for row in cursor.fetchall()}
+
+
+def pending_migrations(cursor, migrations: list[Migration]) -> list[Migration]:
+    applied = applied_migrations(cursor)
+    for migration in migrations:
+        if migration.version in applied and applied[migration.version] != migration.checksum:
+            logger.warning(f"migration {migration.version}_{migration.name} changed after it was applied")
+    return [migration for migration in migrations if migration.version not in applied]
+
+
+def apply_migration(cursor, migration: Migration, dry_run: bool = False):
+    for statement in migration.statements:
+        logger.info(f"{migration.version}_{migration.name}: {statement}")
+        if dry_run:
+            continue
+        try:
+            cursor.execute(statement)
+        except pymysql.err.MySQLError as e:
+            if e.args[0] not in ALREADY_APPLIED_ERRORS:
+                raise
+            logger.warning(f"{migration.version}_{migration.name} skipped: {e.args[1]}")
+    if dry_run:
+        return
+    insert_query = """
+                    INSERT INTO schema_migrations
+                        (version, name, checksum)
+                    VALUES (%s, %s, %s)
+                    """
+    values = (migration.version, migration.name, migration.checksum)
+    cursor.execute(insert_query, values)
+    cursor.connection.commit()
+
+
+def migrate(conn, target: str | None = None, dry_run: bool = False) -> list[Migration]:
+    """Apply the pending migrations up to target (all by default), returns them"""
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    pending = [one for one in pending_migrations(cursor, load_migrations()) if target is None or one.version <= target]
+    for migration in pending:
+        apply_migration(cursor, migration, dry_run)
+    return pending
@@ -0,0 +1,95 @@
+from web3 import Web3
+
+from utils.log import log as logger
+
+# Multicall3 is deployed at the same address on every chain we support
+# https://github.com/mds1/multicall
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+
+contract_abi_multicall3 = [
+        {
+            "inputs": [
+                {
+                    "components": [
+                        { "internalType": "address", "name": "target", "type": "address" },
+                        { "internalType": "bool", "name": "allowFailure", "type": "bool" },
+                        { "internalType": "bytes", "name": "callData", "type": "bytes" }
+                    ],
+                    "internalType": "struct Multicall3.Call3[]",
+                    "name": "calls",
+                    "type": "tuple[]"
+                }
+            ],
+            "name": "aggregate3",
+            "outputs": [
+                {
+                    "components": [
+                        { "internalType": "bool", "name": "success", "type": "bool" },
+                        { "internalType": "bytes", "name": "returnData", "type": "bytes" }
+                    ],
+                    "internalType": "struct Multicall3.Result[]",
+                    "name": "returnData",
+                    "type": "tuple[]"
+                }
+            ],
+            "stateMutability": "payable",
+            "type": "function"
+        },
+    ]
+
+
+def get_abi_output_types(abi: list, fn_name: str) -> list:
+    for item in abi:
+        if item.get('type') == 'function' and item.get('name') == fn_name:
+            return [output['type'] for output in item['outputs']]
+    raise ValueError(f"Function {fn_name} not found in ABI")
+
+
+def unwrap_outputs(values):
+    # Single-output views decode to a 1-tuple, keep multi-output views as lists
+    return values[0] if len(values) == 1 else list(values)
+
+
+async def multicall_aggregate(web3_obj, contract, calls: list, multicall_address: str = MULTICALL3_ADDRESS) -> list:
+    """
+    One eth_call through Multicall3.aggregate3
+    calls: [(fn_name, args), ...] -> decoded outputs in the same order
+    """
+    multicall = web3_obj.eth.contract(address=Web3.to_checksum_address(multicall_address), abi=contract_abi_multicall3)
+    payload = [(contract.address, False, contract.encode_abi(fn_name, args=list(args))) for fn_name, args in calls]
+    results = await multicall.functions.aggregate3(payload).call()
+    values = []
+    for (fn_name, _), (success, return_data) in zip(calls, results):
+        if not success:
+            raise ValueError(f"multicall {fn_name} reverted")
+        output_types = get_abi_output_types(contract.abi, fn_name)
+        values.append(unwrap_outputs(web3_obj.codec.decode(output_types, return_data)))
+    return values
+
+
+async def batch_call(web3_obj, contract, calls: list) -> list:
+    """One JSON-RPC batch of eth_call, for chains without Multicall3"""
+    async with web3_obj.batch_requests() as batch:
+        for fn_name, args in calls:
+            batch.add(contract.functions[fn_name](*args))
+        results = await batch.async_execute()
+    return [unwrap_outputs(result) if isinstance(result, (list, tuple)) else result for result in results]
+
+
+async def multicall_read(web3_obj, contract, calls: list, multicall_address: str | None = MULTICALL3_ADDRESS) -> list:
+    """
+    Batched contract reads: Multicall3 when available, else a JSON-RPC batch,
+    else individual calls
+    """
+    if not calls:
+        return []
+    if multicall_address:
+        try:
+            return await multicall_aggregate(web3_obj, contract, calls, multicall_address)
+        except Exception as e:
+            logger.warning(f"multicall_aggregate failed, fallback to batch: {str(e)}")
+    try:
+        return await batch_call(web3_obj, contract, calls)
+    except Exception as e:
+        logger.warning(f"batch_call failed, fallback to single calls: {str(e)}")
+    return [await contract.functions[fn_name](*args).call() for fn_name, args in calls]
@@ -0,0 +1,139 @@
+"""
+- Who trained on which day, as one Redis bitmap per day and kind; bit = dense user id
+- Per-user streaks are a few GETBITs, daily users a BITCOUNT, streaks/retention over
+  all users a BITOP + BITCOUNT
+- Written by /api/ai/complete (aitrain) and web3-emotion_event.py (deeptrain);
+  app-participation-backfill.py rebuilds everything from hack_emotion_training
+- All keys share the {participation} hash tag: BITOP and the scripts need one slot in cluster mode
+"""
+
+import datetime
+
+from utils.cache import RedisBatch, redis_batch, get_redis_connection
+from utils.day_clock import clock, DATE_FORMAT
+from utils.log import log as logger
+from utils.redis.init import run_blocking
+
+KIND_AITRAIN = "aitrain"      # status 1
+KIND_DEEPTRAIN = "deeptrain"  # status 2
+KINDS = {1: KIND_AITRAIN, 2: KIND_DEEPTRAIN}
+
+PARTICIPATION_KEY = "hackathon:{{participation}}:{kind}:{day}"
+USER_IDS_KEY = "hackathon:{participation}:ids"              # address -> id
+USER_IDS_NEXT_KEY = "hackathon:{participation}:ids:next"
+USER_ADDRESSES_KEY = "hackathon:{participation}:addresses"  # id -> address
+RESULT_KEY = "hackathon:{{participation}}:{kind}:{day}:{name}"
+PARTICIPATION_EX = 400 * 86400
+RESULT_EX = 600
+
+# Id of the address (allocated on first sight), then its bit of the day
+MARK_SCRIPT = """
+local id = redis.call('hget', KEYS[1], ARGV[1])
+if not id then
+    id = redis.call('incr', KEYS[2])
+    redis.call('hset', KEYS[1], ARGV[1], id)
+    redis.call('hset', KEYS[3], id, ARGV[1])
+end
+redis.call('setbit', KEYS[4], id, 1)
+redis.call('expire', KEYS[4], ARGV[2])
+return tonumber(id)
+"""
+
+
+def participation_key(kind: str, day: str) -> str:
+    return PARTICIPATION_KEY.format(kind=kind, day=day)
+
+
+def previous_days(day: str, count: int) -> list[str]:
+    """day and the count - 1 days before it, newest first"""
+    start = datetime.datetime.strptime(day, DATE_FORMAT)
+    return [(start - datetime.timedelta(days=offset)).strftime(DATE_FORMAT) for offset in range(count)]
+
+
+def queue_mark(batch: RedisBatch, address: str, day: str, kind: str):
+    return batch.eval(MARK_SCRIPT, 4, USER_IDS_KEY, USER_IDS_NEXT_KEY, USER_ADDRESSES_KEY,
+                      participation_key(kind, day), address.lower(), PARTICIPATION_EX)
+
+
+async def mark(address: str, day: str, kind: str):
+    async with redis_batch(True) as batch:
+        queue_mark(batch, address, day, kind)
+
+
+def mark_blocking(address: str, day: str, kind: str):
+    """mark() for synchronous code, even inside a running event loop (run_blocking)"""
+    try:
+        run_blocking(mark, address, day, kind)
+    except Exception as e:
+        logger.error(f"participation mark_blocking {address} {day} {kind} Exception: {str(e)}")
+
+
+async def user_id(address: str) -> int | None:
+    async with get_redis_connection(False) as cache:
+        value = await cache.hget(USER_IDS_KEY, address.lower())
+    return int(value) if value else None
+
+
+async def streak(address: str, kind: str = KIND_DEEPTRAIN, today: str | None = None, days: int = 7) -> int:
+    """Consecutive days with a bit, up to today (today may still be open)"""
+    uid = await user_id(address)
+    if uid is None:
+        return 0
+    history = previous_days(today or clock.today(), days)
+    async with get_redis_connection(False) as cache:
+        pipe = cache.pipeline(transaction=False)
+        for day in history:
+            pipe.getbit(participation_key(kind, day), uid)
+        bits = await pipe.execute()
+    if not bits[0]:
+        bits = bits[1:]
+    count = 0
+    for bit in bits:
+        if not bit:
+            break
+        count += 1
+    return count
+
+
+async def daily_count(day: str, kind: str) -> int:
+    async with get_redis_connection(False) as cache:
+        return await cache.bitcount(participation_key(kind, day))
+
+
+async def _and_count(cache, kind: str, day: str, name: str, days: list[str]) -> int:
+    """BITCOUNT of the AND of several days, kept RESULT_EX seconds"""
+    destination = RESULT_KEY.format(kind=kind, day=day, name=name)
+    if not await cache.exists(destination):
+        pipe = cache.pipeline(transaction=False)
+        pipe.bitop("AND", destination, *[participation_key(kind, one) for one in days])
+        pipe.expire(destination, RESULT_EX)
+        await pipe.execute()
+    return await cache.bitcount(destination)
+
+
+async def streak_count(day: str, days: int = 7, kind: str = KIND_DEEPTRAIN) -> int:
+    """Users with a bit on each of the days up to day"""
+    async with get_redis_connection(True) as cache:
+        return await _and_count(cache, kind, day, f"streak{days}", previous_days(day, days))
+
+
+async def retention(day: str, back: int = 1, kind: str = KIND_DEEPTRAIN) -> float:
+    """Share of the users of `back` days before day who are back on day"""
+    before = previous_days(day, back + 1)[-1]
+    async with get_redis_connection(True) as cache:
+        cohort = await cache.bitcount(participation_key(kind, before))
+        if not cohort:
+            return 0
+        kept = await _and_count(cache, kind, day, f"retained{back}", [before, day])
+    return round(kept / cohort, 4)
+
+
+async def participation_stats(day: str | None = None, days: int = 7) -> dict:
+    day = day or clock.today()
+    return {
+        "day": day,
+        "users": {kind: await daily_count(day, kind) for kind in KINDS.values()},
+        f"streak_{days}d": await streak_count(day, days),
+        "retention_1d": await retention(day, 1),
+        f"retention_{days}d": await retention(day, days),
+    }
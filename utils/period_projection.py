@@ -0,0 +1,137 @@
+"""
+- The current period of each chain, denormalized in the shape /api/emotion/period returns:
+  one hack_emotion_current row (migrations/0004) and one Redis key
+- Rebuilt from hack_emotions by the daemons each time they change period state
+  (app-open-emotion.py, web3-emotion_event.py): project_period() then publish_projection()
+- Readers take Redis, then the row by primary key; neither joins nor calls the contract
+"""
+
+from utils.cache import get_redis_data, set_redis_data
+from utils.database import db_pool_slave
+from utils.log import log as logger
+from utils.redis.init import run_blocking
+
+PROJECTION_KEY = "hackathon:period:{chain_id}:projection"
+PROJECTION_EX = 86400
+DEFAULT_DURATION = 172800
+
+# Newest period opened or settled, with the result of the one before
+PROJECT_QUERY = """
+                    SELECT
+                        e1.period_id,
+                        e1.period_end,
+                        e1.period_duration,
+                        e1.period_price,
+                        e1.period_putmoney,
+                        e1.period_proportion,
+                        e1.period_reward,
+                        e1.period_total,
+                        e1.status,
+                        e2.period_emotion AS last_emotion,
+                        e2.period_average AS last_average
+                    FROM
+                        hack_emotions e1
+                    LEFT JOIN
+                        hack_emotions e2 ON e2.chain_id = e1.chain_id AND e2.period_id = e1.period_id - 1
+                    WHERE
+                        e1.chain_id = %s AND e1.status IN (1, 2)
+                    ORDER BY e1.period_id DESC
+                    LIMIT 1
+                    """
+
+PROJECTION_SAVE_QUERY = """
+                    INSERT INTO hack_emotion_current
+                        (chain_id, period_id, period_end, period_duration, period_price, period_putmoney, period_proportion,
+                         period_reward, period_total, status, last_emotion, last_average, updated_time)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())
+                    ON DUPLICATE KEY UPDATE
+                        period_id = VALUES(period_id),
+                        period_end = VALUES(period_end),
+                        period_duration = VALUES(period_duration),
+                        period_price = VALUES(period_price),
+                        period_putmoney = VALUES(period_putmoney),
+                        period_proportion = VALUES(period_proportion),
+                        period_reward = VALUES(period_reward),
+                        period_total = VALUES(period_total),
+                        status = VALUES(status),
+                        last_emotion = VALUES(last_emotion),
+                        last_average = VALUES(last_average),
+                        updated_time = NOW()
+                    """
+
+PROJECTION_QUERY = """
+                    SELECT
+                        period_id, period_end, period_duration, period_price, period_putmoney, period_proportion,
+                        period_reward, period_total, status, last_emotion, last_average
+                    FROM hack_emotion_current
+                    WHERE
+                        chain_id = %s
+                    """
+
+
+def projection_of(row: dict) -> dict:
+    """The /api/emotion/period fields of a PROJECT_QUERY or PROJECTION_QUERY row"""
+    total = int(row['period_total'] or 0)
+    price = int(row['period_price'] or 0)
+    putmoney = int(row['period_putmoney'] or 0)
+    proportion = int(row['period_proportion'] or 0)
+    reward = int(row['period_reward'] or 0)
+    if int(row['status']) == 1:
+        # Written at settlement only: what it would be now, as the contract computes it
+        reward = int(total * price * proportion / 100 + putmoney)
+    return {
+        "id": int(row['period_id']),
+        "total": total,
+        "price": price,
+        "putmoney": putmoney,
+        "proportion": proportion,
+        "duration": int(row['period_duration'] or 0) or DEFAULT_DURATION,
+        "reward": reward,
+        "timestamp": int(row['period_end'] or 0),
+        "last_emotion": int(row['last_emotion'] or 0),
+        "last_average": int(row['last_average'] or 0),
+        "status": int(row['status']),
+    }
+
+
+def project_period(cursor, chain_id: int) -> dict | None:
+    """Rebuild the hack_emotion_current row of chain_id (synchronous pymysql cursor, on the master)"""
+    cursor.execute(PROJECT_QUERY, (chain_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    projection = projection_of(row)
+    values = (chain_id, projection['id'], projection['timestamp'], projection['duration'], projection['price'],
+              projection['putmoney'], projection['proportion'], projection['reward'], projection['total'],
+              projection['status'], projection['last_emotion'], projection['last_average'])
+    cursor.execute(PROJECTION_SAVE_QUERY, values)
+    return projection
+
+
+async def publish_projection(chain_id: int, projection: dict | None):
+    if projection is not None:
+        await set_redis_data(True, PROJECTION_KEY.format(chain_id=chain_id), projection, ex=PROJECTION_EX)
+
+
+def publish_projection_blocking(chain_id: int, projection: dict | None):
+    """publish_projection() for synchronous code"""
+    try:
+        run_blocking(publish_projection, chain_id, projection)
+    except Exception as e:
+        logger.error(f"publish_projection_blocking {chain_id} Exception: {str(e)}")
+
+
+async def load_projection(chain_id: int) -> dict | None:
+    """Current period of chain_id, None when nothing was projected yet"""
+    key = PROJECTION_KEY.format(chain_id=chain_id)
+    projection = await get_redis_data(False, key)
+    if projection:
+        return projection
+    async with db_pool_slave.cursor() as cursorSlave:
+        await cursorSlave.execute(PROJECTION_QUERY, (chain_id,))
+        row = await cursorSlave.fetchone()
+    if row is None:
+        return None
+    projection = projection_of(row)
+    await set_redis_data(True, key, projection, ex=PROJECTION_EX)
+    return projection
@@ -0,0 +1,83 @@
+"""
+- Settlement backfill of hack_emotions: periods the contract has closed but MySQL still
+  shows unsettled are queued by /api/emotion/period-history and written by
+  app-period-settle.py, never inside the request
+- The queue is one sorted set, member "{chain_id}:{period_id}", score = when it is due:
+  ZADD NX keeps one job per period however many requests see the gap, and a period
+  the contract has not closed yet goes back with a later score
+"""
+
+import time
+
+from utils.cache import get_redis_connection
+from utils.log import log as logger
+
+SETTLE_QUEUE_KEY = "hackathon:period:settle:queue"
+SETTLE_RETRY = 60       # seconds before a period not closed on chain is read again
+SETTLE_CLAIM = 50       # jobs taken per round
+
+SETTLE_QUERY = """
+                    UPDATE hack_emotions
+                    SET
+                        period_end=%s,
+                        period_putmoney=%s,
+                        period_price=%s,
+                        period_emotion=%s,
+                        period_average=%s,
+                        period_reward=%s,
+                        period_total=%s,
+                        emotion_positive=%s,
+                        emotion_neutral=%s,
+                        emotion_negative=%s,
+                        status=%s,
+                        updated_time=NOW()
+                    WHERE
+                        chain_id=%s AND period_id=%s"""
+
+
+def settle_values(chain_id: int, snapshot) -> tuple:
+    """Parameters of SETTLE_QUERY for a PeriodSnapshot"""
+    return (snapshot.end_timestamp, snapshot.putmoney, snapshot.price, snapshot.emotion, int(snapshot.average),
+            snapshot.reward, snapshot.total, snapshot.positive, snapshot.neutral, snapshot.negative, 2,
+            chain_id, snapshot.period_id)
+
+
+def _member(chain_id: int, period_id: int) -> str:
+    return f"{chain_id}:{period_id}"
+
+
+async def enqueue_settlement(chain_id: int, period_ids: list) -> int:
+    """Queue the periods not queued yet, due now; returns how many were added"""
+    members = {_member(chain_id, period_id): time.time() for period_id in period_ids if period_id > 0}
+    if not members:
+        return 0
+    try:
+        async with get_redis_connection(True) as cache:
+            return await cache.zadd(SETTLE_QUEUE_KEY, members, nx=True)
+    except Exception as e:
+        logger.error(f"enqueue_settlement {chain_id} {period_ids} Exception: {str(e)}")
+        return 0
+
+
+async def retry_settlement(chain_id: int, period_id: int, delay: int = SETTLE_RETRY):
+    async with get_redis_connection(True) as cache:
+        await cache.zadd(SETTLE_QUEUE_KEY, {_member(chain_id, period_id): time.time() + delay})
+
+
+async def claim_settlements(limit: int = SETTLE_CLAIM) -> dict:
+    """Due jobs, removed from the queue, as {chain_id: [period_id, ...]}; a job removed by another worker is skipped"""
+    async with get_redis_connection(True) as cache:
+        members = await cache.zrangebyscore(SETTLE_QUEUE_KEY, "-inf", time.time(), start=0, num=limit)
+        if not members:
+            return {}
+        pipe = cache.pipeline(transaction=False)
+        for member in members:
+            pipe.zrem(SETTLE_QUEUE_KEY, member)
+        removed = await pipe.execute()
+    jobs = {}
+    for member, claimed in zip(members, removed):
+        if not claimed:
+            continue
+        chain_id, period_id = (int(part) for part in member.split(":"))
+        jobs.setdefault(chain_id, []).append(period_id)
+    return jobs
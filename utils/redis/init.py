@@ -8,6 +8,9 @@
 @Date: 2024/2/26 14:27
 """
 
+import asyncio
+import threading
+
 from fastapi import FastAPI
 from pydantic import Field
 from redis import asyncio as aioredis
@@ -17,16 +20,19 @@ from loguru import logger
 from config import REDIS_CONFIG
 
 class RedisMixin:
-    def __init__(self):
+    def __init__(self, master_db: bool = True):
         self.mode: str = REDIS_CONFIG['mode']
-        self.host: str = REDIS_CONFIG['master']
+        self.master_db: bool = master_db
+        self.host: str = REDIS_CONFIG['master'] if master_db else REDIS_CONFIG['slave']
         self.username: str = REDIS_CONFIG['username']
         self.password: str = REDIS_CONFIG['password']
         self.db: int = REDIS_CONFIG['db']
-        self.sentinel_name: str = None
+        self.sentinel_name: str = REDIS_CONFIG['sentinel_name']
         self.encoding: str = 'utf-8'
         self.decode_responses: bool = True
-        self.max_connections: int = 2000
+        self.max_connections: int = REDIS_CONFIG['max_connections']
+        self.health_check_interval: int = REDIS_CONFIG['health_check_interval']
+        self.timeout: int = REDIS_CONFIG['timeout']
         self.ssl: bool = False
         self.ssl_cert_reqs: str = None
         self.ssl_ca_certs: str = None
@@ -38,18 +44,26 @@ class RedisMixin:
         """
         sentinel_host = self.host.split(':')[0]
         sentinel_port = int(self.host.split(":")[-1])
-        return aioredis.Redis(host=sentinel_host, port=sentinel_port, 
-                              username=self.username,
-                              password=self.password, 
-                              db=self.db, 
-                              decode_responses=self.decode_responses,
-                              max_connections=self.max_connections, 
-                              ssl=self.ssl, 
-                              ssl_cert_reqs=self.ssl_cert_reqs,
-                              ssl_ca_certs=self.ssl_ca_certs)
+        connection_class = aioredis.SSLConnection if self.ssl else aioredis.Connection
+        ssl_kwargs = {"ssl_cert_reqs": self.ssl_cert_reqs, "ssl_ca_certs": self.ssl_ca_certs} if self.ssl else {}
+        # Blocking pool: callers wait up to `timeout` for a free connection instead of failing
+        pool = aioredis.BlockingConnectionPool(host=sentinel_host, port=sentinel_port,
+                                               username=self.username,
+                                               password=self.password,
+                                               db=self.db,
+                                               decode_responses=self.decode_responses,
+                                               max_connections=self.max_connections,
+                                               timeout=self.timeout,
+                                               socket_timeout=self.timeout,
+                                               socket_connect_timeout=self.timeout,
+                                               socket_keepalive=True,
+                                               health_check_interval=self.health_check_interval,
+                                               connection_class=connection_class,
+                                               **ssl_kwargs)
+        return aioredis.Redis.from_pool(pool)
 
     @property
-    async def redis_sentinel_conn(self) -> aioredis.Sentinel:
+    async def redis_sentinel_conn(self) -> aioredis.Redis:
         """
         sentinel
         """
@@ -58,15 +72,21 @@ class RedisMixin:
             sentinel_host = address.split(':')[0]
             sentinel_port = int(address.split(':')[-1])
             sentinel_list.append((sentinel_host, sentinel_port))
-        return aioredis.Sentinel(sentinels=sentinel_list, 
-                                 username=self.username,
-                                 password=self.password, 
-                                 db=self.db, 
-                                 decode_responses=self.decode_responses,
-                                 max_connections=self.max_connections, 
-                                 ssl=self.ssl, 
-                                 ssl_cert_reqs=self.ssl_cert_reqs,
-                                 ssl_ca_certs=self.ssl_ca_certs)
+        ssl_kwargs = {"ssl": True, "ssl_cert_reqs": self.ssl_cert_reqs, "ssl_ca_certs": self.ssl_ca_certs} if self.ssl else {}
+        sentinel = aioredis.Sentinel(sentinels=sentinel_list,
+                                     username=self.username,
+                                     password=self.password,
+                                     db=self.db,
+                                     decode_responses=self.decode_responses,
+                                     max_connections=self.max_connections,
+                                     socket_timeout=self.timeout,
+                                     socket_connect_timeout=self.timeout,
+                                     socket_keepalive=True,
+                                     health_check_interval=self.health_check_interval,
+                                     **ssl_kwargs)
+        if self.master_db:
+            return sentinel.master_for(self.sentinel_name)
+        return sentinel.slave_for(self.sentinel_name)
 
     @property
     async def redis_cluster_conn(self) -> aioredis.RedisCluster:
@@ -78,10 +98,16 @@ class RedisMixin:
             cluster_host = address.split(':')[0]
             cluster_port = int(address.split(':')[-1])
             startup_nodes.append(aioredis.cluster.ClusterNode(cluster_host, cluster_port))
-        return aioredis.RedisCluster(startup_nodes=startup_nodes, 
-                                     username=self.username, 
+        return aioredis.RedisCluster(startup_nodes=startup_nodes,
+                                     username=self.username,
                                      password=self.password,
-                                     decode_responses=self.decode_responses, 
+                                     decode_responses=self.decode_responses,
+                                     max_connections=self.max_connections,
+                                     read_from_replicas=not self.master_db,
+                                     socket_timeout=self.timeout,
+                                     socket_connect_timeout=self.timeout,
+                                     socket_keepalive=True,
+                                     health_check_interval=self.health_check_interval,
                                      ssl=self.ssl,
                                      ssl_cert_reqs=self.ssl_cert_reqs,
                                      ssl_ca_certs=self.ssl_ca_certs)
@@ -94,7 +120,7 @@ class RedisMixin:
         if self.mode == "standalone":
             redis_conn: aioredis.Redis = await self.redis_standalone_conn
         elif self.mode == "sentinel":
-            redis_conn: aioredis.Sentinel = await self.redis_sentinel_conn
+            redis_conn: aioredis.Redis = await self.redis_sentinel_conn
         elif self.mode == "cluster":
             redis_conn: aioredis.RedisCluster = await self.redis_cluster_conn
         else:
@@ -103,131 +129,137 @@ class RedisMixin:
         try:
             await redis_conn.ping()
             return redis_conn
-        except aioredis.ConnectionError as e:
+        except (aioredis.ConnectionError, aioredis.TimeoutError) as e:
             logger.error(f"ConnectionError: {e}")
+            await redis_conn.aclose()
             return None
 
-class RedisMixin2:
-    def __init__(self):
-        self.mode: str = REDIS_CONFIG['mode']
-        self.host: str = REDIS_CONFIG['slave']
-        self.username: str = REDIS_CONFIG['username']
-        self.password: str = REDIS_CONFIG['password']
-        self.db: int = REDIS_CONFIG['db']
-        self.sentinel_name: str = None
-        self.encoding: str = 'utf-8'
-        self.decode_responses: bool = True
-        self.max_connections: int = 2000
-        self.ssl: bool = False
-        self.ssl_cert_reqs: str = None
-        self.ssl_ca_certs: str = None
 
-    @property
-    async def redis_standalone_conn(self) -> aioredis.Redis:
-        """
-        standalone
-        """
-        sentinel_host = self.host.split(':')[0]
-        sentinel_port = int(self.host.split(":")[-1])
-        return aioredis.Redis(host=sentinel_host, port=sentinel_port, 
-                              username=self.username,
-                              password=self.password, 
-                              db=self.db, 
-                              decode_responses=self.decode_responses,
-                              max_connections=self.max_connections, 
-                              ssl=self.ssl, 
-                              ssl_cert_reqs=self.ssl_cert_reqs,
-                              ssl_ca_certs=self.ssl_ca_certs)
+redisCache = Annotated[Union[aioredis.Redis, aioredis.RedisCluster], Field(description="redis type")]
 
-    @property
-    async def redis_sentinel_conn(self) -> aioredis.Sentinel:
-        """
-        sentinel
-        """
-        sentinel_list = []
-        for address in self.host.split(','):
-            sentinel_host = address.split(':')[0]
-            sentinel_port = int(address.split(':')[-1])
-            sentinel_list.append((sentinel_host, sentinel_port))
-        return aioredis.Sentinel(sentinels=sentinel_list, 
-                                 username=self.username,
-                                 password=self.password, 
-                                 db=self.db, 
-                                 decode_responses=self.decode_responses,
-                                 max_connections=self.max_connections, 
-                                 ssl=self.ssl, 
-                                 ssl_cert_reqs=self.ssl_cert_reqs,
-                                 ssl_ca_certs=self.ssl_ca_certs)
+# Process-wide clients, one per role, bound to the event loop that created them
+_redis_clients: dict[bool, redisCache] = {}
+_redis_loop: asyncio.AbstractEventLoop | None = None
 
-    @property
-    async def redis_cluster_conn(self) -> aioredis.RedisCluster:
-        """
-        cluster
-        """
-        startup_nodes = []
-        for address in self.host.split(','):
-            cluster_host = address.split(':')[0]
-            cluster_port = int(address.split(':')[-1])
-            startup_nodes.append(aioredis.cluster.ClusterNode(cluster_host, cluster_port))
-        return aioredis.RedisCluster(startup_nodes=startup_nodes, 
-                                     username=self.username, 
-                                     password=self.password,
-                                     decode_responses=self.decode_responses, 
-                                     ssl=self.ssl,
-                                     ssl_cert_reqs=self.ssl_cert_reqs,
-                                     ssl_ca_certs=self.ssl_ca_certs)
 
-    @property
-    async def connect_redis(self):
-        """
-        connect
-        """
+async def init_redis() -> None:
+    """
+    Create the shared master/replica clients for the current event loop
+    """
+    global _redis_loop
+    loop = asyncio.get_running_loop()
+    if _redis_clients and _redis_loop is loop:
+        return
+    _redis_clients.clear()
+    for master_db in (True, False):
+        try:
+            _redis_clients[master_db] = await RedisMixin(master_db).connect_redis
+        except Exception as e:
+            logger.error(f"init_redis({master_db}) Exception: {str(e)}")
+            _redis_clients[master_db] = None
+    _redis_loop = loop
+    logger.info(f"Redis clients ready - mode: {REDIS_CONFIG['mode']} max_connections: {REDIS_CONFIG['max_connections']}")
 
-        if self.mode == "standalone":
-            redis_conn: aioredis.Redis = await self.redis_standalone_conn
-        elif self.mode == "sentinel":
-            redis_conn: aioredis.Sentinel = await self.redis_sentinel_conn
-        elif self.mode == "cluster":
-            redis_conn: aioredis.RedisCluster = await self.redis_cluster_conn
-        else:
-            raise ValueError("Redis mode not supported")
 
+async def close_redis() -> None:
+    """
+    Close the shared clients and release their pools
+    """
+    global _redis_loop
+    for master_db, redis_conn in list(_redis_clients.items()):
+        if redis_conn is None:
+            continue
         try:
-            await redis_conn.ping()
-            return redis_conn
-        except aioredis.ConnectionError as e:
-            logger.error(f"ConnectionError: {e}")
-            return None
+            await redis_conn.aclose()
+        except Exception as e:
+            logger.error(f"close_redis({master_db}) Exception: {str(e)}")
+    _redis_clients.clear()
+    _redis_loop = None
 
 
-async def register_redis(app: FastAPI):
-    app.state.cache = await RedisMixin().connect_redis
+class BlockingLoop:
+    """
+    One event loop in a daemon thread for the synchronous daemons: coroutines run there
+    one after another and reuse its shared clients (created on first use, kept until exit)
+    """
 
+    def __init__(self):
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._lock = threading.Lock()
 
-redisCache = Annotated[Union[aioredis.Redis, aioredis.Sentinel, aioredis.RedisCluster], Field(description="redis type")]
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="redis-blocking-loop", daemon=True).start()
+            return self._loop
 
+    def run(self, func, *args):
+        return asyncio.run_coroutine_threadsafe(func(*args), self.loop()).result()
+
+
+_blocking_loop = BlockingLoop()
+
+
+def run_blocking(func, *args):
+    """func(*args) awaited from synchronous code, even inside a running event loop (BlockingLoop)"""
+    return _blocking_loop.run(func, *args)
+
+
+async def register_redis(app: FastAPI):
+    await init_redis()
+    app.state.cache = _redis_clients.get(True)
 
-async def get_redis(master_db: bool| None = True) -> redisCache:
-    try:
-        if master_db:
-            _redis_coon = await RedisMixin().connect_redis
-        else:
-            _redis_coon = await RedisMixin2().connect_redis
-        if _redis_coon is None:
-            yield None
 
+async def get_shared_redis(master_db: bool | None = True) -> redisCache | None:
+    """
+    Shared client for the running loop, or None when this loop does not own one
+    (e.g. a worker thread that runs its own `asyncio.run`)
+    """
+    loop = asyncio.get_running_loop()
+    if _redis_loop is None or _redis_loop.is_closed():
+        # Daemons never run the FastAPI lifespan: create the clients on first use
+        await init_redis()
+    if _redis_loop is not loop:
+        return None
+    redis_conn = _redis_clients.get(bool(master_db))
+    if redis_conn is None:
+        # The startup ping failed, try once more
         try:
-            yield _redis_coon
-        finally:
-            await _redis_coon.close()
+            redis_conn = await RedisMixin(bool(master_db)).connect_redis
+        except Exception as e:
+            logger.error(f"get_shared_redis({master_db}) Exception: {str(e)}")
+            return None
+        _redis_clients[bool(master_db)] = redis_conn
+    return redis_conn
+
+
+async def ping_redis(master_db: bool | None = True) -> bool:
+    try:
+        redis_conn = await get_shared_redis(master_db)
+        return bool(redis_conn and await redis_conn.ping())
     except Exception as e:
-        if _redis_coon != None:
-            await _redis_coon.close()
-        yield None
+        logger.error(f"ping_redis Exception: {str(e)}")
+        return False
 
-if __name__ == "__main__":
-    import asyncio
 
+async def get_redis(master_db: bool| None = True) -> redisCache:
+    """
+    Yields the shared client; falls back to a one-off connection outside the owning loop
+    """
+    _redis_coon = await get_shared_redis(master_db)
+    if _redis_coon is not None:
+        yield _redis_coon
+        return
+
+    _redis_coon = await RedisMixin(bool(master_db)).connect_redis
+    try:
+        yield _redis_coon
+    finally:
+        if _redis_coon is not None:
+            await _redis_coon.aclose()
+
+if __name__ == "__main__":
     a = asyncio.run(RedisMixin().connect_redis)
     print(type(a))
     print(a)
@@ -0,0 +1,254 @@
+"""
+- Several RPC URLs per chain, scored by observed latency and error rate
+- Calls go to the best endpoint and fail over to the next one
+- Latency-sensitive reads are hedged: a second request after the p95 delay, first answer wins
+"""
+
+import asyncio
+import bisect
+import time
+
+import aiohttp
+import requests
+from web3 import Web3, AsyncWeb3
+from web3._utils.batching import sort_batch_response_by_response_ids
+
+from config import WEB3_HEDGE, WEB3_HEDGE_MIN_MS, WEB3_HEDGE_MAX_MS, WEB3_EJECT_SECONDS
+from utils.log import log as logger
+
+# Histogram upper bounds in milliseconds, the last bucket is everything slower
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Reads that are safe to send twice
+HEDGED_METHODS = {
+    "eth_call", "eth_blockNumber", "eth_getBlockByNumber", "eth_getBlockByHash",
+    "eth_getLogs", "eth_getTransactionReceipt", "eth_getTransactionByHash",
+    "eth_getBalance", "eth_getCode", "eth_chainId", "web3_clientVersion",
+}
+
+# Sent to one endpoint only: after a timeout the node may already have broadcast the
+# transaction, sending it again elsewhere means a duplicate nonce or a double submission
+SEND_METHODS = {"eth_sendRawTransaction", "eth_sendTransaction"}
+
+EWMA_ALPHA = 0.2
+ERROR_PENALTY = 10     # a 100% error rate weighs like an 11x slower endpoint
+EJECT_AFTER = 3        # consecutive failures before the cool-down
+
+
+def get_rpc_urls(web3_config: dict) -> list:
+    """`server` first, then the optional `servers` list of WEB3_CONFIG, without duplicates"""
+    urls = []
+    for url in [web3_config.get('server')] + list(web3_config.get('servers') or []):
+        if url and url not in urls:
+            urls.append(url)
+    return urls
+
+
+class RpcEndpoint:
+    def __init__(self, url: str):
+        self.url = url
+        self.latency: float | None = None  # EWMA seconds, None until the first answer
+        self.error_rate = 0.0               # EWMA of failures
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def record(self, elapsed: float, ok: bool):
+        self.requests += 1
+        if ok:
+            self.latency = elapsed if self.latency is None else (1 - EWMA_ALPHA) * self.latency + EWMA_ALPHA * elapsed
+            self.error_rate *= (1 - EWMA_ALPHA)
+            self.consecutive_failures = 0
+            self.histogram[bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed * 1000)] += 1
+        else:
+            self.errors += 1
+            self.error_rate = (1 - EWMA_ALPHA) * self.error_rate + EWMA_ALPHA
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= EJECT_AFTER:
+                self.ejected_until = time.monotonic() + WEB3_EJECT_SECONDS
+                logger.warning(f"RPC endpoint ejected for {WEB3_EJECT_SECONDS}s: {self.url}")
+
+    @property
+    def ejected(self) -> bool:
+        return self.ejected_until > time.monotonic()
+
+    def score(self) -> float:
+        # Unmeasured endpoints score 0 so each one gets probed once
+        return (self.latency or 0.0) * (1 + ERROR_PENALTY * self.error_rate)
+
+    def quantile(self, q: float) -> float | None:
+        """Latency quantile in seconds, taken from the histogram bucket bounds"""
+        total = sum(self.histogram)
+        if total == 0:
+            return None
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(self.histogram):
+            seen += count
+            if seen >= rank:
+                bound = LATENCY_BUCKETS_MS[min(index, len(LATENCY_BUCKETS_MS) - 1)]
+                return bound / 1000
+        return LATENCY_BUCKETS_MS[-1] / 1000
+
+    def stats(self) -> dict:
+        p50, p95 = self.quantile(0.5), self.quantile(0.95)
+        return {
+            "url": self.url,
+            "score_ms": round(self.score() * 1000, 3),
+            "latency_ms": round(self.latency * 1000, 3) if self.latency is not None else None,
+            "p50_ms": round(p50 * 1000, 3) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 3) if p95 is not None else None,
+            "error_rate": round(self.error_rate, 4),
+            "ejected": self.ejected,
+            "requests": self.requests,
+            "errors": self.errors,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "histogram": {
+                **{f"le_{bound}ms": count for bound, count in zip(LATENCY_BUCKETS_MS, self.histogram)},
+                "gt_10000ms": self.histogram[-1],
+            },
+        }
+
+
+class EndpointSet:
+    def __init__(self, urls: list):
+        if not urls:
+            raise Exception("Web3 rpc not found")
+        self.endpoints = [RpcEndpoint(url) for url in urls]
+
+    def ranked(self) -> list:
+        """Best first; ejected endpoints go last but are still tried when everything else fails"""
+        healthy = sorted((e for e in self.endpoints if not e.ejected), key=lambda e: e.score())
+        ejected = sorted((e for e in self.endpoints if e.ejected), key=lambda e: e.ejected_until)
+        return healthy + ejected
+
+    def hedge_delay(self, endpoint: RpcEndpoint) -> float:
+        p95 = endpoint.quantile(0.95)
+        delay = p95 if p95 is not None else WEB3_HEDGE_MAX_MS / 1000
+        return min(max(delay, WEB3_HEDGE_MIN_MS / 1000), WEB3_HEDGE_MAX_MS / 1000)
+
+    def candidates(self, method) -> list:
+        """Endpoints to try in order: every one for reads, only the best for a send"""
+        ranked = self.ranked()
+        return ranked[:1] if method in SEND_METHODS else ranked
+
+    def stats(self) -> list:
+        return [endpoint.stats() for endpoint in self.endpoints]
+
+
+def batch_method(batch_requests) -> str:
+    """Method a batch is treated as: a read when every call in it is hedged, a send when any is one"""
+    methods = [method for method, _ in batch_requests]
+    if any(method in SEND_METHODS for method in methods):
+        return "eth_sendRawTransaction"
+    return "eth_call" if all(method in HEDGED_METHODS for method in methods) else "batch"
+
+
+class FailoverHTTPProvider(Web3.HTTPProvider):
+    """Sync provider for the daemons: best endpoint first, fail over on transport errors"""
+
+    def __init__(self, endpoints: EndpointSet, session: requests.Session, timeout: float, **kwargs):
+        super().__init__(endpoints.endpoints[0].url, session=session, request_kwargs={"timeout": timeout}, **kwargs)
+        self.endpoints = endpoints
+        self._session = session
+
+    def _post(self, method, request_data: bytes) -> bytes:
+        last_error = None
+        for endpoint in self.endpoints.candidates(method):
+            start = time.perf_counter()
+            try:
+                response = self._session.post(endpoint.url, data=request_data, **dict(self.get_request_kwargs()))
+                response.raise_for_status()
+                endpoint.record(time.perf_counter() - start, True)
+                return response.content
+            except Exception as e:
+                endpoint.record(time.perf_counter() - start, False)
+                logger.warning(f"RPC {endpoint.url} failed: {str(e)}")
+                last_error = e
+        raise last_error
+
+    def _make_request(self, method, request_data: bytes) -> bytes:
+        return self._post(method, request_data)
+
+    def make_batch_request(self, batch_requests):
+        raw_response = self._post(batch_method(batch_requests), self.encode_batch_rpc_request(batch_requests))
+        return sort_batch_response_by_response_ids(self.decode_rpc_response(raw_response))
+
+
+class AsyncFailoverHTTPProvider(AsyncWeb3.AsyncHTTPProvider):
+    """Async provider for the API: best endpoint first, hedged reads, fail over on transport errors"""
+
+    def __init__(self, endpoints: EndpointSet, session: aiohttp.ClientSession, timeout: float, hedge: bool = bool(WEB3_HEDGE), **kwargs):
+        super().__init__(endpoints.endpoints[0].url, **kwargs)
+        self.endpoints = endpoints
+        self.hedge = hedge
+        self._session = session
+        self._timeout = aiohttp.ClientTimeout(total=timeout)
+
+    async def _post_endpoint(self, endpoint: RpcEndpoint, request_data: bytes) -> bytes:
+        start = time.perf_counter()
+        try:
+            async with self._session.post(endpoint.url, data=request_data, headers=self.get_request_headers(), timeout=self._timeout) as response:
+                response.raise_for_status()
+                content = await response.read()
+        except asyncio.CancelledError:
+            # Lost the hedge race, no signal about this endpoint
+            raise
+        except Exception as e:
+            endpoint.record(time.perf_counter() - start, False)
+            logger.warning(f"RPC {endpoint.url} failed: {str(e)}")
+            raise
+        endpoint.record(time.perf_counter() - start, True)
+        return content
+
+    async def _post(self, method, request_data: bytes) -> bytes:
+        ranked = self.endpoints.candidates(method)
+        hedge = self.hedge and method in HEDGED_METHODS and len(ranked) > 1
+        hedge_delay = self.endpoints.hedge_delay(ranked[0])
+        tasks: dict[asyncio.Task, RpcEndpoint] = {}
+        remaining = iter(ranked)
+        hedged = False
+        last_error = None
+
+        def launch() -> bool:
+            endpoint = next(remaining, None)
+            if endpoint is None:
+                return False
+            tasks[asyncio.ensure_future(self._post_endpoint(endpoint, request_data))] = endpoint
+            return True
+
+        launch()
+        try:
+            while tasks:
+                timeout = hedge_delay if hedge and not hedged else None
+                done, _ = await asyncio.wait(tasks.keys(), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    if launch():
+                        list(tasks.values())[-1].hedges += 1
+                    continue
+                for task in done:
+                    endpoint = tasks.pop(task)
+                    if task.exception() is None:
+                        if hedged and endpoint is not ranked[0]:
+                            endpoint.hedge_wins += 1
+                        return task.result()
+                    last_error = task.exception()
+                if not tasks:
+                    launch()
+        finally:
+            for task in tasks:
+                task.cancel()
+        raise last_error
+
+    async def _make_request(self, method, request_data: bytes) -> bytes:
+        return await self._post(method, request_data)
+
+    async def make_batch_request(self, batch_requests):
+        raw_response = await self._post(batch_method(batch_requests), self.encode_batch_rpc_request(batch_requests))
+        return sort_batch_response_by_response_ids(self.decode_rpc_response(raw_response))
@@ -1,12 +1,15 @@
+import hmac
 import json
 import time
 
-from fastapi import HTTPException, Depends, Request
+from fastapi import HTTPException, Depends, Header, Request
 from fastapi.security import HTTPAuthorizationCredentials
 from fastapi.security import HTTPBearer
 from jose import JWTError
 from loguru import logger
 
+from config import ENVIRONMENT, INTERNAL_KEY
+
 bearer = HTTPBearer()
 
 async def get_current_address(authorization: HTTPAuthorizationCredentials = Depends(bearer)):
@@ -21,3 +24,13 @@ async def get_current_address(authorization: HTTPAuthorizationCredentials = Depe
         raise credentials_exception
     return eth_address.lower()
 
+
+async def get_internal_access(x_internal_key: str | None = Header(default=None)):
+    """Guard for /api/internal/*: requires INTERNAL_KEY when set, closed in prod otherwise"""
+    forbidden_exception = HTTPException(status_code=404, detail="Not Found")
+    if INTERNAL_KEY:
+        if not x_internal_key or not hmac.compare_digest(x_internal_key, INTERNAL_KEY):
+            raise forbidden_exception
+    elif ENVIRONMENT == "prod":
+        raise forbidden_exception
+    return True
@@ -0,0 +1,55 @@
+"""
+- /api/ai/history pages by id (keyset): the next page starts below the last id seen,
+  whatever was inserted meanwhile, and a deep page costs the same as the first
+- Only rows with visible=1 are listed (no letters in detail, migrations/0002), so pages are full
+- The total is hack_emotion_training_count, bumped with COUNT_INSERTED_QUERY in the
+  transaction of every hack_emotion_training insert (api/ai.py, web3-emotion_event.py)
+"""
+
+import base64
+
+HISTORY_MAX_LIMIT = 100
+HISTORY_HEAD_ID = 2147483647  # above every id (int column): the first page
+CURSOR_PREFIX = "h1:"
+
+HISTORY_QUERY = """
+                    SELECT
+                        id,
+                        date,
+                        detail,
+                        status
+                    FROM hack_emotion_training
+                    WHERE
+                        address = %s AND visible = 1 AND id < %s
+                    ORDER BY id DESC
+                    LIMIT %s, %s
+                    """
+
+# Counts the row just inserted (its id) when it is listed
+COUNT_INSERTED_QUERY = """
+                    INSERT INTO hack_emotion_training_count
+                        (address, total, updated_time)
+                    SELECT address, 1, NOW()
+                    FROM hack_emotion_training
+                    WHERE id = %s AND visible = 1
+                    ON DUPLICATE KEY UPDATE
+                        hack_emotion_training_count.total = hack_emotion_training_count.total + 1,
+                        hack_emotion_training_count.updated_time = NOW()
+                    """
+
+
+def encode_cursor(last_id: int) -> str:
+    """Opaque token of the page after last_id"""
+    return base64.urlsafe_b64encode(f"{CURSOR_PREFIX}{last_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> int:
+    """Id the page starts below; ValueError on a token not made by encode_cursor"""
+    try:
+        text = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+    except Exception:
+        raise ValueError(f"invalid cursor: {token}")
+    digits = text[len(CURSOR_PREFIX):]
+    if not text.startswith(CURSOR_PREFIX) or not (digits.isascii() and digits.isdigit()):
+        raise ValueError(f"invalid cursor: {token}")
+    return int(digits)
@@ -0,0 +1,134 @@
+"""
+- One row per address (hack_emotion_training_summary, migrations/0003): the last AI training
+  and the deep-training days of the last week with their streak, so /api/ai/list is one
+  primary-key read instead of a window query over the history
+- Kept up to date with each hack_emotion_training insert: status 1 by /api/ai/complete
+  (TRAINED_QUERY), status 2 by web3-emotion_event.py (SUMMARY_LOCK_QUERY, add_deep_training,
+  SUMMARY_SAVE_QUERY); app-training-summary.py rebuilds it from the history
+- Only days are stored, today/yesterday are resolved when read
+"""
+
+import datetime
+import json
+
+from utils.day_clock import DATE_FORMAT
+
+RECENT_DAYS = 7
+CYCLE_DAYS = 5      # /api/ai/list: deep trainings of today and the 4 days before
+CYCLE_MAX = 6
+STREAK_MAX = 7
+
+SUMMARY_QUERY = """
+                    SELECT
+                        address, train_date, train_detail, deep_date, streak, recent
+                    FROM hack_emotion_training_summary
+                    WHERE
+                        address = %s
+                    """
+SUMMARY_LOCK_QUERY = SUMMARY_QUERY + "FOR UPDATE"
+
+SUMMARY_SAVE_QUERY = """
+                    INSERT INTO hack_emotion_training_summary
+                        (address, train_date, train_detail, deep_date, streak, recent, updated_time)
+                    VALUES (%s, %s, %s, %s, %s, %s, NOW())
+                    ON DUPLICATE KEY UPDATE
+                        train_date = VALUES(train_date),
+                        train_detail = VALUES(train_detail),
+                        deep_date = VALUES(deep_date),
+                        streak = VALUES(streak),
+                        recent = VALUES(recent),
+                        updated_time = NOW()
+                    """
+
+# The AI training of the day needs no read: only the train_* columns change
+TRAINED_QUERY = """
+                    INSERT INTO hack_emotion_training_summary
+                        (address, train_date, train_detail, updated_time)
+                    VALUES (%s, %s, %s, NOW())
+                    ON DUPLICATE KEY UPDATE
+                        train_date = VALUES(train_date),
+                        train_detail = VALUES(train_detail),
+                        updated_time = NOW()
+                    """
+
+
+def _day(date: str) -> datetime.date:
+    return datetime.datetime.strptime(date[:10], DATE_FORMAT).date()
+
+
+def _days_between(older: str, newer: str) -> int:
+    return (_day(newer) - _day(older)).days
+
+
+def empty_summary(address: str) -> dict:
+    return {"address": address, "train_date": "", "train_detail": "", "deep_date": "", "streak": 0, "recent": []}
+
+
+def load_summary(address: str, row: dict | None) -> dict:
+    """Summary of a SUMMARY_QUERY row, empty when there is none"""
+    if not row:
+        return empty_summary(address)
+    summary = dict(row)
+    summary['recent'] = json.loads(row['recent']) if row['recent'] else []
+    return summary
+
+
+def summary_values(summary: dict) -> tuple:
+    """Parameters of SUMMARY_SAVE_QUERY"""
+    return (summary['address'], summary['train_date'], summary['train_detail'], summary['deep_date'],
+            summary['streak'], json.dumps(summary['recent'], separators=(",", ":")))
+
+
+def add_training(summary: dict, date: str, detail: str):
+    """A status 1 row"""
+    date = date[:10]
+    if date >= summary['train_date']:
+        summary['train_date'] = date
+        summary['train_detail'] = detail
+
+
+def add_deep_training(summary: dict, date: str, detail: str):
+    """A status 2 row; rows of an older day (late events) only go into recent"""
+    date = date[:10]
+    recent = {one['date']: one for one in summary['recent']}
+    recent.setdefault(date, {"date": date, "detail": detail, "status": 2})
+    last = summary['deep_date']
+    if not last or date > last:
+        summary['streak'] = summary['streak'] + 1 if last and _days_between(last, date) == 1 else 1
+        summary['deep_date'] = date
+    elif date < last and summary['streak'] < RECENT_DAYS:
+        # A gap inside the week may just have closed: count again from recent
+        streak = 0
+        while (_day(last) - datetime.timedelta(days=streak)).strftime(DATE_FORMAT) in recent:
+            streak += 1
+        summary['streak'] = max(summary['streak'], streak)
+    newest = summary['deep_date']
+    summary['recent'] = sorted(
+        (one for one in recent.values() if _days_between(one['date'], newest) < RECENT_DAYS),
+        key=lambda one: one['date'], reverse=True,
+    )
+
+
+def current_streak(summary: dict, today: str) -> int:
+    """Consecutive deep-training days up to today, or up to yesterday while today is still open"""
+    last = summary['deep_date']
+    if not last or _days_between(last, today) > 1:
+        return 0
+    return min(summary['streak'], STREAK_MAX)
+
+
+def cycle(summary: dict, today: str) -> list[dict]:
+    """
+    Unbroken run of deep trainings of the last CYCLE_DAYS days, newest first.
+    The run ends on today, or on yesterday while today is still open; it stops at the first gap
+    """
+    last = summary['deep_date']
+    if not last or _days_between(last, today) not in (0, 1):
+        return []
+    recent = {one['date']: one for one in summary['recent']}
+    run = []
+    day = _day(last)
+    while (_day(today) - day).days < CYCLE_DAYS and day.strftime(DATE_FORMAT) in recent:
+        run.append(recent[day.strftime(DATE_FORMAT)])
+        day -= datetime.timedelta(days=1)
+    return run[:CYCLE_MAX]
@@ -0,0 +1,249 @@
+"""
+- Everything cached about one user in one Redis hash, read with a single HGETALL
+- Fields expire one by one: each value carries its deadline, {today} fields also end with their day;
+  expired fields are dropped on the next save, the hash itself lives USER_STATE_EX after the last one
+- Fields of a day still to come are kept: utils.day_rollover writes them before midnight
+- First load of a user moves the old per-user string keys that only exist in Redis into the hash
+"""
+
+import re
+from contextlib import asynccontextmanager
+
+from redis.client import NEVER_DECODE
+
+from utils.cache import RedisBatch, redis_batch, get_redis_connection
+from utils.cache_codec import cache_codec
+from utils.day_clock import clock
+from utils.log import log as logger
+
+USER_STATE_KEY = "hackathon:user:{address}"
+USER_STATE_EX = 2 * 86400
+USER_STATE_VERSION = 1
+VERSION_FIELD = "_v"
+# Last request of each user (score: timestamp), the users day_rollover pre-warms
+ACTIVE_USERS_KEY = "hackathon:users:active"
+# Field whose deadline spaces out the ZADDs to ACTIVE_USERS_KEY of one user
+ACTIVE_FIELD = "active"
+
+# Field template -> seconds a value stays valid, None: until the end of its day
+USER_STATE_FIELDS = {
+    "aichat:{today}:check": None,
+    "aichat:pending": 1800,  # old transcript, moved to utils.chat_history on first read
+    "aitrain:{today}:detail": None,
+    "training:summary": 60,
+    "trainall:count": 600,
+    "period:{chain_id}:{period_id}:last": 600,
+    "period:{chain_id}:{period_id}:list": 600,
+    ACTIVE_FIELD: 3600,
+}
+# Plain integers changed with HINCRBY, they end with their day
+USER_STATE_COUNTERS = {
+    "aitrain:{today}:status",
+}
+
+# Old string keys -> field; the other old keys only cached MySQL and just expire
+LEGACY_KEYS = {
+    "hackathon:aichat:{address}:{today}:check": "aichat:{today}:check",
+    "hackathon:aichat:{address}:pending": "aichat:pending",
+}
+
+# HINCRBY only a counter that is set: a missing one means "not loaded", not 0
+INCREMENT_FIELD_SCRIPT = """
+if redis.call('hexists', KEYS[1], ARGV[1]) == 1 then
+    return redis.call('hincrby', KEYS[1], ARGV[1], ARGV[2])
+end
+return false
+"""
+
+DATE_SEGMENT = re.compile(r"(?:^|:)(\d{4}-\d{2}-\d{2})(?::|$)")
+
+
+def _template_regex(template: str) -> re.Pattern:
+    return re.compile("^" + re.sub(r"\\\{[^}]*\\\}", "[^:]+", re.escape(template)) + "$")
+
+
+COUNTER_PATTERNS = [_template_regex(template) for template in USER_STATE_COUNTERS]
+
+
+class UserState:
+    def __init__(self, address: str, today: str | None = None):
+        self.address = address
+        self.today = today or clock.today()
+        self.key = USER_STATE_KEY.format(address=address)
+        self._values: dict[str, object] = {}
+        self._counters: dict[str, int] = {}
+        self._expired: set[str] = set()
+        self._set: dict[str, bytes] = {}
+        self._deleted: set[str] = set()
+        self._incremented: dict[str, int] = {}
+        self._loading = None
+        self.version = 0
+
+    def field(self, template: str, **params) -> str:
+        return template.format(today=self.today, **params)
+
+    # -- load --
+
+    def load(self, batch: RedisBatch):
+        """Queue the HGETALL in a batch; call ready() once it is flushed"""
+        self._loading = batch.hgetall_raw(self.key)
+
+    async def touch(self):
+        """
+        Mark the user active, for the day rollover (after ready()): one write to the master
+        per USER_STATE_FIELDS[ACTIVE_FIELD] seconds, however many requests load the state
+        """
+        if self.get(ACTIVE_FIELD) is not None:
+            return
+        now = clock.now()
+        self._values[ACTIVE_FIELD] = 1
+        self._expired.discard(ACTIVE_FIELD)
+        async with redis_batch(True) as batch:
+            batch.zadd(ACTIVE_USERS_KEY, {self.address: now})
+            batch.hset(self.key, {ACTIVE_FIELD: cache_codec.encode({"v": 1, "x": now + USER_STATE_FIELDS[ACTIVE_FIELD]})})
+            batch.expire(self.key, USER_STATE_EX)
+
+    async def ready(self, migrate: bool = True):
+        raw = self._loading.result() if self._loading is not None else None
+        self._loading = None
+        now = clock.now()
+        # Fields of past days go; fields of the coming day (a rollover state) stay
+        today = clock.today()
+        for name, data in (raw or {}).items():
+            name = name.decode()
+            if name == VERSION_FIELD:
+                self.version = int(data)
+                continue
+            day = DATE_SEGMENT.search(name)
+            if day and day.group(1) < today:
+                self._expired.add(name)
+                continue
+            try:
+                if any(pattern.match(name) for pattern in COUNTER_PATTERNS):
+                    self._counters[name] = int(data)
+                    continue
+                envelope = cache_codec.decode(data)
+            except Exception as e:
+                logger.error(f"UserState {self.key} {name} Exception: {str(e)}")
+                self._expired.add(name)
+                continue
+            if not envelope or envelope['x'] < now:
+                self._expired.add(name)
+                continue
+            self._values[name] = envelope['v']
+        if migrate and self.version < USER_STATE_VERSION and raw is not None:
+            await self.migrate()
+
+    async def migrate(self):
+        """Move the old string keys of this user into the hash, once"""
+        legacy_keys = [key.format(address=self.address, today=self.today) for key in LEGACY_KEYS]
+        try:
+            async with get_redis_connection(True) as cache:
+                values = await cache.execute_command("MGET", *legacy_keys, **{NEVER_DECODE: []})
+        except Exception as e:
+            logger.error(f"UserState.migrate {self.key} Exception: {str(e)}")
+            return
+        for template, data in zip(LEGACY_KEYS.values(), values):
+            value = cache_codec.decode(data)
+            if value is not None and self.get(template) is None:
+                self.set(template, value)
+        self._set[VERSION_FIELD] = str(USER_STATE_VERSION).encode()
+        async with redis_batch(True) as batch:
+            self.queue_save(batch)
+            batch.delete(*legacy_keys)
+        self.version = USER_STATE_VERSION
+
+    # -- read --
+
+    def get(self, template: str, **params):
+        """Value of a field, None when missing or expired"""
+        return self._values.get(self.field(template, **params))
+
+    def counter(self, template: str, **params) -> int | None:
+        return self._counters.get(self.field(template, **params))
+
+    # -- write, sent by save() --
+
+    def set(self, template: str, value, deadline: float | None = None, **params):
+        """deadline: timestamp the value ends, by default from USER_STATE_FIELDS"""
+        name = self.field(template, **params)
+        if deadline is None:
+            ex = USER_STATE_FIELDS[template]
+            deadline = clock.day_end(self.today) if ex is None else clock.now() + ex
+        self._values[name] = value
+        self._set[name] = cache_codec.encode({"v": value, "x": deadline})
+        self._deleted.discard(name)
+
+    def set_counter(self, template: str, value: int, **params):
+        name = self.field(template, **params)
+        self._counters[name] = value
+        self._set[name] = str(value).encode()
+        self._deleted.discard(name)
+
+    def incr(self, template: str, amount: int = 1, **params):
+        name = self.field(template, **params)
+        self._incremented[name] = self._incremented.get(name, 0) + amount
+        if name in self._counters:
+            self._counters[name] += amount
+
+    def delete(self, template: str, **params):
+        name = self.field(template, **params)
+        self._values.pop(name, None)
+        self._counters.pop(name, None)
+        self._set.pop(name, None)
+        self._deleted.add(name)
+
+    @property
+    def changed(self) -> bool:
+        return bool(self._set or self._deleted or self._incremented or self._expired)
+
+    def queue_save(self, batch: RedisBatch):
+        """Add the pending writes to a batch"""
+        if not self.changed:
+            return
+        deleted = (self._deleted | self._expired) - set(self._set)
+        if deleted:
+            batch.hdel(self.key, *deleted)
+        if self._set:
+            batch.hset(self.key, dict(self._set))
+        for name, amount in self._incremented.items():
+            batch.eval(INCREMENT_FIELD_SCRIPT, 1, self.key, name, amount)
+        batch.expire(self.key, USER_STATE_EX)
+        self._set, self._deleted, self._expired, self._incremented = {}, set(), set(), {}
+
+    async def save(self):
+        if not self.changed:
+            return
+        async with redis_batch(True) as batch:
+            self.queue_save(batch)
+
+
+async def load_user_state(address: str, today: str | None = None, *companions) -> UserState:
+    """
+    A user's cached state in one round trip (one more on the first visit, for the migration,
+    and once an hour to mark the user active).
+    companions: other per-user objects with load(batch)/ready(), loaded in the same round trip
+    """
+    state = UserState(address, today)
+    async with redis_batch(True) as batch:
+        state.load(batch)
+        for companion in companions:
+            companion.load(batch)
+    await state.ready()
+    await state.touch()
+    for companion in companions:
+        await companion.ready()
+    return state
+
+
+@asynccontextmanager
+async def user_state(address: str, today: str | None = None, *companions):
+    """load_user_state, saved with its companions (queue_save) when the block ends (returns included)"""
+    state = await load_user_state(address, today, *companions)
+    try:
+        yield state
+    finally:
+        async with redis_batch(True) as batch:
+            state.queue_save(batch)
+            for companion in companions:
+                companion.queue_save(batch)
@@ -0,0 +1,156 @@
+"""
+- Emotion contract ABI shared by the API, the period daemon and the event listener
+"""
+
+# ABI
+contract_abi_emotion = [
+        {
+            "inputs": [],
+            "name": "userProportion",
+            "outputs": [
+                { "internalType": "uint256", "name": "", "type": "uint256" }
+            ],
+            "stateMutability": "view",
+            "type": "function"
+        },
+        {
+            "inputs": [
+                { "internalType": "uint256", "name": "newUserProportion", "type": "uint256" }
+            ],
+            "name": "setProportion",
+            "outputs": [],
+            "stateMutability": "nonpayable",
+            "type": "function"
+        },
+        {
+            "inputs": [
+                { "internalType": "uint256", "name": "", "type": "uint256" }
+            ],
+            "name": "IssueReward",
+            "outputs": [
+                { "internalType": "uint256", "name": "", "type": "uint256" }
+            ],
+            "stateMutability": "view",
+            "type": "function"
+        },
+        {
+            "inputs": [],
+            "name": "Issue",
+            "outputs": [
+                { "internalType": "uint256", "name": "", "type": "uint256" }
+            ],
+            "stateMutability": "view",
+            "type": "function"
+        },
+        {
+            "inputs": [
+                { "internalType": "uint256", "name": "", "type": "uint256" }
+            ],
+            "name": "IssueAddressNum",
+            "outputs": [
+                { "internalType": "uint256", "name": "", "type": "uint256" }
+            ],
+            "stateMutability": "view",
+            "type": "function"
+        },
+        {
+            "inputs": [
+                { "internalType": "uint256", "name": "", "type": "uint256" }
+            ],
+            "name": "IssueInformation",
+            "outputs": [
+                { "internalType": "uint256", "name": "duration", "type": "uint256" },
+                { "internalType": "uint256", "name": "price", "type": "uint256" },
+                { "internalType": "uint256", "name": "putmoney", "type": "uint256" }
+            ],
+            "stateMutability": "view",
+            "type": "function"
+        },
+        {
+            "inputs": [
+                { "internalType": "uint256", "name": "", "type": "uint256" }
+            ],
+            "name": "IssueEmotion",
+            "outputs": [
+                { "internalType": "uint256", "name": "", "type": "uint256" }
+            ],
+            "stateMutability": "view",
+            "type": "function"
+        },
+        {
+            "inputs": [
+                { "internalType": "uint256", "name": "_Issue", "type": "uint256" },
+                { "internalType": "uint256", "name": "_num", "type": "uint256" }
+            ],
+            "name": "getIssueEmotionAddrslength",
+            "outputs": [
+                { "internalType": "uint256", "name": "", "type": "uint256" }
+            ],
+            "stateMutability": "view",
+            "type": "function"
+        },
+        {
+            "inputs": [],
+            "name": "openVRFRandomEmotions",
+            "outputs": [],
+            "stateMutability": "nonpayable",
+            "type": "function"
+        },
+        {
+            "inputs": [],
+            "name": "openEmotions",
+            "outputs": [],
+            "stateMutability": "nonpayable",
+            "type": "function"
+        },
+        {
+            "inputs": [
+                { "internalType": "uint256", "name": "_duration", "type": "uint256" },
+                { "internalType": "uint256", "name": "_price", "type": "uint256" },
+                { "internalType": "uint256", "name": "_putmoney", "type": "uint256" }
+            ],
+            "name": "openNewIssue",
+            "outputs": [],
+            "stateMutability": "nonpayable",
+            "type": "function"
+        },
+        {
+            "anonymous": False,
+            "inputs": [
+                { "indexed": False, "internalType": "uint256", "name": "", "type": "uint256" },
+                { "indexed": False, "internalType": "uint8", "name": "", "type": "uint8" },
+                { "indexed": False, "internalType": "address", "name": "", "type": "address" }
+            ],
+            "name": "Emotions",
+            "type": "event"
+        },
+        {
+            "anonymous": False,
+            "inputs": [
+                {"indexed": True,"internalType": "uint256","name": "issue","type": "uint256"},
+                {"indexed": False,"internalType": "uint256","name": "requestId","type": "uint256"}
+            ],
+            "name": "OpenVrfInitiated",
+            "type": "event"
+        },
+        {
+            "anonymous": False,
+            "inputs": [
+                {"indexed": True,"internalType": "uint256","name": "issue","type": "uint256"},
+                {"indexed": False,"internalType": "uint256","name": "requestId","type": "uint256"},
+                {"indexed": False,"internalType": "uint256","name": "emotionResult","type": "uint256"}
+            ],
+            "name": "OpenVrfCompleted",
+            "type": "event"
+        },
+        {
+            "anonymous": False,
+            "inputs": [
+                {"indexed": True,"internalType": "uint256","name": "issue","type": "uint256"},
+                {"indexed": False,"internalType": "uint256","name": "usertotal","type": "uint256"},
+                {"indexed": False,"internalType": "uint256","name": "useraverage","type": "uint256"}
+            ],
+            "name": "OpenEmotions",
+            "type": "event"
+        }
+    ]
@@ -0,0 +1,132 @@
+"""
+- One client per chain_id: keep-alive HTTP sessions and contracts built once
+"""
+
+import asyncio
+import time
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from web3 import Web3, AsyncWeb3
+
+from config import WEB3_HTTP_POOL, WEB3_HTTP_TIMEOUT
+from utils.log import log as logger
+from utils.multicall import MULTICALL3_ADDRESS
+from utils.rpc_endpoints import EndpointSet, FailoverHTTPProvider, AsyncFailoverHTTPProvider, get_rpc_urls
+from utils.web3_abi import contract_abi_emotion
+from utils.web3_tools import get_web3_config_by_chainid, web3_is_connected_with_retry, async_web3_is_connected_with_retry
+
+# eth_chainId is filled into every eth_call, never ask the node twice.
+# These never change, so skip web3's block-based validation: it would turn
+# caching off around an extra eth_chainId while concurrent calls are in flight
+PROVIDER_CACHE_KWARGS = {
+    "cache_allowed_requests": True,
+    "cacheable_requests": {"eth_chainId", "net_version", "web3_clientVersion"},
+    "request_cache_validation_threshold": None,
+}
+
+
+class ChainClient:
+    def __init__(self, web3_config: dict):
+        self.config = web3_config
+        self.network: str = web3_config['network']
+        self.chain_id: int = web3_config['chain_id']
+        self.endpoints = EndpointSet(get_rpc_urls(web3_config))
+        self.rpc_url: str = self.endpoints.endpoints[0].url
+        self.emotion_address: str = web3_config.get('emotion', '')
+        self.multicall_address: str | None = web3_config.get('multicall', MULTICALL3_ADDRESS) or None
+        self._web3: Web3 | None = None
+        self._emotion_contract = None
+        self._async_web3: AsyncWeb3 | None = None
+        self._async_emotion_contract = None
+        self._async_lock: asyncio.Lock | None = None
+        self._async_session: aiohttp.ClientSession | None = None
+
+    @property
+    def emotion_address_valid(self) -> bool:
+        return len(self.emotion_address) == 42 and self.emotion_address[:2] == '0x'
+
+    # -- sync (daemons) --
+
+    @property
+    def web3(self) -> Web3:
+        if self._web3 is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=len(self.endpoints.endpoints), pool_maxsize=WEB3_HTTP_POOL)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            provider = FailoverHTTPProvider(self.endpoints, session, WEB3_HTTP_TIMEOUT, **PROVIDER_CACHE_KWARGS)
+            self._web3 = Web3(provider)
+        return self._web3
+
+    @property
+    def emotion_contract(self):
+        if self._emotion_contract is None:
+            self._emotion_contract = self.web3.eth.contract(address=Web3.to_checksum_address(self.emotion_address), abi=contract_abi_emotion)
+        return self._emotion_contract
+
+    def connect(self) -> Web3:
+        """Sync client, blocks until the RPC node answers"""
+        while not web3_is_connected_with_retry(self.web3):
+            logger.error(f"Ooops! Failed to eth.is_connected. {[endpoint.url for endpoint in self.endpoints.endpoints]}")
+            time.sleep(10)
+        return self.web3
+
+    # -- async (API) --
+
+    async def get_async_web3(self) -> AsyncWeb3:
+        if self._async_lock is None:
+            self._async_lock = asyncio.Lock()
+        async with self._async_lock:
+            if self._async_web3 is None:
+                connector = aiohttp.TCPConnector(limit_per_host=WEB3_HTTP_POOL, keepalive_timeout=60, ttl_dns_cache=300)
+                session = aiohttp.ClientSession(connector=connector)
+                provider = AsyncFailoverHTTPProvider(self.endpoints, session, WEB3_HTTP_TIMEOUT, **PROVIDER_CACHE_KWARGS)
+                async_web3 = AsyncWeb3(provider)
+                if not await async_web3_is_connected_with_retry(async_web3):
+                    await session.close()
+                    raise Exception(f"Failed to eth.is_connected. {self.rpc_url}")
+                self._async_web3 = async_web3
+                self._async_session = session
+        return self._async_web3
+
+    async def get_async_emotion_contract(self):
+        if self._async_emotion_contract is None:
+            async_web3 = await self.get_async_web3()
+            self._async_emotion_contract = async_web3.eth.contract(address=Web3.to_checksum_address(self.emotion_address), abi=contract_abi_emotion)
+        return self._async_emotion_contract
+
+    async def aclose(self):
+        if self._async_session is not None:
+            await self._async_session.close()
+        self._async_session = None
+        self._async_web3 = None
+        self._async_emotion_contract = None
+
+
+_chain_clients: dict[int, ChainClient] = {}
+
+
+def get_chain_client(chain_id: int) -> ChainClient:
+    """Client for chain_id (0 = the WEB3_NETWORK default), created once per process"""
+    web3_config = get_web3_config_by_chainid(chain_id)
+    config_chainid = web3_config['chain_id']
+    chain_client = _chain_clients.get(config_chainid)
+    if chain_client is None:
+        chain_client = ChainClient(web3_config)
+        _chain_clients[config_chainid] = chain_client
+    return chain_client
+
+
+def get_rpc_stats() -> dict:
+    """Per-endpoint scores and latency histograms of every chain used by this process"""
+    return {chain_id: chain_client.endpoints.stats() for chain_id, chain_client in _chain_clients.items()}
+
+
+async def close_chain_clients():
+    for chain_client in list(_chain_clients.values()):
+        try:
+            await chain_client.aclose()
+        except Exception as e:
+            logger.error(f"close_chain_clients {chain_client.chain_id} Exception: {str(e)}")
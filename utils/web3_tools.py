@@ -1,3 +1,4 @@
+import asyncio
 import json
 import time
 from web3 import Web3
@@ -27,4 +28,40 @@ def get_web3_config_by_network(network=WEB3_NETWORK):
             return web3_client
     return web3_configs[0]
 
-# ------------------------------------------------------------------------------------
\ No newline at end of file
+# ------------------------------------------------------------------------------------
+
+def web3_is_connected_with_retry(web3_obj, max_retries=5, retry_interval=2):
+    attempt = 0
+    while attempt < max_retries:
+        try:
+            connected = web3_obj.is_connected()
+            return connected
+        except Exception as e:
+            logger.error(f"Attempt {attempt + 1} failed: {e}")
+            attempt += 1
+            if attempt < max_retries:
+                logger.debug(f"Retrying in {retry_interval} seconds...")
+                time.sleep(retry_interval)
+            else:
+                logger.error("Max retries reached. Failed to is_connected.")
+                return 0
+
+async def async_web3_is_connected_with_retry(web3_obj, max_retries=5, retry_interval=1, max_interval=8):
+    """AsyncWeb3 connectivity check with exponential backoff that never blocks the event loop"""
+    attempt = 0
+    while attempt < max_retries:
+        try:
+            if await web3_obj.is_connected():
+                return True
+            logger.error(f"Attempt {attempt + 1}: RPC node not connected")
+        except Exception as e:
+            logger.error(f"Attempt {attempt + 1} failed: {e}")
+        attempt += 1
+        if attempt < max_retries:
+            delay = min(retry_interval * 2 ** (attempt - 1), max_interval)
+            logger.debug(f"Retrying in {delay} seconds...")
+            await asyncio.sleep(delay)
+    logger.error("Max retries reached. Failed to is_connected.")
+    return False
+
+# ------------------------------------------------------------------------------------
@@ -15,6 +15,11 @@ from datetime import datetime as dt
 from dbutils.pooled_db import PooledDB
 
 from utils.web3_tools import get_web3_config_by_chainid
+from utils.web3_registry import get_chain_client
+from utils.participation import mark_blocking, KIND_DEEPTRAIN
+from utils.training_history import COUNT_INSERTED_QUERY
+from utils.period_projection import project_period, publish_projection_blocking
+from utils.training_summary import SUMMARY_LOCK_QUERY, SUMMARY_SAVE_QUERY, load_summary, add_deep_training, summary_values
 from config import DB_CONFIG
 
 """
@@ -24,49 +29,6 @@ from config import DB_CONFIG
 hash_file = 'hash_emotion'
 hash_index = 0
 
-# ABI
-contract_abi_emotion = [
-        {
-            "anonymous": False,
-            "inputs": [
-                { "indexed": False, "internalType": "uint256", "name": "", "type": "uint256" },
-                { "indexed": False, "internalType": "uint8", "name": "", "type": "uint8" },
-                { "indexed": False, "internalType": "address", "name": "", "type": "address" }
-            ],
-            "name": "Emotions",
-            "type": "event"
-        },
-		{
-			"anonymous": False,
-			"inputs": [
-				{"indexed": True,"internalType": "uint256","name": "issue","type": "uint256"},
-				{"indexed": False,"internalType": "uint256","name": "requestId","type": "uint256"}
-			],
-			"name": "OpenVrfInitiated",
-			"type": "event"
-		},
-        {
-			"anonymous": False,
-			"inputs": [
-				{"indexed": True,"internalType": "uint256","name": "issue","type": "uint256"},
-				{"indexed": False,"internalType": "uint256","name": "requestId","type": "uint256"},
-				{"indexed": False,"internalType": "uint256","name": "emotionResult","type": "uint256"}
-			],
-			"name": "OpenVrfCompleted",
-			"type": "event"
-		},
-		{
-			"anonymous": False,
-			"inputs": [
-				{"indexed": True,"internalType": "uint256","name": "issue","type": "uint256"},
-				{"indexed": False,"internalType": "uint256","name": "usertotal","type": "uint256"},
-				{"indexed": False,"internalType": "uint256","name": "useraverage","type": "uint256"}
-			],
-			"name": "OpenEmotions",
-			"type": "event"
-		}
-    ]
-
 # Creating a Connection Pool
 pool = PooledDB(
     creator=pymysql,
@@ -86,22 +48,6 @@ pool = PooledDB(
 
 # ------------------------------------------------------------------------------------
 
-def web3_is_connected_with_retry(web3_obj, max_retries=5, retry_interval=2):
-    attempt = 0
-    while attempt < max_retries:
-        try:
-            connected = web3_obj.is_connected()
-            return connected
-        except Exception as e:
-            logger.error(f"Attempt {attempt + 1} failed: {e}")
-            attempt += 1
-            if attempt < max_retries:
-                logger.debug(f"Retrying in {retry_interval} seconds...")
-                time.sleep(retry_interval)
-            else:
-                logger.error("Max retries reached. Failed to is_connected.")
-                return 0
-
 def get_block_number_with_retry(web3_obj, max_retries=5, retry_interval=2):
     attempt = 0
     while attempt < max_retries:
@@ -163,6 +109,15 @@ def get_event_logs_with_retry(contract_event, from_block, to_block, max_retries=
     logger.error("Max retries reached for event logs query")
     return []
 
+def update_training_summary(cursor, address, training_id):
+    """Deep training row training_id into the summary of address, in the caller's transaction"""
+    cursor.execute("SELECT date, detail FROM hack_emotion_training WHERE id = %s", (training_id,))
+    training = cursor.fetchone()
+    cursor.execute(SUMMARY_LOCK_QUERY, (address,))
+    summary = load_summary(address, cursor.fetchone())
+    add_deep_training(summary, training['date'], training['detail'] or '')
+    cursor.execute(SUMMARY_SAVE_QUERY, summary_values(summary))
+
 # ------------------------------------------------------------------------------------
 
 # Monitor blocks and parse related transactions into the database
@@ -177,21 +132,18 @@ def listen_events_start(web3_config, hash_index):
     web3_rpc_url = web3_config['server'] # rpc
     if not web3_rpc_url:
         raise Exception("Web3 rpc not found")
-    web3_obj = Web3(Web3.HTTPProvider(web3_rpc_url))
-    # Connecting to the RPC Node
-    while not web3_is_connected_with_retry(web3_obj):
-        logger.error(f"Ooops! Failed to eth.is_connected. {web3_rpc_url}")
-        time.sleep(10)
+    chain_client = get_chain_client(config_chainid)
+    # Connecting to the RPC Node, one keep-alive session for the whole listener
+    web3_obj = chain_client.connect()
 
     retry_interval = web3_config.get('interval', 10) * 10
     
     # emotion
-    emotion_address = web3_config['emotion']
-    emotion_contract_address = Web3.to_checksum_address(emotion_address)
-    emotion_contract = web3_obj.eth.contract(address=emotion_contract_address, abi=contract_abi_emotion)
-    if not (len(emotion_address) == 42 and emotion_address[:2] == '0x'): 
+    emotion_address = chain_client.emotion_address
+    if not chain_client.emotion_address_valid:
         logger.error(f"Invalid emotion_contract address - {emotion_address}")
         return {"code": 401, "success": False, "msg": "Invalid emotion_contract address"}
+    emotion_contract = chain_client.emotion_contract
     logger.info(f"emotion_address: {emotion_address} config_chainid: {config_chainid}")
 
     MAX_BLOCK_RANGE = 5000
@@ -363,9 +315,21 @@ def listen_events_start(web3_config, hash_index):
                                             AND NOT EXISTS (SELECT id FROM hack_emotion_training WHERE address = %s and status = 2 and date = %s)
                                         """
                         values = (address, address, today, 2, today, address, today, address, today)
-                        cursor.execute(insert_query, values)
-                        cursor.connection.commit()
+                        try:
+                            cursor.execute(insert_query, values)
+                            inserted = cursor.rowcount > 0
+                            if inserted:
+                                training_id = cursor.lastrowid
+                                cursor.execute(COUNT_INSERTED_QUERY, (training_id,))
+                                update_training_summary(cursor, address, training_id)
+                            cursor.connection.commit()
+                        except Exception:
+                            # Row, counter and summary go together or not at all; the summary row lock is released
+                            cursor.connection.rollback()
+                            raise
                         logger.success(f"insert hack_emotion_training success! address: {address} status: 2")
+                        if inserted:
+                            mark_blocking(address, today, KIND_DEEPTRAIN)
 
                         randuuid = random.randint(1, 99999)
                         # Update signin status
@@ -398,9 +362,15 @@ def listen_events_start(web3_config, hash_index):
                                                 chain_id=%s AND period_id=%s AND status = 1
                                             """
                             values = (config_chainid,period_id,)
-                            cursor.execute(update_query, values)
-                            cursor.connection.commit()
+                            try:
+                                cursor.execute(update_query, values)
+                                projection = project_period(cursor, config_chainid)
+                                cursor.connection.commit()
+                            except Exception:
+                                cursor.connection.rollback()
+                                raise
                             logger.success(f"update hack_emotions - period_total+1")
+                            publish_projection_blocking(config_chainid, projection)
                         else:
                             logger.error(f"Invalid period_emotion value: {period_emotion}")
                     else:
@@ -446,10 +416,7 @@ async def listen_events(chainid):
     web3_rpc_url = web3_config['server'] # rpc
     if not web3_rpc_url:
         raise Exception("Web3 rpc not found")
-    web3_obj = Web3(Web3.HTTPProvider(web3_rpc_url))
-    while not web3_is_connected_with_retry(web3_obj):
-        logger.debug(f"Ooops! Failed to eth.is_connected. {web3_rpc_url}")
-        time.sleep(5)
+    web3_obj = get_chain_client(config_chainid).connect()
 
     current_block=0
     while current_block == 0: